@@ -8,6 +8,7 @@ from __future__ import print_function
 # pylint: disable=invalid-name
 
 import sys
+import multiprocessing
 
 import tensorflow as tf
 
@@ -32,6 +33,12 @@ flags.DEFINE_string("newline_token", None,
                     "For example, `--newline_token '<EOS>'`. If not "
                     "specified, no replacement is performed.")
 
+flags.DEFINE_integer("num_parallel_calls", multiprocessing.cpu_count(),
+                     "Number of processes to count words in parallel.")
+flags.DEFINE_integer("chunk_size", 1 << 26,
+                     "Approximate number of bytes of each file chunk counted "
+                     "at a time. Bounds the memory usage of each process.")
+
 FLAGS = flags.FLAGS
 
 
@@ -41,9 +48,12 @@ def main(_):
     filenames = tx.data.get_files(FLAGS.files)
     vocab = tx.data.make_vocab(filenames,
                                max_vocab_size=FLAGS.max_vocab_size,
-                               newline_token=FLAGS.newline_token)
+                               newline_token=FLAGS.newline_token,
+                               num_parallel_calls=FLAGS.num_parallel_calls,
+                               chunk_size=FLAGS.chunk_size,
+                               verbose=True)
 
-    with open(FLAGS.output_path, "w") as fout:
+    with open(FLAGS.output_path, "wb") as fout:
         fout.write('\n'.join(vocab).encode("utf-8"))
 
 if __name__ == "__main__":
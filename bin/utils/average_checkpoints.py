@@ -20,12 +20,50 @@
 
 import os
 import argparse
-import six
+from multiprocessing.pool import ThreadPool
 
 import tensorflow as tf
+from tensorflow.python.ops import io_ops
 import numpy as np
 
 
+def get_weights(num_checkpoints, scheme, decay=None, weights=None):
+  """Returns the normalized weights of the checkpoints, from the oldest to
+  the latest."""
+  if scheme == "uniform":
+    weights = [1.] * num_checkpoints
+  elif scheme == "exponential":
+    weights = [decay ** (num_checkpoints - 1 - i)
+               for i in range(num_checkpoints)]
+  elif scheme == "weighted":
+    if weights is None or len(weights) != num_checkpoints:
+      raise ValueError("--weights must give one weight per checkpoint "
+                       "(%d)" % num_checkpoints)
+  else:
+    raise ValueError("Unknown averaging scheme: %s" % scheme)
+  total = float(sum(weights))
+  if total <= 0:
+    raise ValueError("The weights must sum to a positive value")
+  return [w / total for w in weights]
+
+
+def average_tensor(readers, name, weights, pool):
+  """Reads a tensor from all checkpoints in parallel and returns its
+  weighted average in the native dtype."""
+  values = pool.map(lambda reader: reader.get_tensor(name), readers)
+  dtype = values[-1].dtype
+  if not (np.issubdtype(dtype, np.floating) or
+          np.issubdtype(dtype, np.complexfloating)):
+    # Integer, boolean and string tensors are taken from the latest
+    # checkpoint
+    return values[-1]
+  avg_value = np.zeros(values[-1].shape, dtype=np.float64 if
+                       np.issubdtype(dtype, np.floating) else np.complex128)
+  for weight, value in zip(weights, values):
+    avg_value += np.multiply(value, weight, dtype=avg_value.dtype)
+  return avg_value.astype(dtype)
+
+
 def main():
   tf.logging.set_verbosity(tf.logging.INFO)
 
@@ -36,6 +74,18 @@ def main():
                       help="The output directory where the averaged checkpoint will be saved.")
   parser.add_argument("--max_count", type=int, default=8,
                       help="The maximal number of checkpoints to average.")
+  parser.add_argument("--scheme", default="uniform",
+                      choices=["uniform", "exponential", "weighted"],
+                      help="How the checkpoints are weighted.")
+  parser.add_argument("--decay", type=float, default=0.9,
+                      help="The weight ratio of each checkpoint to the next "
+                           "newer one, for the \"exponential\" scheme.")
+  parser.add_argument("--weights", type=float, nargs="+",
+                      help="The weights of the checkpoints from the oldest to "
+                           "the latest, for the \"weighted\" scheme.")
+  parser.add_argument("--num_threads", type=int, default=None,
+                      help="The number of threads reading the checkpoints. "
+                           "Defaults to the number of checkpoints.")
   args = parser.parse_args()
 
   if args.model_dir == args.output_dir:
@@ -45,42 +95,43 @@ def main():
   if len(checkpoints_path) > args.max_count:
     checkpoints_path = checkpoints_path[-args.max_count:]
   num_checkpoints = len(checkpoints_path)
-
-  tf.logging.info("Averaging %d checkpoints..." % num_checkpoints)
-  tf.logging.info("Listing variables...")
-
-  var_list = tf.train.list_variables(checkpoints_path[0])
-  avg_values = {}
-  for name, shape in var_list:
-    if not name.startswith("global_step"):
-      avg_values[name] = np.zeros(shape)
-
-  for checkpoint_path in checkpoints_path:
-    tf.logging.info("Loading checkpoint %s" % checkpoint_path)
-    reader = tf.train.load_checkpoint(checkpoint_path)
-    for name in avg_values:
-      avg_values[name] += reader.get_tensor(name) / num_checkpoints
-
-  tf_vars = []
-  for name, value in six.iteritems(avg_values):
-    tf_vars.append(tf.get_variable(name, shape=value.shape))
-  placeholders = [tf.placeholder(v.dtype, shape=v.shape) for v in tf_vars]
-  assign_ops = [tf.assign(v, p) for (v, p) in zip(tf_vars, placeholders)]
+  weights = get_weights(num_checkpoints, args.scheme,
+                        decay=args.decay, weights=args.weights)
+
+  tf.logging.info("Averaging %d checkpoints with weights %s..."
+                  % (num_checkpoints, ", ".join("%.4f" % w for w in weights)))
+  readers = [tf.train.load_checkpoint(path) for path in checkpoints_path]
+  pool = ThreadPool(args.num_threads or num_checkpoints)
+
+  # Variables are streamed one at a time across the checkpoints, so only
+  # the averaged model and the values of one variable are held in memory.
+  names = []
+  avg_values = []
+  for name, _ in tf.train.list_variables(checkpoints_path[-1]):
+    if name.startswith("global_step"):
+      continue
+    names.append(name)
+    avg_values.append(average_tensor(readers, name, weights, pool))
+  pool.close()
+  pool.join()
 
   latest_step = int(checkpoints_path[-1].split("-")[-1])
-  out_base_file = os.path.join(args.output_dir, "model.ckpt")
-  global_step = tf.get_variable(
-      "global_step",
-      initializer=tf.constant(latest_step, dtype=tf.int64),
-      trainable=False)
-  saver = tf.train.Saver(tf.global_variables())
-
+  names.append("global_step")
+  avg_values.append(np.array(latest_step, dtype=np.int64))
+
+  # Writes the tensors directly with a single save op, without creating and
+  # assigning variables.
+  if not tf.gfile.Exists(args.output_dir):
+    tf.gfile.MakeDirs(args.output_dir)
+  out_file = "%s-%d" % (os.path.join(args.output_dir, "model.ckpt"), latest_step)
+  placeholders = [tf.placeholder(tf.as_dtype(v.dtype), shape=v.shape)
+                  for v in avg_values]
+  save_op = io_ops.save_v2(out_file, names, [""] * len(names), placeholders)
+
+  tf.logging.info("Saving averaged checkpoint to %s" % out_file)
   with tf.Session() as sess:
-    sess.run(tf.global_variables_initializer())
-    for p, assign_op, (name, value) in zip(placeholders, assign_ops, six.iteritems(avg_values)):
-      sess.run(assign_op, {p: value})
-    tf.logging.info("Saving averaged checkpoint to %s-%d" % (out_base_file, latest_step))
-    saver.save(sess, out_base_file, global_step=global_step)
+    sess.run(save_op, dict(zip(placeholders, avg_values)))
+  tf.train.update_checkpoint_state(args.output_dir, out_file)
 
 
 if __name__ == "__main__":
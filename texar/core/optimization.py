@@ -7,6 +7,7 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import division
 
+import contextlib
 import inspect
 
 import tensorflow as tf
@@ -21,9 +22,14 @@ __all__ = [
     "get_optimizer_fn",
     "get_learning_rate_decay_fn",
     "get_gradient_clip_fn",
+    "GradientAccumulationOptimizer",
+    "MovingAverageWeights",
+    "get_moving_average_weights",
     "get_train_op"
 ]
 
+_MOVING_AVERAGE_WEIGHTS_KEY = "MOVING_AVERAGE_WEIGHTS"
+
 def default_optimization_hparams():
     """Returns default hyperparameters of optimization.
 
@@ -55,6 +61,8 @@ def default_optimization_hparams():
             "kwargs": {}
         },
         "gradient_noise_scale": None,
+        "gradient_accumulation_steps": 1,
+        "moving_average_decay": None,
         # TODO(zhiting): allow module-level control of gradient_multipliers
         "name": None
     }
@@ -236,6 +244,234 @@ def get_gradient_clip_fn(hparams=None):
     return grad_clip_fn
 
 
+class GradientAccumulationOptimizer(tf.train.Optimizer):
+    """An optimizer wrapper that accumulates the gradients of
+    :attr:`num_steps` micro-batches, and applies their average with the
+    wrapped optimizer every :attr:`num_steps` runs of the train op. This
+    trains with an effective batch size of :attr:`num_steps` times the
+    batch size, while the peak memory is that of a single batch.
+
+    The global step is only incremented when the gradients are applied, so
+    learning rate schedules that depend on the global step proceed once per
+    effective batch.
+
+    The accumulators are local variables, which must be initialized with,
+    e.g., :tf_main:`tf.local_variables_initializer
+    <local_variables_initializer>`.
+
+    Args:
+        optimizer: An instance of :tf_main:`tf.train.Optimizer
+            <train/Optimizer>` to apply the accumulated gradients.
+        num_steps (int): The number of micro-batches to accumulate.
+        grad_clip_fn (optional): A function that clips the list of averaged
+            `(gradient, variable)` pairs before they are applied, e.g.,
+            one returned by :func:`get_gradient_clip_fn`.
+        name (str): Name of the ops.
+
+    Example:
+
+        .. code-block:: python
+
+            optimizer = GradientAccumulationOptimizer(
+                tf.train.AdamOptimizer(learning_rate), num_steps=4)
+            train_op = optimizer.minimize(loss, global_step)
+            # Gradients are applied every 4 runs
+            sess.run(train_op)
+    """
+
+    def __init__(self, optimizer, num_steps, grad_clip_fn=None,
+                 name="GradientAccumulation"):
+        if num_steps < 1:
+            raise ValueError("`num_steps` must be >= 1.")
+        tf.train.Optimizer.__init__(self, use_locking=False, name=name)
+        self._optimizer = optimizer
+        self._num_steps = num_steps
+        self._grad_clip_fn = grad_clip_fn
+
+    def compute_gradients(self, *args, **kwargs):
+        return self._optimizer.compute_gradients(*args, **kwargs)
+
+    def apply_gradients(self, grads_and_vars, global_step=None, name=None):
+        grads_and_vars = [(g, v) for g, v in grads_and_vars if g is not None]
+        if not grads_and_vars:
+            raise ValueError("No gradients provided for any variable.")
+        var_list = [v for _, v in grads_and_vars]
+
+        with tf.name_scope(name, self.get_name()):
+            accums = [
+                tf.Variable(tf.zeros(var.get_shape(),
+                                     dtype=var.dtype.base_dtype),
+                            trainable=False, name="accum",
+                            collections=[tf.GraphKeys.LOCAL_VARIABLES])
+                for var in var_list]
+            counter = tf.Variable(
+                0, trainable=False, name="counter",
+                collections=[tf.GraphKeys.LOCAL_VARIABLES])
+
+            accum_ops = []
+            for accum, (grad, _) in zip(accums, grads_and_vars):
+                if isinstance(grad, tf.IndexedSlices):
+                    accum_ops.append(
+                        tf.scatter_add(accum, grad.indices, grad.values))
+                else:
+                    accum_ops.append(tf.assign_add(accum, grad))
+            with tf.control_dependencies(accum_ops):
+                count = tf.assign_add(counter, 1)
+
+            # Creates the slots of the optimizer (e.g., the moments of Adam)
+            # out of the conditional branch
+            self._optimizer._create_slots(var_list) # pylint: disable=protected-access
+
+            def _apply():
+                with tf.control_dependencies(accum_ops):
+                    avg_grads_and_vars = [
+                        (tf.identity(accum) / self._num_steps, var)
+                        for accum, var in zip(accums, var_list)]
+                if self._grad_clip_fn is not None:
+                    avg_grads_and_vars = self._grad_clip_fn(avg_grads_and_vars)
+                apply_op = self._optimizer.apply_gradients(
+                    avg_grads_and_vars, global_step=global_step)
+                with tf.control_dependencies([apply_op]):
+                    reset_ops = [tf.assign(accum, tf.zeros_like(accum))
+                                 for accum in accums]
+                    reset_ops.append(tf.assign(counter, 0))
+                return tf.group(*reset_ops)
+
+            return tf.cond(tf.greater_equal(count, self._num_steps),
+                           _apply, tf.no_op)
+
+
+class MovingAverageWeights(object):
+    """Maintains exponential moving averages of variables, updated after
+    every run of a train op, and swaps the variables with their averages
+    within the graph, e.g., to evaluate the averaged model.
+
+    The averages are kept in shadow variables created by
+    :tf_main:`tf.train.ExponentialMovingAverage
+    <train/ExponentialMovingAverage>`, which are global variables and hence
+    saved in checkpoints. The swap goes through a backup copy of the
+    variables in local variables, without fetching any value to Python.
+    Running :attr:`swap_op` again swaps the trained values back.
+
+    Args:
+        decay (float): The decay of the moving averages, e.g., `0.999`.
+        var_list (optional): A list of variables to average. If `None`, all
+            trainable variables are averaged.
+        name (str): Name of the ops.
+
+    Example:
+
+        .. code-block:: python
+
+            averages = MovingAverageWeights(decay=0.999)
+            train_op = averages.apply(optimizer.minimize(loss))
+            ...
+            with averages.swapped(sess):
+                evaluate(sess)
+    """
+
+    def __init__(self, decay, var_list=None, name="MovingAverageWeights"):
+        if var_list is None:
+            var_list = tf.trainable_variables()
+        self._var_list = list(var_list)
+        self._decay = decay
+        self._name = name
+        self._ema = None
+        self._swap_op = None
+
+    def apply(self, train_op, global_step=None):
+        """Returns an op that runs :attr:`train_op` and then updates the
+        moving averages.
+
+        If :attr:`train_op` is a tensor (e.g., as returned by
+        :func:`get_train_op`), a tensor of the same value is returned.
+
+        Args:
+            train_op: The train op.
+            global_step (optional): The global step variable incremented
+                by :attr:`train_op` when the variables are updated. If given,
+                the averages are only updated in the runs that increment
+                it, e.g., once every `num_steps` runs with
+                :class:`GradientAccumulationOptimizer`. Otherwise, the
+                averages are updated in every run.
+        """
+        decay = self._decay
+        if global_step is not None:
+            last_step = tf.Variable(
+                global_step.initialized_value(), trainable=False,
+                name="%s_last_step" % self._name,
+                collections=[tf.GraphKeys.LOCAL_VARIABLES])
+        with tf.control_dependencies([train_op]):
+            if global_step is not None:
+                # The averages are kept in runs that do not update the
+                # variables
+                decay = tf.where(tf.not_equal(global_step, last_step),
+                                 tf.constant(decay, dtype=tf.float32),
+                                 tf.constant(1., dtype=tf.float32))
+            self._ema = tf.train.ExponentialMovingAverage(
+                decay, name=self._name)
+            update_op = self._ema.apply(self._var_list)
+        if global_step is not None:
+            with tf.control_dependencies([update_op]):
+                update_op = tf.assign(last_step, global_step).op
+        if isinstance(train_op, tf.Operation):
+            return update_op
+        with tf.control_dependencies([update_op]):
+            return tf.identity(train_op)
+
+    def average(self, var):
+        """Returns the shadow variable holding the moving average of
+        :attr:`var`. Must be called after :meth:`apply`.
+        """
+        return self._ema.average(var)
+
+    @property
+    def swap_op(self):
+        """The op that swaps the values of the variables and their moving
+        averages. Must be created after :meth:`apply`.
+        """
+        if self._swap_op is None:
+            with tf.name_scope("%s_swap" % self._name):
+                backups = [
+                    tf.Variable(tf.zeros(var.get_shape(),
+                                         dtype=var.dtype.base_dtype),
+                                trainable=False, name="backup",
+                                collections=[tf.GraphKeys.LOCAL_VARIABLES])
+                    for var in self._var_list]
+                backup_ops = [tf.assign(backup, var)
+                              for backup, var in zip(backups, self._var_list)]
+                with tf.control_dependencies(backup_ops):
+                    var_ops = [tf.assign(var, self.average(var))
+                               for var in self._var_list]
+                with tf.control_dependencies(var_ops):
+                    average_ops = [
+                        tf.assign(self.average(var), backup)
+                        for backup, var in zip(backups, self._var_list)]
+                self._swap_op = tf.group(*average_ops)
+        return self._swap_op
+
+    @contextlib.contextmanager
+    def swapped(self, sess):
+        """A context manager within which the variables hold their moving
+        averages in :attr:`sess`.
+        """
+        swap_op = self.swap_op
+        sess.run(swap_op)
+        try:
+            yield
+        finally:
+            sess.run(swap_op)
+
+
+def get_moving_average_weights():
+    """Returns the :class:`MovingAverageWeights` created by the latest call
+    of :func:`get_train_op` with `"moving_average_decay"` in the current
+    graph, or `None` if there is no such call.
+    """
+    averages = tf.get_collection(_MOVING_AVERAGE_WEIGHTS_KEY)
+    return averages[-1] if averages else None
+
+
 def get_train_op(loss, variables=None, learning_rate=None,
                  global_step=None, increment_global_step=True, hparams=None):
     """Creates a training op.
@@ -258,7 +494,15 @@ def get_train_op(loss, variables=None, learning_rate=None,
         hparams (dict or HParams, optional): hyperparameters. Missing
             hyperparameters are set to default values automatically. See
             :meth:`~texar.core.optimization.default_optimization_hparams` for
-            all hyperparameters and default values.
+            all hyperparameters and default values. If
+            `"gradient_accumulation_steps"` is larger than 1, the gradients
+            of that number of runs of the train op are accumulated and
+            applied together, with gradient clipping applied to their
+            average (see :class:`GradientAccumulationOptimizer`). If
+            `"moving_average_decay"` is not `None`, moving averages of the
+            variables are updated after every run of the train op (see
+            :class:`MovingAverageWeights`), which can be retrieved with
+            :func:`get_moving_average_weights`.
 
     Returns:
         tuple: (train_op, global_step). If :attr:`global_step` is provided, the
@@ -282,6 +526,21 @@ def get_train_op(loss, variables=None, learning_rate=None,
 
     lr_decay_fn = get_learning_rate_decay_fn(hparams["learning_rate_decay"])
 
+    accumulation_steps = hparams["gradient_accumulation_steps"]
+    if accumulation_steps > 1:
+        # Clips the accumulated gradients instead of those of each run
+        if isinstance(optimizer_fn, tf.train.Optimizer):
+            optimizer_fn = GradientAccumulationOptimizer(
+                optimizer_fn, accumulation_steps, grad_clip_fn=grad_clip_fn)
+        else:
+            base_optimizer_fn, accum_grad_clip_fn = optimizer_fn, grad_clip_fn
+            def _get_accumulation_opt(learning_rate=None):
+                return GradientAccumulationOptimizer(
+                    base_optimizer_fn(learning_rate), accumulation_steps,
+                    grad_clip_fn=accum_grad_clip_fn)
+            optimizer_fn = _get_accumulation_opt
+        grad_clip_fn = None
+
     train_op = tf.contrib.layers.optimize_loss(
         loss=loss,
         global_step=global_step,
@@ -294,4 +553,18 @@ def get_train_op(loss, variables=None, learning_rate=None,
         name=hparams["name"],
         increment_global_step=increment_global_step)
 
+    if hparams["moving_average_decay"] is not None:
+        averages = MovingAverageWeights(
+            hparams["moving_average_decay"], var_list=variables)
+        average_step = None
+        if accumulation_steps > 1 and increment_global_step:
+            # Updates the averages only when the gradients are applied
+            average_step = global_step
+            if average_step is None:
+                average_step = tf.train.get_global_step()
+            if not isinstance(average_step, tf.Variable):
+                average_step = None
+        train_op = averages.apply(train_op, average_step)
+        tf.add_to_collection(_MOVING_AVERAGE_WEIGHTS_KEY, averages)
+
     return train_op
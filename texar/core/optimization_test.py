@@ -154,5 +154,109 @@ class OptimizationTest(tf.test.TestCase):
         train_op = opt.get_train_op(loss)
         self.assertTrue(tf.contrib.framework.is_tensor(train_op))
 
+    def test_gradient_accumulation(self):
+        """Tests GradientAccumulationOptimizer.
+        """
+        var = tf.Variable(1.)
+        scale = tf.placeholder(tf.float32, [])
+        loss = scale * var
+        global_step = tf.Variable(0, trainable=False)
+        optimizer = opt.GradientAccumulationOptimizer(
+            tf.train.GradientDescentOptimizer(1.), num_steps=2)
+        train_op = optimizer.minimize(loss, global_step)
+
+        with self.test_session() as sess:
+            sess.run(tf.global_variables_initializer())
+            sess.run(tf.local_variables_initializer())
+            sess.run(train_op, {scale: 1.})
+            self.assertEqual(sess.run(var), 1.)
+            self.assertEqual(sess.run(global_step), 0)
+            sess.run(train_op, {scale: 3.})
+            # The average gradient (1 + 3) / 2 is applied
+            self.assertEqual(sess.run(var), -1.)
+            self.assertEqual(sess.run(global_step), 1)
+
+        hparams = {"gradient_accumulation_steps": 2}
+        train_op = opt.get_train_op(tf.nn.l2_loss(var), hparams=hparams)
+        self.assertTrue(tf.contrib.framework.is_tensor(train_op))
+
+        # An optimizer instance
+        hparams = {
+            "optimizer": {"type": tf.train.GradientDescentOptimizer(1.)},
+            "gradient_accumulation_steps": 2
+        }
+        train_op_instance = opt.get_train_op(
+            tf.nn.l2_loss(var), hparams=hparams)
+
+        # An optimizer without a learning rate
+        class _FixedRateOptimizer(tf.train.GradientDescentOptimizer):
+            def __init__(self, use_locking=False):
+                tf.train.GradientDescentOptimizer.__init__(
+                    self, 1., use_locking=use_locking)
+        hparams = {
+            "optimizer": {"type": _FixedRateOptimizer, "kwargs": {}},
+            "gradient_accumulation_steps": 2
+        }
+        train_op_no_lr = opt.get_train_op(tf.nn.l2_loss(var), hparams=hparams)
+
+        with self.test_session() as sess:
+            for train_op in [train_op_instance, train_op_no_lr]:
+                sess.run(tf.global_variables_initializer())
+                sess.run(tf.local_variables_initializer())
+                sess.run(train_op)
+                self.assertEqual(sess.run(var), 1.)
+                # The gradient of l2_loss is var, i.e., 1.
+                sess.run(train_op)
+                self.assertEqual(sess.run(var), 0.)
+
+    def test_moving_average_weights(self):
+        """Tests MovingAverageWeights.
+        """
+        var = tf.Variable(1.)
+        loss = tf.nn.l2_loss(var)
+        averages = opt.MovingAverageWeights(0.5, var_list=[var])
+        train_op = averages.apply(
+            tf.train.GradientDescentOptimizer(1.).minimize(loss))
+
+        with self.test_session() as sess:
+            sess.run(tf.global_variables_initializer())
+            sess.run(tf.local_variables_initializer())
+            # The gradient 1. is applied, and the average is (1 + 0) / 2
+            sess.run(train_op)
+            self.assertEqual(sess.run(var), 0.)
+            self.assertEqual(sess.run(averages.average(var)), 0.5)
+            with averages.swapped(sess):
+                self.assertEqual(sess.run(var), 0.5)
+            self.assertEqual(sess.run(var), 0.)
+            self.assertEqual(sess.run(averages.average(var)), 0.5)
+
+        # With gradient accumulation, the averages are only updated when the
+        # gradients are applied
+        var_2 = tf.Variable(1.)
+        global_step = tf.Variable(0, trainable=False)
+        averages_2 = opt.MovingAverageWeights(0.5, var_list=[var_2])
+        optimizer = opt.GradientAccumulationOptimizer(
+            tf.train.GradientDescentOptimizer(1.), num_steps=2)
+        train_op_2 = averages_2.apply(
+            optimizer.minimize(tf.nn.l2_loss(var_2), global_step),
+            global_step)
+
+        with self.test_session() as sess:
+            sess.run(tf.global_variables_initializer())
+            sess.run(tf.local_variables_initializer())
+            sess.run(train_op_2)
+            self.assertEqual(sess.run(averages_2.average(var_2)), 1.)
+            sess.run(train_op_2)
+            self.assertEqual(sess.run(var_2), 0.)
+            self.assertEqual(sess.run(averages_2.average(var_2)), 0.5)
+            sess.run(train_op_2)
+            self.assertEqual(sess.run(averages_2.average(var_2)), 0.5)
+
+        hparams = {"moving_average_decay": 0.9}
+        train_op = opt.get_train_op(loss, hparams=hparams)
+        self.assertTrue(tf.contrib.framework.is_tensor(train_op))
+        self.assertIsInstance(opt.get_moving_average_weights(),
+                              opt.MovingAverageWeights)
+
 if __name__ == "__main__":
     tf.test.main()
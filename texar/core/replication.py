@@ -0,0 +1,135 @@
+#
+"""
+Utilities of data-parallel replication of a model over multiple device
+towers within a single graph.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import multiprocessing
+
+import tensorflow as tf
+from tensorflow.python.util import nest
+
+__all__ = [
+    "get_tower_devices",
+    "get_tower_session_config",
+    "split_batch",
+    "average_gradients"
+]
+
+def get_tower_devices(num_towers, device_type='cpu'):
+    """Returns the names of the devices of :attr:`num_towers` towers, e.g.,
+    `['/cpu:0', '/cpu:1']`.
+
+    To have multiple CPU devices in a session, create the session with
+    the config returned by :func:`get_tower_session_config`.
+    """
+    return ['/%s:%d' % (device_type, i) for i in range(num_towers)]
+
+def get_tower_session_config(num_towers, num_threads=None, config=None):
+    """Returns a session config of :attr:`num_towers` CPU devices, for
+    replicating a model over CPU towers.
+
+    The towers run concurrently in the inter-op thread pool, and share the
+    intra-op thread pool of the session. Compared to a single tower that
+    runs every op on the whole batch with all cores, the ops of the towers
+    run on smaller slices of the batch side by side, which usually keeps
+    more cores busy.
+
+    Args:
+        num_towers (int): The number of towers.
+        num_threads (int, optional): The total number of threads. If `None`,
+            the number of CPU cores is used.
+        config (optional): An instance of :tf_main:`tf.ConfigProto
+            <ConfigProto>` to update. If `None`, a new one is created.
+
+    Returns:
+        An instance of :tf_main:`tf.ConfigProto <ConfigProto>`.
+    """
+    if config is None:
+        config = tf.ConfigProto()
+    if num_threads is None:
+        num_threads = multiprocessing.cpu_count()
+    config.device_count['CPU'] = num_towers
+    config.intra_op_parallelism_threads = num_threads
+    config.inter_op_parallelism_threads = max(num_towers, 2)
+    return config
+
+def split_batch(batch, num_towers):
+    """Splits a (possibly nested) batch of tensors along the first dimension
+    into :attr:`num_towers` slices of sizes that differ by at most one.
+
+    The batch size can be dynamic, but must not be smaller than
+    :attr:`num_towers`, so that no slice is empty.
+
+    Args:
+        batch: A tensor, or a (nested) structure of tensors of the same
+            batch size, e.g., a dict of a data batch.
+        num_towers (int): The number of slices.
+
+    Returns:
+        A tuple `(slices, weights)`, where `slices` is a list of
+        :attr:`num_towers` structures like :attr:`batch`, and `weights` is
+        a list of float scalar tensors, the ratio of the size of each slice
+        to the batch size. The weights can be passed to
+        :func:`average_gradients`.
+    """
+    flat_batch = nest.flatten(batch)
+    batch_size = tf.shape(flat_batch[0])[0]
+    size_splits = [
+        batch_size // num_towers +
+        tf.to_int32(tf.less(i, batch_size % num_towers))
+        for i in range(num_towers)]
+    flat_slices = [tf.split(value, tf.stack(size_splits), num=num_towers)
+                   for value in flat_batch]
+    slices = [nest.pack_sequence_as(batch, [s[i] for s in flat_slices])
+              for i in range(num_towers)]
+    weights = [tf.to_float(size) / tf.to_float(batch_size)
+               for size in size_splits]
+    return slices, weights
+
+def average_gradients(tower_grads_and_vars, weights=None):
+    """Averages the gradients of the towers of a model that share the same
+    variables.
+
+    Args:
+        tower_grads_and_vars: A list of lists of `(gradient, variable)`
+            pairs, one list for each tower, in the same order of variables,
+            e.g., those returned by :meth:`compute_gradients` of an
+            optimizer.
+        weights (optional): A list of float scalars, the weight of each
+            tower, e.g., the ratio of the slice of the batch of the tower
+            returned by :func:`split_batch`. If `None`, the towers are
+            weighted equally.
+
+    Returns:
+        A list of `(gradient, variable)` pairs of the averaged gradients.
+        :tf_main:`tf.IndexedSlices <IndexedSlices>` gradients (e.g., of
+        embeddings) are averaged as :tf_main:`tf.IndexedSlices
+        <IndexedSlices>`.
+    """
+    num_towers = len(tower_grads_and_vars)
+    if weights is None:
+        weights = [1. / num_towers] * num_towers
+
+    avg_grads_and_vars = []
+    for grads_and_vars in zip(*tower_grads_and_vars):
+        var = grads_and_vars[0][1]
+        grads = [(g, w) for (g, _), w in zip(grads_and_vars, weights)
+                 if g is not None]
+        if not grads:
+            avg_grads_and_vars.append((None, var))
+            continue
+        with tf.name_scope('average_gradients'):
+            if isinstance(grads[0][0], tf.IndexedSlices):
+                avg_grad = tf.IndexedSlices(
+                    tf.concat([g.values * w for g, w in grads], 0),
+                    tf.concat([g.indices for g, _ in grads], 0),
+                    grads[0][0].dense_shape)
+            else:
+                avg_grad = tf.add_n([g * w for g, w in grads])
+        avg_grads_and_vars.append((avg_grad, var))
+    return avg_grads_and_vars
@@ -0,0 +1,79 @@
+#
+"""
+Unit tests for data-parallel replication utilities.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import numpy as np
+
+import tensorflow as tf
+
+from texar.core import replication
+
+
+class ReplicationTest(tf.test.TestCase):
+    """Tests data-parallel replication utilities.
+    """
+
+    def test_split_batch(self):
+        """Tests :func:`~texar.core.replication.split_batch`.
+        """
+        batch = {'ids': tf.placeholder(tf.int32, [None, 3]),
+                 'length': tf.placeholder(tf.int32, [None])}
+        slices, weights = replication.split_batch(batch, 2)
+        self.assertEqual(len(slices), 2)
+        self.assertEqual(set(slices[0].keys()), set(['ids', 'length']))
+
+        ids = np.arange(15).reshape(5, 3)
+        length = np.arange(5)
+        with self.test_session() as sess:
+            slices_, weights_ = sess.run(
+                [slices, weights],
+                {batch['ids']: ids, batch['length']: length})
+        np.testing.assert_array_equal(slices_[0]['ids'], ids[:3])
+        np.testing.assert_array_equal(slices_[1]['ids'], ids[3:])
+        np.testing.assert_array_equal(slices_[1]['length'], length[3:])
+        np.testing.assert_allclose(weights_, [0.6, 0.4])
+
+    def test_average_gradients(self):
+        """Tests :func:`~texar.core.replication.average_gradients` with
+        towers on multiple CPU devices.
+        """
+        embedding = tf.Variable(np.ones([4, 2]), dtype=tf.float32)
+        var = tf.Variable(1.)
+        unused_var = tf.Variable(1.)
+        ids = tf.constant([0, 1, 3, 3])
+        slices, weights = replication.split_batch(ids, 2)
+        optimizer = tf.train.GradientDescentOptimizer(1.)
+        tower_grads = []
+        for device, tower_ids in zip(replication.get_tower_devices(2),
+                                     slices):
+            with tf.device(device):
+                loss = tf.reduce_mean(
+                    tf.nn.embedding_lookup(embedding, tower_ids) * var)
+                tower_grads.append(optimizer.compute_gradients(
+                    loss, [embedding, var, unused_var]))
+        grads_and_vars = replication.average_gradients(tower_grads, weights)
+        self.assertIsInstance(grads_and_vars[0][0], tf.IndexedSlices)
+        self.assertIsNone(grads_and_vars[2][0])
+
+        full_loss = tf.reduce_mean(tf.nn.embedding_lookup(embedding, ids) * var)
+        full_grads = tf.gradients(full_loss, [embedding, var])
+
+        config = replication.get_tower_session_config(2)
+        with self.test_session(config=config) as sess:
+            sess.run(tf.global_variables_initializer())
+            emb_grad, var_grad = sess.run(
+                [tf.convert_to_tensor(grads_and_vars[0][0]),
+                 grads_and_vars[1][0]])
+            full_emb_grad, full_var_grad = sess.run(
+                [tf.convert_to_tensor(full_grads[0]), full_grads[1]])
+        np.testing.assert_allclose(emb_grad, full_emb_grad, rtol=1e-6)
+        np.testing.assert_allclose(var_grad, full_var_grad, rtol=1e-6)
+
+if __name__ == "__main__":
+    tf.test.main()
@@ -10,6 +10,8 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import multiprocessing
+
 import tensorflow as tf
 
 from texar.hyperparams import HParams
@@ -26,17 +28,76 @@ class DataBase(object):
 
     def __init__(self, hparams):
         self._hparams = HParams(hparams, self.default_hparams())
+        self._stats_aggregator = None
 
     # TODO (zhiting): add more docs
     @staticmethod
     def default_hparams():
         """Returns a dictionary of default hyperparameters.
 
+            num_parallel_calls: int or str, number of elements to
+                process (e.g., decode and transform) in parallel. If
+                `"auto"`, the parallelism is tuned dynamically by the TF
+                runtime (with TF versions that support autotuning;
+                otherwise the number of available CPU cores is used).
+
+            prefetch_buffer_size: int or str, number of batches to prefetch
+                so that data processing overlaps with the model
+                computation. If `0`, no prefetching is performed. If
+                `"auto"`, the buffer size is tuned dynamically by the TF
+                runtime based on the measured latency of the pipeline (with
+                TF versions that support autotuning; otherwise a buffer of
+                `2` batches is used).
+
             max_dataset_size: int, maximum number of instances to include in
                 the dataset. If set to `-1` or greater than the size of
                 dataset, all instances will be included. This constraint is
                 imposed after data shuffling and filtering.
 
+            num_shards: int, number of shards to split the data into, e.g.,
+                for multi-process training where each worker reads a
+                different shard. The data of shard :attr:`shard_index`
+                (0-based) is used.
+
+            shard_index: int, index of the shard to use.
+
+            num_parallel_reads: int, number of files (or file splits) of
+                text data to read concurrently with
+                :tf_main:`parallel_interleave
+                <contrib/data/parallel_interleave>`. If `1`, files are read
+                sequentially.
+
+            file_split_size: int, optional. If specified, each uncompressed
+                text file is split into ranges of this number of lines, which
+                are sharded and read in parallel as separate files. Useful
+                for reading a single large file with multiple readers.
+
+            cache: bool or str, optional. Whether to cache the decoded and
+                transformed (by, e.g., :attr:`"other_transformations"`) data
+                instances after the first pass, so that later passes skip
+                file reading and decoding. If `True` or `""`, caches in
+                memory, which lasts until the data iterator is
+                re-initialized. If a file path, caches in the file, which
+                lasts across iterator re-initializations (e.g., repeated
+                evaluations with :class:`~texar.data.TrainTestDataIterator`)
+                and across runs. Shuffling is applied to the cached data.
+                If `None` (default), no caching is performed.
+
+            line_index_dir: str, optional. Directory to cache the line
+                offset indexes of the text files in, which are built when
+                line-level random access is needed (e.g., by
+                :attr:`"file_split_size"`) and make counting the lines of
+                the files fast. The indexes are keyed by the path, size and
+                modification time of the files. If `None` (default), the
+                indexes are not cached, and no file is written.
+
+            latency_stats: bool, whether to record the latency of each
+                pipeline stage, i.e., `"read"`, `"process"`, `"batch"`,
+                and `"prefetch"`, with tags like `"<name>/<stage>_latency"`.
+                The statistics are collected by :attr:`stats_aggregator`.
+                A small latency of the final stage relative to the others
+                means the input pipeline keeps up with the model.
+
         """
         return {
             "name": "data",
@@ -49,7 +110,15 @@ class DataBase(object):
             "num_parallel_calls": 1,
             "prefetch_buffer_size": 0,
             "max_dataset_size": -1,
-            "seed": None
+            "num_shards": 1,
+            "shard_index": 0,
+            "num_parallel_reads": 1,
+            "file_split_size": None,
+            "cache": None,
+            "line_index_dir": None,
+            "latency_stats": False,
+            "seed": None,
+            "@no_typecheck": ["num_parallel_calls", "prefetch_buffer_size"]
         }
 
     @staticmethod
@@ -69,7 +138,157 @@ class DataBase(object):
         return dataset
 
     @staticmethod
-    def _shuffle_dataset(dataset, hparams, dataset_files):
+    def _shard_dataset(dataset, hparams):
+        """Keeps the :attr:`"shard_index"`-th of every :attr:`"num_shards"`
+        data instances.
+        """
+        if hparams["num_shards"] > 1:
+            dataset = dataset.shard(hparams["num_shards"],
+                                    hparams["shard_index"])
+        return dataset
+
+    @staticmethod
+    def _make_text_line_dataset(files, compression_type, hparams):
+        """Creates a dataset of lines of the text files.
+
+        Files (or file splits, see :attr:`"file_split_size"`) are sharded
+        across workers as per :attr:`"num_shards"` and :attr:`"shard_index"`,
+        and read concurrently as per :attr:`"num_parallel_reads"`. If there
+        are fewer files than shards, the lines are sharded instead.
+        """
+        num_shards = hparams["num_shards"]
+        shard_index = hparams["shard_index"]
+        cycle_length = hparams["num_parallel_reads"]
+        split_size = hparams["file_split_size"]
+        if not isinstance(files, (list, tuple)):
+            files = [files]
+
+        if split_size is not None:
+            if compression_type:
+                raise ValueError("'file_split_size' does not support "
+                                 "compressed files.")
+            return dsutils.line_range_text_dataset(
+                files, split_size, num_shards=num_shards,
+                shard_index=shard_index, cycle_length=cycle_length,
+                cache_dir=hparams["line_index_dir"])
+
+        if len(files) < num_shards or \
+                (num_shards == 1 and cycle_length == 1):
+            dataset = tf.data.TextLineDataset(
+                files, compression_type=compression_type)
+            return DataBase._shard_dataset(dataset, hparams)
+
+        dataset = tf.data.Dataset.from_tensor_slices(files)
+        dataset = dataset.shard(num_shards, shard_index)
+        dataset = dataset.apply(tf.contrib.data.parallel_interleave(
+            lambda filename: tf.data.TextLineDataset(
+                filename, compression_type=compression_type),
+            cycle_length=cycle_length))
+        return dataset
+
+    @staticmethod
+    def _count_shard_lines(files, hparams, line_sharded=False):
+        """Returns the number of lines of the text files in the shard of
+        :attr:`"shard_index"`.
+
+        The files are assumed to be sharded as in
+        :meth:`_make_text_line_dataset`, i.e., by files or file splits if
+        possible, or as in :meth:`_shard_dataset` (by lines) if
+        :attr:`line_sharded` is `True`.
+        """
+        num_shards = hparams["num_shards"]
+        shard_index = hparams["shard_index"]
+        cache_dir = hparams["line_index_dir"]
+        if not isinstance(files, (list, tuple)):
+            files = [files]
+        if num_shards == 1:
+            return count_file_lines(files, cache_dir)
+
+        if not line_sharded:
+            split_size = hparams["file_split_size"]
+            if split_size is not None:
+                # Sizes of the file splits, in the order they are sharded
+                split_sizes = []
+                for fn in files:
+                    num_lines = count_file_lines(fn, cache_dir)
+                    split_sizes.extend(
+                        min(split_size, num_lines - start)
+                        for start in range(0, num_lines, split_size))
+                return sum(split_sizes[shard_index::num_shards])
+            if len(files) >= num_shards:
+                return count_file_lines(list(files[shard_index::num_shards]),
+                                        cache_dir)
+
+        num_lines = count_file_lines(files, cache_dir)
+        return len(range(shard_index, num_lines, num_shards))
+
+    @staticmethod
+    def _is_cached(hparams):
+        return hparams["cache"] is not None and hparams["cache"] is not False
+
+    @staticmethod
+    def _cache_dataset(dataset, hparams):
+        """Caches the dataset in memory or file as per :attr:`"cache"`.
+        """
+        cache = hparams["cache"]
+        if cache is True:
+            cache = ""
+        return dataset.cache(cache)
+
+    @staticmethod
+    def _get_num_parallel_calls(hparams):
+        """Returns the number of parallel calls of data processing as per
+        :attr:`"num_parallel_calls"`.
+        """
+        num_parallel_calls = hparams["num_parallel_calls"]
+        if num_parallel_calls == "auto":
+            num_parallel_calls = getattr(tf.contrib.data, "AUTOTUNE", None)
+            if num_parallel_calls is None:
+                num_parallel_calls = multiprocessing.cpu_count()
+        return num_parallel_calls
+
+    @staticmethod
+    def _prefetch_dataset(dataset, hparams):
+        """Prefetches batches as per :attr:`"prefetch_buffer_size"`.
+        """
+        buffer_size = hparams["prefetch_buffer_size"]
+        if buffer_size == "auto":
+            buffer_size = getattr(tf.contrib.data, "AUTOTUNE", 2)
+        elif buffer_size <= 0:
+            return dataset
+        return dataset.prefetch(buffer_size)
+
+    @staticmethod
+    def _record_latency(dataset, hparams, stage):
+        """Records the latency of producing each element of the dataset
+        if :attr:`"latency_stats"` is `True`.
+        """
+        if hparams["latency_stats"]:
+            dataset = dataset.apply(tf.contrib.data.latency_stats(
+                "%s/%s_latency" % (hparams["name"], stage)))
+        return dataset
+
+    def _attach_stats_aggregator(self, dataset):
+        """Creates :attr:`stats_aggregator` if :attr:`"latency_stats"` is
+        `True`, and attaches it to the dataset if supported by TF.
+        """
+        if not self._hparams.latency_stats:
+            return dataset
+        self._stats_aggregator = tf.contrib.data.StatsAggregator()
+        if hasattr(tf.contrib.data, "set_stats_aggregator"):
+            dataset = dataset.apply(
+                tf.contrib.data.set_stats_aggregator(self._stats_aggregator))
+        return dataset
+
+    @staticmethod
+    def _shuffle_dataset(dataset, hparams, dataset_files, line_sharded=False):
+        """Shuffles the dataset as per :attr:`"shuffle"` and
+        :attr:`"shard_and_shuffle"`.
+
+        Returns a tuple `(dataset, dataset_size)`, where `dataset_size` is
+        the number of lines in the shard of the data (see
+        :meth:`_count_shard_lines`) if it is counted, or `None` otherwise.
+        """
         dataset_size = None
         shuffle_buffer_size = hparams["shuffle_buffer_size"]
         if hparams["shard_and_shuffle"]:
@@ -77,7 +296,8 @@ class DataBase(object):
                 raise ValueError(
                     "Dataset hyperparameter 'shuffle_buffer_size' "
                     "must not be `None` if 'shard_and_shuffle'=`True`.")
-            dataset_size = count_file_lines(dataset_files)
+            dataset_size = DataBase._count_shard_lines(
+                dataset_files, hparams, line_sharded)
             if shuffle_buffer_size >= dataset_size:
                 raise ValueError(
                     "Dataset size (%d) <= shuffle_buffer_size (%d). Set "
@@ -90,7 +310,8 @@ class DataBase(object):
                                       seed=hparams["seed"])
         elif hparams["shuffle"]:
             if shuffle_buffer_size is None:
-                dataset_size = count_file_lines(dataset_files)
+                dataset_size = DataBase._count_shard_lines(
+                    dataset_files, hparams, line_sharded)
                 shuffle_buffer_size = dataset_size
             dataset = dataset.shuffle(shuffle_buffer_size, seed=hparams["seed"])
 
@@ -115,6 +336,19 @@ class DataBase(object):
         """
         return self._hparams
 
+    @property
+    def stats_aggregator(self):
+        """The :tf_main:`StatsAggregator <contrib/data/StatsAggregator>`
+        collecting the per-stage latency statistics if hyperparameter
+        :attr:`"latency_stats"` is `True`, or `None` otherwise.
+
+        The statistics can be written to TensorBoard by evaluating
+        `stats_aggregator.get_summary()`. With TF versions that do not
+        support attaching the aggregator to the dataset, call
+        `stats_aggregator.subscribe(iterator)` on the data iterator.
+        """
+        return self._stats_aggregator
+
     @property
     def name(self):
         """The data name.
@@ -8,6 +8,8 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import threading
+
 import six
 
 import tensorflow as tf
@@ -15,6 +17,7 @@ import tensorflow as tf
 import numpy as np
 
 from texar.utils import utils
+from texar.data.data_utils import get_line_offsets
 
 # pylint: disable=invalid-name, too-many-arguments
 
@@ -26,6 +29,8 @@ __all__ = [
     "make_chained_transformation",
     "make_combined_transformation",
     "random_shard_dataset",
+    "index_shuffled_text_line_dataset",
+    "line_range_text_dataset",
 ]
 
 class _DataSpec(object):
@@ -252,3 +257,189 @@ def random_shard_dataset(dataset_size, shard_size, seed=None):
 
     return _shard_fn
 
+
+class _LineReader(object):
+    """Reads lines of text files by global line index with random access.
+
+    Each reading thread keeps its own file handles, so that the reader can
+    be called from parallel dataset map functions.
+    """
+
+    def __init__(self, filenames, line_offsets):
+        self._filenames = filenames
+        self._line_offsets = line_offsets
+        self._file_sizes = [tf.gfile.Stat(fn).length for fn in filenames]
+        # Global index of the first line of each file
+        self._file_starts = np.cumsum(
+            [0] + [len(offsets) for offsets in line_offsets])
+        self._local = threading.local()
+
+    @property
+    def num_lines(self):
+        """The total number of lines in all files.
+        """
+        return int(self._file_starts[-1])
+
+    def _get_file(self, file_idx):
+        files = getattr(self._local, 'files', None)
+        if files is None:
+            files = self._local.files = {}
+        if file_idx not in files:
+            files[file_idx] = tf.gfile.GFile(self._filenames[file_idx], "rb")
+        return files[file_idx]
+
+    def read_line(self, index):
+        """Returns the line (without the trailing newline) of the global line
+        index.
+        """
+        file_idx = np.searchsorted(self._file_starts, index, side='right') - 1
+        line_idx = index - self._file_starts[file_idx]
+        offsets = self._line_offsets[file_idx]
+        start = int(offsets[line_idx])
+        if line_idx + 1 < len(offsets):
+            end = int(offsets[line_idx + 1])
+        else:
+            end = self._file_sizes[file_idx]
+        f = self._get_file(file_idx)
+        f.seek(start)
+        line = f.read(end - start)
+        if line.endswith(b'\n'):
+            line = line[:-1]
+        if line.endswith(b'\r'):
+            line = line[:-1]
+        return line
+
+    def read_line_range(self, file_idx, start, end):
+        """Returns a numpy array of lines `[start, end)` of a file, read with
+        a single sequential read.
+        """
+        offsets = self._line_offsets[file_idx]
+        if end <= start:
+            return np.array([], dtype=object)
+        end_offset = int(offsets[end]) if end < len(offsets) \
+            else self._file_sizes[file_idx]
+        f = self._get_file(file_idx)
+        f.seek(int(offsets[start]))
+        lines = f.read(end_offset - int(offsets[start])).split(b'\n')
+        lines = [l[:-1] if l.endswith(b'\r') else l
+                 for l in lines[:end - start]]
+        return np.array(lines, dtype=object)
+
+    def read_lines(self, indexes):
+        """Returns a numpy array of lines of the global line indexes.
+        """
+        return np.array([self.read_line(i) for i in indexes], dtype=object)
+
+def index_shuffled_text_line_dataset(filenames, seed=None, read_batch_size=256,
+                                     num_shards=1, shard_index=0,
+                                     cache_dir=None):
+    """Creates a dataset of the lines of text files in a uniformly random
+    order, by permuting line indexes and reading the lines with random
+    access.
+
+    Unlike shuffling a :tf_main:`TextLineDataset <data/TextLineDataset>`
+    with a buffer of the full data size, no shuffle buffer is used: the
+    line indexes of the shard are permuted with numpy on the host at each
+    iteration of the dataset, and read in batches of :attr:`read_batch_size`
+    lines. The host memory is the line offsets (see
+    :func:`texar.data.get_line_offsets`) and the permutation, i.e., 16
+    bytes per line.
+
+    Args:
+        filenames: A (list of) path to uncompressed text files.
+        seed (int, optional): Random seed of the permutations. Each
+            iteration of the dataset draws a new permutation.
+        read_batch_size (int): Number of lines read in each call of the
+            reading function.
+        num_shards (int): Number of shards to split the lines into.
+        shard_index (int): Index of the shard to read. Line `i` belongs to
+            shard `i % num_shards`.
+        cache_dir (str, optional): Directory to cache the line offsets in.
+            See :func:`texar.data.get_line_offsets`.
+
+    Returns:
+        A tuple `(dataset, dataset_size)`, where `dataset` is a dataset of
+        string scalars as :tf_main:`TextLineDataset <data/TextLineDataset>`,
+        and `dataset_size` is the number of lines in the shard.
+    """
+    if not isinstance(filenames, (list, tuple)):
+        filenames = [filenames]
+    reader = _LineReader(
+        filenames, [get_line_offsets(fn, cache_dir) for fn in filenames])
+    indexes = np.arange(shard_index, reader.num_lines, num_shards,
+                        dtype=np.int64)
+    dataset_size = len(indexes)
+    random_state = np.random.RandomState(seed)
+
+    def _permuted_index_batches():
+        permuted_indexes = random_state.permutation(indexes)
+        for start in range(0, dataset_size, read_batch_size):
+            yield permuted_indexes[start:start + read_batch_size]
+
+    def _read_fn(indexes):
+        lines = tf.py_func(reader.read_lines, [indexes], tf.string,
+                           stateful=False)
+        lines.set_shape([None])
+        return lines
+
+    dataset = tf.data.Dataset.from_generator(
+        _permuted_index_batches, tf.int64, tf.TensorShape([None]))
+    dataset = dataset.map(_read_fn).apply(tf.contrib.data.unbatch())
+    return dataset, dataset_size
+
+def line_range_text_dataset(filenames, split_size, num_shards=1, shard_index=0,
+                            cycle_length=1, read_batch_size=256,
+                            cache_dir=None):
+    """Creates a dataset of the lines of text files, where each file is split
+    into ranges of :attr:`split_size` lines that are read concurrently.
+
+    The line ranges are computed from the line offset index of each file
+    (see :func:`texar.data.get_line_offsets`), and each range is read with
+    sequential reads of :attr:`read_batch_size` lines.
+
+    Args:
+        filenames: A (list of) path to uncompressed text files.
+        split_size (int): Number of lines of each range.
+        num_shards (int): Number of shards to split the ranges into.
+        shard_index (int): Index of the shard to read.
+        cycle_length (int): Number of ranges to read concurrently with
+            :tf_main:`parallel_interleave <contrib/data/parallel_interleave>`.
+        read_batch_size (int): Number of lines read in each call of the
+            reading function.
+        cache_dir (str, optional): Directory to cache the line offsets in.
+            See :func:`texar.data.get_line_offsets`.
+
+    Returns:
+        A dataset of string scalars as
+        :tf_main:`TextLineDataset <data/TextLineDataset>`.
+    """
+    if not isinstance(filenames, (list, tuple)):
+        filenames = [filenames]
+    line_offsets = [get_line_offsets(fn, cache_dir) for fn in filenames]
+    reader = _LineReader(filenames, line_offsets)
+
+    ranges = []
+    for file_idx, offsets in enumerate(line_offsets):
+        for start in range(0, len(offsets), split_size):
+            end = min(start + split_size, len(offsets))
+            ranges.append([file_idx, start, end])
+    ranges = np.array(ranges, dtype=np.int64).reshape([-1, 3])
+
+    def _read_fn(file_idx, start, end):
+        end = tf.minimum(start + read_batch_size, end)
+        lines = tf.py_func(reader.read_line_range, [file_idx, start, end],
+                           tf.string, stateful=False)
+        lines.set_shape([None])
+        return lines
+
+    def _range_dataset(line_range):
+        file_idx, start, end = line_range[0], line_range[1], line_range[2]
+        return (tf.data.Dataset.range(start, end, read_batch_size)
+                .map(lambda s: _read_fn(file_idx, s, end))
+                .apply(tf.contrib.data.unbatch()))
+
+    dataset = tf.data.Dataset.from_tensor_slices(ranges)
+    dataset = dataset.shard(num_shards, shard_index)
+    dataset = dataset.apply(tf.contrib.data.parallel_interleave(
+        _range_dataset, cycle_length=cycle_length))
+    return dataset
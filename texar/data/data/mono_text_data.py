@@ -25,12 +25,11 @@ import tensorflow as tf
 
 from texar.utils import utils
 from texar.utils.dtypes import is_callable
-from texar.data.data_utils import count_file_lines
 from texar.data.data import dataset_utils as dsutils
 from texar.data.data.text_data_base import TextDataBase
 from texar.data.data_decoders import TextDataDecoder, VarUttTextDataDecoder
-from texar.data.vocabulary import Vocab, SpecialTokens
-from texar.data.embedding import Embedding
+from texar.data.vocabulary import SpecialTokens, get_shared_vocab
+from texar.data.embedding import Embedding, get_shared_embedding
 
 # pylint: disable=invalid-name, arguments-differ, protected-access
 
@@ -245,10 +244,20 @@ class MonoTextData(TextDataBase):
 
         "data_name" : str
             Name of the data.
+
+        Besides the "dataset" hyperparameters, the top-level
+        :attr:`"index_shuffle"` (bool) specifies whether to shuffle the
+        data by permuting line indexes and reading lines with random access,
+        instead of with a shuffle buffer of raw text. This gives a full
+        shuffle of the data with a small memory footprint per data instance.
+        Used only when :attr:`"shuffle"` is `True`, and the files are not
+        compressed. See
+        :func:`texar.data.data.dataset_utils.index_shuffled_text_line_dataset`.
         """
         hparams = TextDataBase.default_hparams()
         hparams["name"] = "mono_text_data"
         hparams.update({
+            "index_shuffle": False,
             "dataset": _default_mono_text_dataset_hparams()
         })
         return hparams
@@ -257,32 +266,55 @@ class MonoTextData(TextDataBase):
     def make_vocab(hparams):
         """Reads vocab file and returns an instance of
         :class:`texar.data.Vocab`.
+
+        The instance is shared with other data that use the same vocab file
+        and special tokens in the same graph. See
+        :func:`texar.data.get_shared_vocab`.
         """
         bos_token = utils.default_str(
             hparams["bos_token"], SpecialTokens.BOS)
         eos_token = utils.default_str(
             hparams["eos_token"], SpecialTokens.EOS)
-        vocab = Vocab(hparams["vocab_file"],
-                      bos_token=bos_token, eos_token=eos_token)
+        vocab = get_shared_vocab(hparams["vocab_file"],
+                                 bos_token=bos_token, eos_token=eos_token)
         return vocab
 
     @staticmethod
     def make_embedding(emb_hparams, token_to_id_map):
         """Optionally loads embedding from file (if provided), and returns
         an instance of :class:`texar.data.Embedding`.
+
+        The instance is shared with other data that use the same
+        :attr:`token_to_id_map` and embedding hyperparameters. See
+        :func:`texar.data.get_shared_embedding`.
         """
         embedding = None
         if emb_hparams["file"] is not None and len(emb_hparams["file"]) > 0:
-            embedding = Embedding(token_to_id_map, emb_hparams)
+            embedding = get_shared_embedding(token_to_id_map, emb_hparams)
         return embedding
 
     @staticmethod
-    def _make_mono_text_dataset(dataset_hparams):
-        dataset = tf.data.TextLineDataset(
-            dataset_hparams["files"],
-            compression_type=dataset_hparams["compression_type"])
+    def _make_mono_text_dataset(dataset_hparams, hparams):
+        dataset = TextDataBase._make_text_line_dataset(
+            dataset_hparams["files"], dataset_hparams["compression_type"],
+            hparams)
         return dataset
 
+    @staticmethod
+    def _make_index_shuffled_dataset(dataset_hparams, hparams):
+        if dataset_hparams["compression_type"]:
+            raise ValueError(
+                "'index_shuffle' does not support compressed files.")
+        if hparams["shard_and_shuffle"]:
+            raise ValueError(
+                "'index_shuffle' and 'shard_and_shuffle' cannot be both "
+                "`True`.")
+        return dsutils.index_shuffled_text_line_dataset(
+            dataset_hparams["files"], seed=hparams["seed"],
+            num_shards=hparams["num_shards"],
+            shard_index=hparams["shard_index"],
+            cache_dir=hparams["line_index_dir"])
+
     @staticmethod
     def _make_other_transformations(other_trans_hparams, data_spec):
         """Creates a list of tranformation functions based on the
@@ -360,7 +392,7 @@ class MonoTextData(TextDataBase):
         chained_tran, data_spec = self._make_processor(
             hparams["dataset"], data_spec,
             name_prefix=hparams["dataset"]["data_name"])
-        num_parallel_calls = hparams["num_parallel_calls"]
+        num_parallel_calls = self._get_num_parallel_calls(hparams)
         dataset = dataset.map(
             lambda *args: chained_tran(dsutils.maybe_tuple(args)),
             num_parallel_calls=num_parallel_calls)
@@ -444,18 +476,39 @@ class MonoTextData(TextDataBase):
             dataset_hparams["embedding_init"], self._vocab.token_to_id_map_py)
 
         # Create and shuffle dataset
-        dataset = self._make_mono_text_dataset(dataset_hparams)
-        dataset, dataset_size = self._shuffle_dataset(
-            dataset, self._hparams, self._hparams.dataset.files)
+        if self._is_cached(self._hparams):
+            dataset = self._make_mono_text_dataset(dataset_hparams,
+                                                   self._hparams)
+            dataset_size = None
+        elif self._hparams.shuffle and self._hparams.index_shuffle:
+            dataset, dataset_size = self._make_index_shuffled_dataset(
+                dataset_hparams, self._hparams)
+        else:
+            dataset = self._make_mono_text_dataset(dataset_hparams,
+                                                   self._hparams)
+            dataset, dataset_size = self._shuffle_dataset(
+                dataset, self._hparams, self._hparams.dataset.files)
         self._dataset_size = dataset_size
 
         # Processing
+        dataset = self._record_latency(dataset, self._hparams, "read")
         data_spec = dsutils._DataSpec(dataset=dataset,
                                       dataset_size=self._dataset_size,
                                       vocab=self._vocab,
                                       embedding=self._embedding)
         dataset, data_spec = self._process_dataset(dataset, self._hparams,
                                                    data_spec)
+        dataset = self._record_latency(dataset, self._hparams, "process")
+
+        # Caching. The cached data is shuffled afterwards to avoid replaying
+        # the order of the first pass.
+        if self._is_cached(self._hparams):
+            dataset = self._cache_dataset(dataset, self._hparams)
+            dataset, dataset_size = self._shuffle_dataset(
+                dataset, self._hparams, self._hparams.dataset.files)
+            self._dataset_size = dataset_size
+            data_spec.add_spec(dataset_size=dataset_size)
+
         self._data_spec = data_spec
         self._decoder = data_spec.decoder
 
@@ -464,10 +517,12 @@ class MonoTextData(TextDataBase):
         padded_shapes = self._make_padded_shapes(dataset, self._decoder)
         dataset = self._make_batch(
             dataset, self._hparams, length_fn, padded_shapes)
+        dataset = self._record_latency(dataset, self._hparams, "batch")
 
         # Prefetching
-        if self._hparams.prefetch_buffer_size > 0:
-            dataset = dataset.prefetch(self._hparams.prefetch_buffer_size)
+        dataset = self._prefetch_dataset(dataset, self._hparams)
+        dataset = self._record_latency(dataset, self._hparams, "prefetch")
+        dataset = self._attach_stats_aggregator(dataset)
 
         self._dataset = dataset
 
@@ -489,13 +544,14 @@ class MonoTextData(TextDataBase):
     def dataset_size(self):
         """Returns the number of data instances in the data files.
 
-        Note that this is the total data count in the raw files, before any
-        filtering and truncation.
+        Note that this is the total data count in the raw files (or in the
+        shard of the files as per :attr:`"num_shards"` and
+        :attr:`"shard_index"`), before any filtering and truncation.
         """
         if not self._dataset_size:
             # pylint: disable=attribute-defined-outside-init
-            self._dataset_size = count_file_lines(
-                self._hparams.dataset.files)
+            self._dataset_size = self._count_shard_lines(
+                self._hparams.dataset.files, self._hparams)
         return self._dataset_size
 
     @property
@@ -9,6 +9,7 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import os
 import tempfile
 import copy
 import numpy as np
@@ -189,6 +190,153 @@ class MonoTextDataTest(tf.test.TestCase):
             "shuffle_buffer_size": 1})
         self._run_and_test(hparams)
 
+        hparams = copy.copy(self._hparams)
+        hparams.update({"index_shuffle": True})
+        self._run_and_test(hparams)
+
+    def test_index_shuffle_epoch(self):
+        """Tests that each epoch of the index shuffle yields every line
+        exactly once.
+        """
+        text_file = tempfile.NamedTemporaryFile()
+        text_file.write('\n'.join(
+            'w%d' % i for i in range(100)).encode("utf-8"))
+        text_file.flush()
+        lines = [('w%d' % i).encode("utf-8") for i in range(100)]
+
+        hparams = copy.copy(self._hparams)
+        hparams["dataset"] = copy.copy(hparams["dataset"])
+        hparams["dataset"]["files"] = text_file.name
+        hparams.update({"num_epochs": 2, "index_shuffle": True, "seed": 1})
+        dataset_size, texts = self._read_texts(hparams)
+        self.assertEqual(dataset_size, 100)
+        self.assertEqual(len(texts), 200)
+        self.assertEqual(sorted(texts[:100]), lines)
+        self.assertEqual(sorted(texts[100:]), lines)
+        # Shuffled, and reshuffled in the second epoch
+        self.assertNotEqual(texts[:100], lines)
+        self.assertNotEqual(texts[:100], texts[100:])
+
+    def test_parallel_read(self):
+        """Tests sharded and parallel reading.
+        """
+        hparams = copy.copy(self._hparams)
+        hparams["dataset"] = copy.copy(hparams["dataset"])
+        hparams["dataset"]["files"] = [self._text_file.name] * 2
+        hparams.update({"num_parallel_reads": 2})
+        self._run_and_test(hparams)
+
+        hparams.update({"num_shards": 2, "shard_index": 1})
+        self._run_and_test(hparams)
+
+        hparams.update({"file_split_size": 1})
+        self._run_and_test(hparams)
+
+    def _read_texts(self, hparams):
+        """Returns the data size and the list of sentences read in all
+        epochs of the data.
+        """
+        text_data = tx.data.MonoTextData(hparams)
+        iterator = text_data.dataset.make_initializable_iterator()
+        text_data_batch = iterator.get_next()
+        special_tokens = set(
+            tf.compat.as_bytes(t) for t in text_data.vocab.special_tokens)
+        texts = []
+        with self.test_session() as sess:
+            sess.run(tf.tables_initializer())
+            sess.run(iterator.initializer)
+            while True:
+                try:
+                    data_batch_ = sess.run(text_data_batch)
+                except tf.errors.OutOfRangeError:
+                    break
+                for text_ in data_batch_['text']:
+                    texts.append(b' '.join(
+                        t for t in text_ if t and t not in special_tokens))
+        return text_data.dataset_size(), texts
+
+    def test_shard_contents(self):
+        """Tests that a shard has exactly the expected lines, with and
+        without shard_and_shuffle.
+        """
+        text_files = []
+        for prefix in ['a', 'b']:
+            text_file = tempfile.NamedTemporaryFile()
+            text_file.write('\n'.join(
+                '%s%d' % (prefix, i) for i in range(10)).encode("utf-8"))
+            text_file.flush()
+            text_files.append(text_file)
+        lines = [[('%s%d' % (prefix, i)).encode("utf-8") for i in range(10)]
+                 for prefix in ['a', 'b']]
+
+        hparams = copy.copy(self._hparams)
+        hparams["dataset"] = copy.copy(hparams["dataset"])
+        hparams.update({"num_epochs": 1, "shuffle": False})
+
+        # Line-level shards
+        hparams["dataset"]["files"] = text_files[0].name
+        hparams.update({"num_shards": 3, "shard_index": 1})
+        expected = lines[0][1::3]
+        dataset_size, texts = self._read_texts(hparams)
+        self.assertEqual(dataset_size, len(expected))
+        self.assertEqual(texts, expected)
+
+        # File-level shards
+        hparams["dataset"]["files"] = [f.name for f in text_files]
+        hparams.update({"num_shards": 2, "shard_index": 1})
+        expected = lines[1]
+        dataset_size, texts = self._read_texts(hparams)
+        self.assertEqual(dataset_size, len(expected))
+        self.assertEqual(texts, expected)
+
+        # Shards of file splits [0, 4), [4, 8), [8, 10)
+        hparams["dataset"]["files"] = text_files[0].name
+        hparams.update({"num_shards": 2, "shard_index": 0,
+                        "file_split_size": 4})
+        expected = lines[0][:4] + lines[0][8:]
+        dataset_size, texts = self._read_texts(hparams)
+        self.assertEqual(dataset_size, len(expected))
+        self.assertEqual(sorted(texts), sorted(expected))
+
+        hparams.update({"shuffle": True, "shard_and_shuffle": True,
+                        "shuffle_buffer_size": 2})
+        dataset_size, texts = self._read_texts(hparams)
+        self.assertEqual(dataset_size, len(expected))
+        self.assertEqual(sorted(texts), sorted(expected))
+
+        hparams["dataset"]["files"] = [f.name for f in text_files]
+        hparams.update({"num_shards": 3, "shard_index": 2,
+                        "file_split_size": None})
+        expected = (lines[0] + lines[1])[2::3]
+        dataset_size, texts = self._read_texts(hparams)
+        self.assertEqual(dataset_size, len(expected))
+        self.assertEqual(sorted(texts), sorted(expected))
+
+    def test_cache(self):
+        """Tests caching of the decoded data.
+        """
+        hparams = copy.copy(self._hparams)
+        hparams.update({"cache": True})
+        self._run_and_test(hparams)
+
+        hparams.update({"cache": os.path.join(tempfile.mkdtemp(), "cache")})
+        self._run_and_test(hparams)
+
+        # The passes over the cached data yield the same examples as
+        # without caching
+        hparams = copy.copy(self._hparams)
+        hparams.update({"num_epochs": 2, "shuffle": False})
+        _, expected = self._read_texts(hparams)
+        self.assertEqual(len(expected), 4)
+        hparams.update({"cache": True})
+        _, texts = self._read_texts(hparams)
+        self.assertEqual(texts, expected)
+        # The file cache is written in the first run and read in the second
+        hparams.update({"cache": os.path.join(tempfile.mkdtemp(), "cache")})
+        for _ in range(2):
+            _, texts = self._read_texts(hparams)
+            self.assertEqual(texts, expected)
+
     def test_prefetch(self):
         """Tests prefetching.
         """
@@ -196,6 +344,19 @@ class MonoTextDataTest(tf.test.TestCase):
         hparams.update({"prefetch_buffer_size": 2})
         self._run_and_test(hparams)
 
+        hparams.update({"prefetch_buffer_size": "auto",
+                        "num_parallel_calls": "auto"})
+        self._run_and_test(hparams)
+
+    def test_latency_stats(self):
+        """Tests recording the latency of pipeline stages.
+        """
+        hparams = copy.copy(self._hparams)
+        hparams.update({"latency_stats": True})
+        text_data = tx.data.MonoTextData(hparams)
+        self.assertIsNotNone(text_data.stats_aggregator)
+        self._run_and_test(hparams)
+
     def test_other_transformations(self):
         """Tests use of other transformations
         """
@@ -20,10 +20,9 @@ from texar.data.data.scalar_data import ScalarData
 from texar.data.data.mono_text_data import _default_mono_text_dataset_hparams
 from texar.data.data.scalar_data import _default_scalar_dataset_hparams
 from texar.data.data.mono_text_data import MonoTextData
-from texar.data.data_utils import count_file_lines
 from texar.data.data import dataset_utils as dsutils
-from texar.data.vocabulary import Vocab, SpecialTokens
-from texar.data.embedding import Embedding
+from texar.data.vocabulary import SpecialTokens, get_shared_vocab
+from texar.data.embedding import get_shared_embedding
 
 # pylint: disable=invalid-name, arguments-differ, not-context-manager
 # pylint: disable=protected-access
@@ -144,13 +143,13 @@ class MultiAlignedData(TextDataBase):
                         eos_token == vocabs[vocab_shr].eos_token:
                     vocab = vocabs[vocab_shr]
                 else:
-                    vocab = Vocab(hparams[vocab_shr]["vocab_file"],
-                                  bos_token=bos_token,
-                                  eos_token=eos_token)
+                    vocab = get_shared_vocab(hparams[vocab_shr]["vocab_file"],
+                                             bos_token=bos_token,
+                                             eos_token=eos_token)
             else:
-                vocab = Vocab(hparams_i["vocab_file"],
-                              bos_token=bos_token,
-                              eos_token=eos_token)
+                vocab = get_shared_vocab(hparams_i["vocab_file"],
+                                         bos_token=bos_token,
+                                         eos_token=eos_token)
             vocabs.append(vocab)
 
         return vocabs
@@ -187,8 +186,8 @@ class MultiAlignedData(TextDataBase):
                 emb = None
                 emb_file = hparams_i["embedding_init"]["file"]
                 if emb_file and emb_file != "":
-                    emb = Embedding(vocabs[i].token_to_id_map_py,
-                                    hparams_i["embedding_init"])
+                    emb = get_shared_embedding(vocabs[i].token_to_id_map_py,
+                                               hparams_i["embedding_init"])
             embs.append(emb)
 
         return embs
@@ -296,7 +295,7 @@ class MultiAlignedData(TextDataBase):
         tran_fn, data_spec = self._make_processor(
             hparams["datasets"], data_spec, name_prefix)
 
-        num_parallel_calls = hparams["num_parallel_calls"]
+        num_parallel_calls = self._get_num_parallel_calls(hparams)
         dataset = dataset.map(
             lambda *args: tran_fn(dsutils.maybe_tuple(args)),
             num_parallel_calls=num_parallel_calls)
@@ -359,17 +358,34 @@ class MultiAlignedData(TextDataBase):
 
         # Create dataset
         dataset = self._make_dataset()
-        dataset, dataset_size = self._shuffle_dataset(
-            dataset, self._hparams, self._hparams.datasets[0].files)
+        dataset = self._shard_dataset(dataset, self._hparams)
+        dataset_size = None
+        if not self._is_cached(self._hparams):
+            dataset, dataset_size = self._shuffle_dataset(
+                dataset, self._hparams, self._hparams.datasets[0].files,
+                line_sharded=True)
         self._dataset_size = dataset_size
 
         # Processing
+        dataset = self._record_latency(dataset, self._hparams, "read")
         data_spec = dsutils._DataSpec(dataset=dataset,
                                       dataset_size=self._dataset_size,
                                       vocab=self._vocab,
                                       embedding=self._embedding)
         dataset, data_spec = self._process_dataset(
             dataset, self._hparams, data_spec)
+        dataset = self._record_latency(dataset, self._hparams, "process")
+
+        # Caching. The cached data is shuffled afterwards to avoid replaying
+        # the order of the first pass.
+        if self._is_cached(self._hparams):
+            dataset = self._cache_dataset(dataset, self._hparams)
+            dataset, dataset_size = self._shuffle_dataset(
+                dataset, self._hparams, self._hparams.datasets[0].files,
+                line_sharded=True)
+            self._dataset_size = dataset_size
+            data_spec.add_spec(dataset_size=dataset_size)
+
         self._data_spec = data_spec
         self._decoder = data_spec.decoder
 
@@ -378,10 +394,12 @@ class MultiAlignedData(TextDataBase):
         padded_shapes = self._make_padded_shapes(dataset, self._decoder)
         dataset = self._make_batch(
             dataset, self._hparams, length_fn, padded_shapes)
+        dataset = self._record_latency(dataset, self._hparams, "batch")
 
         # Prefetching
-        if self._hparams.prefetch_buffer_size > 0:
-            dataset = dataset.prefetch(self._hparams.prefetch_buffer_size)
+        dataset = self._prefetch_dataset(dataset, self._hparams)
+        dataset = self._record_latency(dataset, self._hparams, "prefetch")
+        dataset = self._attach_stats_aggregator(dataset)
 
         self._dataset = dataset
 
@@ -403,13 +421,15 @@ class MultiAlignedData(TextDataBase):
     def dataset_size(self):
         """Returns the number of data instances in the dataset.
 
-        Note that this is the total data count in the raw files, before any
-        filtering and truncation.
+        Note that this is the total data count in the raw files (or in the
+        shard of the files as per :attr:`"num_shards"` and
+        :attr:`"shard_index"`), before any filtering and truncation.
         """
         if not self._dataset_size:
             # pylint: disable=attribute-defined-outside-init
-            self._dataset_size = count_file_lines(
-                self._hparams.datasets[0].files)
+            self._dataset_size = self._count_shard_lines(
+                self._hparams.datasets[0].files, self._hparams,
+                line_sharded=True)
         return self._dataset_size
 
     def _maybe_name_to_id(self, name_or_id):
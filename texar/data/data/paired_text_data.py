@@ -29,10 +29,9 @@ from texar.utils.dtypes import is_callable
 from texar.data.data.mono_text_data import _default_mono_text_dataset_hparams
 from texar.data.data.text_data_base import TextDataBase
 from texar.data.data.mono_text_data import MonoTextData
-from texar.data.data_utils import count_file_lines
 from texar.data.data import dataset_utils as dsutils
-from texar.data.vocabulary import Vocab, SpecialTokens
-from texar.data.embedding import Embedding
+from texar.data.vocabulary import SpecialTokens, get_shared_vocab
+from texar.data.embedding import get_shared_embedding
 
 # pylint: disable=invalid-name, arguments-differ, not-context-manager
 # pylint: disable=protected-access, too-many-arguments
@@ -117,13 +116,13 @@ class PairedTextData(TextDataBase):
                     tgt_eos_token == src_vocab.eos_token:
                 tgt_vocab = src_vocab
             else:
-                tgt_vocab = Vocab(src_hparams["vocab_file"],
-                                  bos_token=tgt_bos_token,
-                                  eos_token=tgt_eos_token)
+                tgt_vocab = get_shared_vocab(src_hparams["vocab_file"],
+                                             bos_token=tgt_bos_token,
+                                             eos_token=tgt_eos_token)
         else:
-            tgt_vocab = Vocab(tgt_hparams["vocab_file"],
-                              bos_token=tgt_bos_token,
-                              eos_token=tgt_eos_token)
+            tgt_vocab = get_shared_vocab(tgt_hparams["vocab_file"],
+                                         bos_token=tgt_bos_token,
+                                         eos_token=tgt_eos_token)
 
         return src_vocab, tgt_vocab
 
@@ -145,7 +144,8 @@ class PairedTextData(TextDataBase):
             tgt_emb_file = tgt_emb_hparams["file"]
             tgt_embedding = None
             if tgt_emb_file is not None and tgt_emb_file != "":
-                tgt_embedding = Embedding(tgt_token_to_id_map, tgt_emb_hparams)
+                tgt_embedding = get_shared_embedding(tgt_token_to_id_map,
+                                                     tgt_emb_hparams)
 
         return src_embedding, tgt_embedding
 
@@ -217,7 +217,7 @@ class PairedTextData(TextDataBase):
             hparams["source_dataset"], hparams["target_dataset"],
             data_spec, name_prefix=name_prefix)
 
-        num_parallel_calls = hparams["num_parallel_calls"]
+        num_parallel_calls = self._get_num_parallel_calls(hparams)
         dataset = dataset.map(
             lambda *args: tran_fn(dsutils.maybe_tuple(args)),
             num_parallel_calls=num_parallel_calls)
@@ -290,17 +290,34 @@ class PairedTextData(TextDataBase):
 
         # Create dataset
         dataset = self._make_dataset()
-        dataset, dataset_size = self._shuffle_dataset(
-            dataset, self._hparams, self._hparams.source_dataset.files)
+        dataset = self._shard_dataset(dataset, self._hparams)
+        dataset_size = None
+        if not self._is_cached(self._hparams):
+            dataset, dataset_size = self._shuffle_dataset(
+                dataset, self._hparams, self._hparams.source_dataset.files,
+                line_sharded=True)
         self._dataset_size = dataset_size
 
         # Processing.
+        dataset = self._record_latency(dataset, self._hparams, "read")
         data_spec = dsutils._DataSpec(
             dataset=dataset, dataset_size=self._dataset_size,
             vocab=[self._src_vocab, self._tgt_vocab],
             embedding=[self._src_embedding, self._tgt_embedding])
         dataset, data_spec = self._process_dataset(
             dataset, self._hparams, data_spec)
+        dataset = self._record_latency(dataset, self._hparams, "process")
+
+        # Caching. The cached data is shuffled afterwards to avoid replaying
+        # the order of the first pass.
+        if self._is_cached(self._hparams):
+            dataset = self._cache_dataset(dataset, self._hparams)
+            dataset, dataset_size = self._shuffle_dataset(
+                dataset, self._hparams, self._hparams.source_dataset.files,
+                line_sharded=True)
+            self._dataset_size = dataset_size
+            data_spec.add_spec(dataset_size=dataset_size)
+
         self._data_spec = data_spec
         self._decoder = data_spec.decoder
         self._src_decoder = data_spec.decoder[0]
@@ -312,10 +329,12 @@ class PairedTextData(TextDataBase):
             dataset, self._src_decoder, self._tgt_decoder)
         dataset = self._make_batch(
             dataset, self._hparams, length_fn, padded_shapes)
+        dataset = self._record_latency(dataset, self._hparams, "batch")
 
         # Prefetching
-        if self._hparams.prefetch_buffer_size > 0:
-            dataset = dataset.prefetch(self._hparams.prefetch_buffer_size)
+        dataset = self._prefetch_dataset(dataset, self._hparams)
+        dataset = self._record_latency(dataset, self._hparams, "prefetch")
+        dataset = self._attach_stats_aggregator(dataset)
 
         self._dataset = dataset
 
@@ -336,13 +355,15 @@ class PairedTextData(TextDataBase):
     def dataset_size(self):
         """Returns the number of data instances in the dataset.
 
-        Note that this is the total data count in the raw files, before any
-        filtering and truncation.
+        Note that this is the total data count in the raw files (or in the
+        shard of the files as per :attr:`"num_shards"` and
+        :attr:`"shard_index"`), before any filtering and truncation.
         """
         if not self._dataset_size:
             # pylint: disable=attribute-defined-outside-init
-            self._dataset_size = count_file_lines(
-                self._hparams.source_dataset.files)
+            self._dataset_size = self._count_shard_lines(
+                self._hparams.source_dataset.files, self._hparams,
+                line_sharded=True)
         return self._dataset_size
 
     @property
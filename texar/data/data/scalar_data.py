@@ -11,7 +11,6 @@ from __future__ import unicode_literals
 
 import tensorflow as tf
 
-from texar.data.data_utils import count_file_lines
 from texar.data.data import dataset_utils as dsutils
 from texar.data.data.data_base import DataBase
 from texar.data.data.mono_text_data import MonoTextData
@@ -98,7 +97,7 @@ class ScalarData(DataBase):
         chained_tran, data_spec = self._make_processor(
             hparams["dataset"], data_spec,
             name_prefix=hparams["dataset"]["data_name"])
-        num_parallel_calls = hparams["num_parallel_calls"]
+        num_parallel_calls = self._get_num_parallel_calls(hparams)
         dataset = dataset.map(
             lambda *args: chained_tran(dsutils.maybe_tuple(args)),
             num_parallel_calls=num_parallel_calls)
@@ -112,26 +111,43 @@ class ScalarData(DataBase):
         dataset_hparams = self._hparams.dataset
 
         # Create and shuffle dataset
-        dataset = MonoTextData._make_mono_text_dataset(dataset_hparams)
-        dataset, dataset_size = self._shuffle_dataset(
-            dataset, self._hparams, self._hparams.dataset.files)
+        dataset = MonoTextData._make_mono_text_dataset(dataset_hparams,
+                                                       self._hparams)
+        dataset_size = None
+        if not self._is_cached(self._hparams):
+            dataset, dataset_size = self._shuffle_dataset(
+                dataset, self._hparams, self._hparams.dataset.files)
         self._dataset_size = dataset_size
 
         # Processing
         # pylint: disable=protected-access
+        dataset = self._record_latency(dataset, self._hparams, "read")
         data_spec = dsutils._DataSpec(dataset=dataset,
                                       dataset_size=self._dataset_size)
         dataset, data_spec = self._process_dataset(dataset, self._hparams,
                                                    data_spec)
+        dataset = self._record_latency(dataset, self._hparams, "process")
+
+        # Caching. The cached data is shuffled afterwards to avoid replaying
+        # the order of the first pass.
+        if self._is_cached(self._hparams):
+            dataset = self._cache_dataset(dataset, self._hparams)
+            dataset, dataset_size = self._shuffle_dataset(
+                dataset, self._hparams, self._hparams.dataset.files)
+            self._dataset_size = dataset_size
+            data_spec.add_spec(dataset_size=dataset_size)
+
         self._data_spec = data_spec
         self._decoder = data_spec.decoder # pylint: disable=no-member
 
         # Batching
         dataset = self._make_batch(dataset, self._hparams)
+        dataset = self._record_latency(dataset, self._hparams, "batch")
 
         # Prefetching
-        if self._hparams.prefetch_buffer_size > 0:
-            dataset = dataset.prefetch(self._hparams.prefetch_buffer_size)
+        dataset = self._prefetch_dataset(dataset, self._hparams)
+        dataset = self._record_latency(dataset, self._hparams, "prefetch")
+        dataset = self._attach_stats_aggregator(dataset)
 
         self._dataset = dataset
 
@@ -152,13 +168,14 @@ class ScalarData(DataBase):
     def dataset_size(self):
         """Returns the number of data instances in the dataset.
 
-        Note that this is the total data count in the raw files, before any
-        filtering and truncation.
+        Note that this is the total data count in the raw files (or in the
+        shard of the files as per :attr:`"num_shards"` and
+        :attr:`"shard_index"`), before any filtering and truncation.
         """
         if not self._dataset_size:
             # pylint: disable=attribute-defined-outside-init
-            self._dataset_size = count_file_lines(
-                self._hparams.dataset.files)
+            self._dataset_size = self._count_shard_lines(
+                self._hparams.dataset.files, self._hparams)
         return self._dataset_size
 
     @property
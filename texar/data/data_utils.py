@@ -10,9 +10,12 @@ from __future__ import unicode_literals
 
 import os
 import sys
+import json
+import hashlib
 import tarfile
 import zipfile
 import collections
+import multiprocessing
 import numpy as np
 from six.moves import urllib
 import requests
@@ -26,12 +29,18 @@ __all__ = [
     "maybe_download",
     "get_files",
     "read_words",
+    "count_words",
     "make_vocab",
-    "count_file_lines"
+    "count_file_lines",
+    "get_line_offsets",
+    "get_cache_filename"
 ]
 
 Py3 = sys.version_info[0] == 3
 
+_BLOCK_SIZE = 1 << 24
+_LINE_OFFSET_DTYPE = np.dtype('<u8')
+
 def create_dir_if_needed(dirname):
     """Creates directory if doesn't exist
     """
@@ -208,8 +217,125 @@ def read_words(filename, newline_token=None):
                         .replace("\n", newline_token).split())
 
 
-def make_vocab(filenames, max_vocab_size=-1,
-               newline_token=None, return_type="list"):
+_WHITESPACES = b' \t\n\r\x0b\x0c'
+
+def _find_chunk_boundary(f, pos, file_size, separators):
+    """Returns the smallest position `p >= pos` such that `p` is the start or
+    end of the file, or the byte at `p - 1` is one of :attr:`separators`.
+    """
+    if pos <= 0:
+        return 0
+    if pos >= file_size:
+        return file_size
+    f.seek(pos - 1)
+    block_size = 1 << 16
+    while True:
+        block = f.read(block_size)
+        if not block:
+            return file_size
+        indexes = [block.find(sep) for sep in separators]
+        indexes = [i for i in indexes if i >= 0]
+        if indexes:
+            return pos + min(indexes)
+        pos += len(block)
+
+def _count_words_in_chunk(args):
+    """Counts words in a chunk of a file.
+
+    Args:
+        args (tuple): `(filename, start, end, newline_token)`, where `start`
+            and `end` are approximate byte offsets of the chunk. The actual
+            chunk is extended to the closest boundaries that do not split a
+            word (see :func:`_find_chunk_boundary`), so that adjacent chunks
+            are counted without overlap or loss.
+
+    Returns:
+        A tuple of a :class:`collections.Counter` of the words and the number
+        of bytes of the chunk.
+    """
+    filename, start, end, newline_token = args
+    separators = _WHITESPACES
+    if newline_token is not None:
+        # `newline_token` is concatenated with neighboring words, so a chunk
+        # must not end at a newline.
+        separators = separators.replace(b'\n', b'')
+    separators = [separators[i:i+1] for i in range(len(separators))]
+
+    file_size = tf.gfile.Stat(filename).length
+    with tf.gfile.GFile(filename, "rb") as f:
+        start = _find_chunk_boundary(f, start, file_size, separators)
+        end = _find_chunk_boundary(f, end, file_size, separators)
+        counter = collections.Counter()
+        if end <= start:
+            return counter, 0
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+    if newline_token is not None:
+        text = text.replace("\n", newline_token)
+    counter.update(text.split())
+    return counter, end - start
+
+def count_words(filenames, newline_token=None, num_parallel_calls=1,
+                chunk_size=1<<26, verbose=False):
+    """Counts words in files.
+
+    Files are read in chunks of about :attr:`chunk_size` bytes, and the
+    chunks are counted in parallel with a process pool, so that memory usage
+    is bounded by the chunk size and the number of unique words.
+
+    Args:
+        filenames (str): A (list of) files.
+        newline_token (str): The token to replace the original newline
+            token `\n`. For example, `newline_token=tx.data.SpecialTokens.EOS`.
+            If `None`, no replacement is performed.
+        num_parallel_calls (int): Number of processes to count chunks in
+            parallel. If `1` (default), counts in the current process.
+        chunk_size (int): Approximate number of bytes of each chunk.
+        verbose (bool): Whether to print the counting progress.
+
+    Returns:
+        A :class:`collections.Counter` mapping words to their frequencies.
+    """
+    if not isinstance(filenames, (list, tuple)):
+        filenames = [filenames]
+
+    chunks = []
+    total_size = 0
+    for fn in filenames:
+        file_size = tf.gfile.Stat(fn).length
+        total_size += file_size
+        for start in range(0, max(file_size, 1), chunk_size):
+            chunks.append((fn, start, start + chunk_size, newline_token))
+
+    if num_parallel_calls > 1:
+        pool = multiprocessing.Pool(num_parallel_calls)
+        results = pool.imap_unordered(_count_words_in_chunk, chunks)
+    else:
+        pool = None
+        results = (_count_words_in_chunk(chunk) for chunk in chunks)
+
+    counter = collections.Counter()
+    counted_size = 0
+    try:
+        for chunk_counter, size in results:
+            counter.update(chunk_counter)
+            counted_size += size
+            if verbose:
+                sys.stdout.write('\r>> Counting words %.1f%%' %
+                                 (100. * counted_size / max(total_size, 1)))
+                sys.stdout.flush()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    if verbose:
+        print()
+
+    return counter
+
+def make_vocab(filenames, max_vocab_size=-1, newline_token=None,
+               return_type="list", num_parallel_calls=1, chunk_size=1<<26,
+               verbose=False):
     """Builds vocab of the files.
 
     Args:
@@ -224,18 +350,20 @@ def make_vocab(filenames, max_vocab_size=-1,
             function returns a list of words sorted by frequency. If "dict",
             this function returns a dict mapping words to their index sorted
             by frequency.
+        num_parallel_calls (int): Number of processes to count words in
+            parallel. See :func:`count_words`.
+        chunk_size (int): Approximate number of bytes of each file chunk
+            counted at a time. See :func:`count_words`.
+        verbose (bool): Whether to print the counting progress.
 
     Returns:
         A list or dict.
     """
-    if not isinstance(filenames, (list, tuple)):
-        filenames = [filenames]
-
-    words = []
-    for fn in filenames:
-        words += read_words(fn, newline_token=newline_token)
-
-    counter = collections.Counter(words)
+    counter = count_words(filenames,
+                          newline_token=newline_token,
+                          num_parallel_calls=num_parallel_calls,
+                          chunk_size=chunk_size,
+                          verbose=verbose)
     count_pairs = sorted(counter.items(), key=lambda x: (-x[1], x[0]))
 
     words, _ = list(zip(*count_pairs))
@@ -251,21 +379,152 @@ def make_vocab(filenames, max_vocab_size=-1,
         raise ValueError("Unknown return_type: {}".format(return_type))
 
 
-def count_file_lines(filenames):
+def count_file_lines(filenames, cache_dir=None):
     """Counts the number of lines in the file(s).
+
+    Lines are counted by scanning the files in large byte blocks. If
+    :attr:`cache_dir` is given and contains an up-to-date line offset index
+    of a file (see :func:`get_line_offsets`), the count is read from the
+    index instead.
+
+    Args:
+        filenames: A (list of) path to the files.
+        cache_dir (str, optional): Directory of the line offset indexes.
     """
     def _count_lines(fn):
+        if cache_dir:
+            index_fn = _get_line_index_filename(fn, cache_dir)
+            if tf.gfile.Exists(index_fn):
+                return tf.gfile.Stat(index_fn).length // \
+                    _LINE_OFFSET_DTYPE.itemsize
+        num_lines = 0
+        last_block = b''
         with open(fn, "rb") as f:
-            i = -1
-            for i, _ in enumerate(f):
-                pass
-            return i + 1
+            for block in iter(lambda: f.read(_BLOCK_SIZE), b''):
+                num_lines += block.count(b'\n')
+                last_block = block
+        if last_block and not last_block.endswith(b'\n'):
+            # The last line has no trailing newline
+            num_lines += 1
+        return num_lines
 
     if not isinstance(filenames, (list, tuple)):
         filenames = [filenames]
     num_lines = np.sum([_count_lines(fn) for fn in filenames])
     return num_lines
 
+def _get_line_index_filename(filename, cache_dir):
+    """Returns the path of the line offset index of :attr:`filename` in
+    :attr:`cache_dir`, keyed by the path, size and modification time of the
+    file.
+    """
+    stat = tf.gfile.Stat(filename)
+    key = json.dumps([filename, stat.length, stat.mtime_nsec])
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, "%s.%s.line_offsets" %
+                        (os.path.basename(filename), digest))
 
+def get_line_offsets(filename, cache_dir=None):
+    """Returns the byte offsets of the beginning of each line in a file.
 
+    The offsets are computed by scanning the file in large byte blocks. If
+    :attr:`cache_dir` is given, they are cached in a file of `uint64` values
+    in :attr:`cache_dir`, so that later calls only read the cached file. The
+    cached file is keyed by the path, size and modification time of the
+    data file, so it is not read once the data file is modified.
 
+    Args:
+        filename (str): Path to the file.
+        cache_dir (str, optional): Directory to read the offsets from and
+            write them to. If `None` (default), the offsets are not cached.
+            If the cached file cannot be written, the offsets are returned
+            without caching.
+
+    Returns:
+        A 1D `uint64` numpy array of length equal to the number of lines.
+    """
+    if cache_dir:
+        index_filename = _get_line_index_filename(filename, cache_dir)
+        if tf.gfile.Exists(index_filename):
+            with tf.gfile.GFile(index_filename, "rb") as f:
+                return np.frombuffer(f.read(), dtype=_LINE_OFFSET_DTYPE)
+
+    offsets = [np.zeros([1], dtype=_LINE_OFFSET_DTYPE)]
+    pos = 0
+    with tf.gfile.GFile(filename, "rb") as f:
+        while True:
+            block = f.read(_BLOCK_SIZE)
+            if not block:
+                break
+            newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) ==
+                                      ord('\n'))
+            offsets.append((newlines + pos + 1).astype(_LINE_OFFSET_DTYPE))
+            pos += len(block)
+    offsets = np.concatenate(offsets)
+    if offsets[-1] == pos:
+        # Drops the offset of the end of file
+        offsets = offsets[:-1]
+
+    if cache_dir:
+        tmp_filename = "%s.%d.tmp" % (index_filename, os.getpid())
+        try:
+            if not tf.gfile.IsDirectory(cache_dir):
+                tf.gfile.MakeDirs(cache_dir)
+            with tf.gfile.GFile(tmp_filename, "wb") as f:
+                f.write(offsets.tobytes())
+            tf.gfile.Rename(tmp_filename, index_filename, overwrite=True)
+        except (IOError, OSError, tf.errors.OpError):
+            tf.logging.warning("Unable to write line offset index: %s",
+                               index_filename)
+
+    return offsets
+
+def get_cache_filename(prefix, hparams):
+    """Returns a file path to cache a dataset in (see the :attr:`"cache"`
+    hyperparameter of, e.g., :class:`~texar.data.MonoTextData`), keyed by
+    the data hyperparameters and the data and vocab files.
+
+    The path is :attr:`prefix` followed by a hash of :attr:`hparams`
+    (excluding :attr:`"cache"` and :attr:`"line_index_dir"`) and of the path, size and modification
+    time of every file in the :attr:`"files"` and :attr:`"vocab_file"`
+    fields of the dataset hyperparameters. Hence a cache written with other
+    data, vocab or processing hyperparameters is not read; the stale cache
+    files are left on disk.
+
+    Args:
+        prefix (str): Prefix of the cache path, e.g., `"log_dir/valid"`.
+        hparams (dict or HParams): The data hyperparameters.
+
+    Returns:
+        A string of the cache path.
+    """
+    if hasattr(hparams, "todict"):
+        hparams = hparams.todict()
+    hparams = dict(hparams)
+    hparams.pop("cache", None)
+    hparams.pop("line_index_dir", None)
+
+    def _files(dataset_hparams):
+        files = []
+        for key in ["files", "vocab_file"]:
+            value = dataset_hparams.get(key)
+            if not value:
+                continue
+            if not isinstance(value, (list, tuple)):
+                value = [value]
+            files.extend(value)
+        return files
+
+    dataset_hparams = [value for key, value in sorted(hparams.items())
+                       if key.endswith("dataset") and isinstance(value, dict)]
+    dataset_hparams += [value for value in hparams.get("datasets", [])
+                        if isinstance(value, dict)]
+    file_stats = []
+    for dataset in dataset_hparams:
+        for fn in _files(dataset):
+            stat = tf.gfile.Stat(fn)
+            file_stats.append([fn, stat.length, stat.mtime_nsec])
+
+    key = json.dumps([hparams, file_stats], sort_keys=True, default=str)
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return "%s.%s.data_cache" % (prefix, digest)
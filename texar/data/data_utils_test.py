@@ -9,6 +9,8 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import os
+import shutil
 import tempfile
 
 import tensorflow as tf
@@ -34,6 +36,90 @@ class CountFileLinesTest(tf.test.TestCase):
             [file_1.name, file_2.name, file_2.name])
         self.assertEqual(num_lines, 0+5+5)
 
+    def test_get_line_offsets(self):
+        """Tests the get_line_offsets function and its cached index.
+        """
+        text_file = tempfile.NamedTemporaryFile(mode="w+")
+        text_file.write('\n'.join(['x', 'yy', '', 'zzz']))
+        text_file.flush()
+        cache_dir = tempfile.mkdtemp()
+
+        # No file is written by default
+        offsets = data_utils.get_line_offsets(text_file.name)
+        self.assertEqual(offsets.tolist(), [0, 2, 5, 6])
+        self.assertFalse(tf.gfile.Exists(text_file.name + ".line_offsets"))
+
+        offsets = data_utils.get_line_offsets(text_file.name, cache_dir)
+        self.assertEqual(offsets.tolist(), [0, 2, 5, 6])
+        self.assertEqual(len(tf.gfile.ListDirectory(cache_dir)), 1)
+        offsets = data_utils.get_line_offsets(text_file.name, cache_dir)
+        self.assertEqual(offsets.tolist(), [0, 2, 5, 6])
+        self.assertEqual(
+            data_utils.count_file_lines(text_file.name, cache_dir), 4)
+
+        # A file of another size is indexed anew, even with the same
+        # modification time
+        stat = os.stat(text_file.name)
+        text_file.write('\nw')
+        text_file.flush()
+        os.utime(text_file.name, (stat.st_atime, stat.st_mtime))
+        offsets = data_utils.get_line_offsets(text_file.name, cache_dir)
+        self.assertEqual(offsets.tolist(), [0, 2, 5, 6, 10])
+        self.assertEqual(
+            data_utils.count_file_lines(text_file.name, cache_dir), 5)
+        shutil.rmtree(cache_dir)
+
+    def test_get_cache_filename(self):
+        """Tests that the cache filename changes with the data files and
+        hyperparameters.
+        """
+        text_file = tempfile.NamedTemporaryFile(mode="w+")
+        text_file.write('x\ny')
+        text_file.flush()
+        hparams = {"dataset": {"files": text_file.name,
+                               "max_seq_length": 10}}
+        filename = data_utils.get_cache_filename("cache", hparams)
+        self.assertTrue(filename.startswith("cache."))
+        self.assertEqual(
+            data_utils.get_cache_filename("cache", hparams), filename)
+
+        hparams["cache"] = filename
+        self.assertEqual(
+            data_utils.get_cache_filename("cache", hparams), filename)
+
+        hparams["dataset"]["max_seq_length"] = 20
+        filename_2 = data_utils.get_cache_filename("cache", hparams)
+        self.assertNotEqual(filename_2, filename)
+
+        text_file.write('\nz')
+        text_file.flush()
+        self.assertNotEqual(
+            data_utils.get_cache_filename("cache", hparams), filename_2)
+
+
+class MakeVocabTest(tf.test.TestCase):
+    """Tests :func:`texar.data.data_utils.make_vocab`.
+    """
+
+    def test_make_vocab(self):
+        """Tests chunked and parallel vocab making.
+        """
+        text_file = tempfile.NamedTemporaryFile(mode="w+")
+        text_file.write('\n'.join(['a b b', 'c c c', 'b c', '']))
+        text_file.flush()
+
+        vocab = data_utils.make_vocab(text_file.name)
+        self.assertEqual(vocab, ('c', 'b', 'a'))
+
+        vocab_ = data_utils.make_vocab(
+            [text_file.name, text_file.name], num_parallel_calls=2,
+            chunk_size=3)
+        self.assertEqual(vocab_, vocab)
+
+        counter = data_utils.count_words(
+            text_file.name, newline_token='<EOS>', chunk_size=2)
+        self.assertEqual(counter['b<EOS>c'], 2)
+
 
 if __name__ == "__main__":
     tf.test.main()
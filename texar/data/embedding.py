@@ -20,6 +20,13 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import os
+import io
+import json
+import mmap
+import hashlib
+import weakref
+
 import tensorflow as tf
 from tensorflow import gfile
 import numpy as np
@@ -30,77 +37,181 @@ from texar.hyperparams import HParams
 __all__ = [
     "load_word2vec",
     "load_glove",
-    "Embedding"
+    "Embedding",
+    "get_shared_embedding"
 ]
 
-def load_word2vec(filename, vocab, word_vecs):
+_READ_BUFFER_SIZE = 1 << 22
+
+def _open_file(filename):
+    """Opens a file for binary reading. Local files are opened with a large
+    read buffer, and other files (e.g., on HDFS or GCS) with
+    :tf_main:`GFile <gfile/GFile>`.
+    """
+    if os.path.isfile(filename):
+        return io.open(filename, "rb", buffering=_READ_BUFFER_SIZE)
+    return gfile.GFile(filename, "rb")
+
+def _map_file(filename):
+    """Returns the content of a file as a buffer that supports slicing,
+    :meth:`find`, and :func:`numpy.frombuffer`. Local files are memory-mapped
+    instead of read into memory.
+    """
+    if os.path.isfile(filename):
+        with io.open(filename, "rb") as fin:
+            if os.fstat(fin.fileno()).st_size == 0:
+                return b''
+            return mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+    with gfile.GFile(filename, "rb") as fin:
+        return fin.read()
+
+def load_word2vec(filename, vocab, word_vecs, return_found=False):
     """Loads embeddings in the word2vec binary format which has a header line
     containing the number of vectors and their dimensionality (two integers),
     followed with number-of-vectors lines each of which is formatted as
     '<word-string> <embedding-vector>'.
 
+    Local files are memory-mapped, and vectors of tokens in :attr:`vocab`
+    are copied directly from the mapped buffer.
+
     Args:
         filename (str): Path to the embedding file.
         vocab (dict): A dictionary that maps token strings to integer index.
             Tokens not in :attr:`vocab` are not read.
         word_vecs: A 2D numpy array of shape `[vocab_size, embed_dim]`
             which is updated as reading from the file.
+        return_found (bool): Whether to also return a boolean mask of the
+            rows of :attr:`word_vecs` whose tokens are found in the file.
 
     Returns:
-        The updated :attr:`word_vecs`.
+        The updated :attr:`word_vecs`, or a tuple of it and the mask of the
+        found tokens if :attr:`return_found` is `True`.
     """
-    with gfile.GFile(filename, "rb") as fin:
-        header = fin.readline()
-        vocab_size, vector_size = [int(s) for s in header.split()]
+    found = np.zeros(word_vecs.shape[0], dtype=bool)
+    buf = _map_file(filename)
+    try:
+        pos = buf.find(b'\n') + 1
+        vocab_size, vector_size = [int(s) for s in buf[:pos].split()]
         if vector_size != word_vecs.shape[1]:
             raise ValueError("Inconsistent word vector sizes: %d vs %d" %
                              (vector_size, word_vecs.shape[1]))
         binary_len = np.dtype('float32').itemsize * vector_size
-        for _ in np.arange(vocab_size):
-            chars = []
-            while True:
-                char = fin.read(1)
-                if char == b' ':
-                    break
-                if char != b'\n':
-                    chars.append(char)
-            word = b''.join(chars)
-            word = tf.compat.as_text(word)
+        for _ in range(vocab_size):
+            end = buf.find(b' ', pos)
+            word = tf.compat.as_text(buf[pos:end].replace(b'\n', b''))
+            pos = end + 1
             if word in vocab:
-                word_vecs[vocab[word]] = np.fromstring(
-                    fin.read(binary_len), dtype='float32')
-            else:
-                fin.read(binary_len)
+                word_vecs[vocab[word]] = np.frombuffer(
+                    buf, dtype='float32', count=vector_size, offset=pos)
+                found[vocab[word]] = True
+            pos += binary_len
+    finally:
+        if isinstance(buf, mmap.mmap):
+            buf.close()
+    if return_found:
+        return word_vecs, found
     return word_vecs
 
-def load_glove(filename, vocab, word_vecs):
+def load_glove(filename, vocab, word_vecs, return_found=False):
     """Loads embeddings in the glove text format in which each line is
     '<word-string> <embedding-vector>'. Dimensions of the embedding vector
     are separated with whitespace characters.
 
+    Only the leading word of each line is split out in Python. The vectors
+    of tokens in :attr:`vocab` are parsed with :func:`numpy.fromstring`.
+
     Args:
         filename (str): Path to the embedding file.
         vocab (dict): A dictionary that maps token strings to integer index.
             Tokens not in :attr:`vocab` are not read.
         word_vecs: A 2D numpy array of shape `[vocab_size, embed_dim]`
             which is updated as reading from the file.
+        return_found (bool): Whether to also return a boolean mask of the
+            rows of :attr:`word_vecs` whose tokens are found in the file.
 
     Returns:
-        The updated :attr:`word_vecs`.
+        The updated :attr:`word_vecs`, or a tuple of it and the mask of the
+        found tokens if :attr:`return_found` is `True`.
     """
-    with gfile.GFile(filename) as fin:
+    found = np.zeros(word_vecs.shape[0], dtype=bool)
+    with _open_file(filename) as fin:
         for line in fin:
-            vec = line.strip().split()
+            vec = line.split(None, 1)
             if len(vec) == 0:
                 continue
-            word, vec = vec[0], vec[1:]
-            word = tf.compat.as_text(word)
+            word = tf.compat.as_text(vec[0])
             if word not in vocab:
                 continue
+            vec = np.fromstring(vec[1] if len(vec) > 1 else b'',
+                                dtype=word_vecs.dtype, sep=' ')
             if len(vec) != word_vecs.shape[1]:
                 raise ValueError("Inconsistent word vector sizes: %d vs %d" %
                                  (len(vec), word_vecs.shape[1]))
-            word_vecs[vocab[word]] = np.array([float(v) for v in vec])
+            word_vecs[vocab[word]] = vec
+            found[vocab[word]] = True
+    if return_found:
+        return word_vecs, found
+    return word_vecs
+
+def _get_cache_path(cache_dir, filename, vocab, hparams):
+    """Returns the path of the cache file of the embedding of :attr:`vocab`
+    loaded from :attr:`filename`.
+
+    The cache is keyed by the embedding file (path, size and modification
+    time), the vocab, and the hyperparameters affecting the loaded values.
+    """
+    stat = gfile.Stat(filename)
+    read_fn = hparams.read_fn
+    read_fn = getattr(read_fn, '__name__', read_fn)
+    key = json.dumps([filename, stat.length, stat.mtime_nsec, hparams.dim,
+                      str(read_fn),
+                      sorted((k, int(v)) for k, v in vocab.items())])
+    digest = hashlib.md5(key.encode('utf-8')).hexdigest()
+    return os.path.join(
+        cache_dir, '%s.%s.npz' % (os.path.basename(filename), digest))
+
+def _read_with_cache(read_fn, filename, vocab, word_vecs, cache_path):
+    """Reads embedding with :attr:`read_fn`, and caches the read vectors in
+    :attr:`cache_path`. If the cache file exists, reads from the cache
+    instead. The cache file is accessed with
+    :tf_main:`GFile <gfile/GFile>`, so that :attr:`cache_path` can be on,
+    e.g., HDFS or GCS.
+
+    Only vectors of the tokens found in the embedding file are cached, along
+    with a mask of the found tokens, so that the other tokens keep the
+    initial values in :attr:`word_vecs`. The mask is returned by
+    :attr:`read_fn` if it has a `return_found` argument (as
+    :func:`load_word2vec` and :func:`load_glove`); otherwise all rows are
+    cached.
+    """
+    if gfile.Exists(cache_path):
+        with gfile.GFile(cache_path, 'rb') as fin:
+            cached = np.load(io.BytesIO(fin.read()))
+            word_vecs[cached['found']] = cached['vecs']
+        return word_vecs
+
+    try:
+        return_found = 'return_found' in utils.get_args(read_fn)
+    except TypeError:
+        return_found = False
+    if return_found:
+        word_vecs, found = read_fn(filename, vocab, word_vecs,
+                                   return_found=True)
+    else:
+        word_vecs = read_fn(filename, vocab, word_vecs)
+        found = np.ones(word_vecs.shape[0], dtype=bool)
+
+    if not gfile.IsDirectory(os.path.dirname(cache_path)):
+        gfile.MakeDirs(os.path.dirname(cache_path))
+    # Writes to a temporary file first to make concurrent readers never see
+    # a partially written cache.
+    buf = io.BytesIO()
+    np.savez(buf, found=found, vecs=word_vecs[found])
+    tmp_path = '%s.%d.tmp' % (cache_path, os.getpid())
+    with gfile.GFile(tmp_path, 'wb') as fout:
+        fout.write(buf.getvalue())
+    gfile.Rename(tmp_path, cache_path, overwrite=True)
+
     return word_vecs
 
 
@@ -141,8 +252,16 @@ class Embedding(object):
                 self._hparams.read_fn,
                 ["texar.data.embedding", "texar.data", "texar.custom"])
 
-            self._word_vecs = \
-                read_fn(self._hparams.file, vocab, self._word_vecs)
+            if self._hparams.cache_dir:
+                cache_path = _get_cache_path(
+                    self._hparams.cache_dir, self._hparams.file, vocab,
+                    self._hparams)
+                self._word_vecs = _read_with_cache(
+                    read_fn, self._hparams.file, vocab, self._word_vecs,
+                    cache_path)
+            else:
+                self._word_vecs = \
+                    read_fn(self._hparams.file, vocab, self._word_vecs)
 
     @staticmethod
     def default_hparams():
@@ -157,6 +276,7 @@ class Embedding(object):
                 "file": "",
                 "dim": 50,
                 "read_fn": "load_word2vec",
+                "cache_dir": "",
                 "init_fn": {
                     "type": "numpy.random.uniform",
                     "kwargs": {
@@ -190,7 +310,19 @@ class Embedding(object):
             one of the modules: :mod:`texar.data` or :mod:`texar.custom`.
 
             The function must have the same signature as with
-            :func:`load_word2vec`.
+            :func:`load_word2vec`. The `return_found` argument is optional;
+            without it, all vectors are saved in the cache of
+            :attr:`"cache_dir"`, including those of the tokens not in the
+            file.
+
+        "cache_dir" : str
+            Directory to cache the vectors read from :attr:`"file"`. If not
+            empty, the vectors of the vocab tokens are saved to a `.npz`
+            file keyed by the embedding file and the vocab on the first
+            read, and are loaded from the cache file in later runs. The
+            directory can be on any file system supported by
+            :tf_main:`GFile <gfile/GFile>`. If empty (default), no caching
+            is performed.
 
         "init_fn" : dict
             Hyperparameters of the initialization function used to initialize
@@ -214,6 +346,7 @@ class Embedding(object):
             "file": "",
             "dim": 50,
             "read_fn": "load_word2vec",
+            "cache_dir": "",
             "init_fn": {
                 "type": "numpy.random.uniform",
                 "kwargs": {
@@ -235,3 +368,36 @@ class Embedding(object):
         """The embedding dimention size.
         """
         return self._hparams.dim
+
+
+# Maps a graph to the embeddings loaded for the vocabs in that graph. See
+# :func:`texar.data.get_shared_vocab`.
+_shared_embeddings = weakref.WeakKeyDictionary()
+
+def get_shared_embedding(vocab, hparams=None):
+    """Returns an :class:`Embedding` instance that is shared by all callers
+    requesting the same :attr:`vocab` object and embedding
+    hyperparameters in the current default graph.
+
+    The embedding file is read only the first time the embedding is
+    requested. Use together with :func:`texar.data.get_shared_vocab` so that
+    data instances of the same vocab file share the :attr:`vocab` object.
+
+    Args:
+        vocab (dict): A dictionary that maps token strings to integer index.
+        hparams (dict or HParams, optional): Embedding hyperparameters. See
+            :meth:`Embedding.default_hparams`.
+
+    Returns:
+        An instance of :class:`Embedding`.
+    """
+    if isinstance(hparams, HParams):
+        hparams = hparams.todict()
+    hparams_key = json.dumps(hparams, sort_keys=True, default=str)
+    graph = tf.get_default_graph()
+    embeddings = _shared_embeddings.setdefault(graph, {})
+    key = (id(vocab), hparams_key)
+    if key not in embeddings:
+        # Keeps a reference to `vocab` so that its `id` is not reused
+        embeddings[key] = (vocab, Embedding(vocab, hparams))
+    return embeddings[key][1]
@@ -55,6 +55,12 @@ class EmbeddingTest(tf.test.TestCase):
         np.testing.assert_array_equal(word_vecs[0], [1.2, 3.4, 5.6])
         np.testing.assert_array_equal(word_vecs[1], [1., 3., 5.])
 
+        vocab["other"] = 2
+        word_vecs, found = embedding.load_glove(
+            glove_file.name, vocab, np.zeros([3, 3]), return_found=True)
+        np.testing.assert_array_equal(word_vecs[0], [1.2, 3.4, 5.6])
+        self.assertEqual(found.tolist(), [True, True, False])
+
     def test_load_word2vec(self):
         """Tests the load_word2vec function.
         """
@@ -77,6 +83,45 @@ class EmbeddingTest(tf.test.TestCase):
         np.testing.assert_array_equal(word_vecs[0], vec)
         np.testing.assert_array_equal(word_vecs[1], vec)
 
+    def test_embedding_cache(self):
+        """Tests loading embedding through the cache.
+        """
+        word_vec_lines = ["word 1.2 3.4 5.6", "词 1. 3. 5.", "nan nan 0. 0."]
+        glove_file = tempfile.NamedTemporaryFile(mode="w+")
+        if Py3:
+            glove_file.write('\n'.join(word_vec_lines))
+        else:
+            glove_file.write('\n'.join(word_vec_lines).encode("utf-8"))
+        glove_file.flush()
+        vocab = {"word": 0, "词": 1, "other": 2, "nan": 3}
+        hparams = {"file": glove_file.name, "dim": 3, "read_fn": "load_glove",
+                   "cache_dir": tempfile.mkdtemp()}
+
+        emb_1 = embedding.Embedding(vocab, hparams)
+        self.assertEqual(len(tf.gfile.ListDirectory(hparams["cache_dir"])), 1)
+        emb_2 = embedding.Embedding(vocab, hparams)
+
+        np.testing.assert_array_equal(emb_1.word_vecs[:2], emb_2.word_vecs[:2])
+        np.testing.assert_array_equal(emb_2.word_vecs[0], [1.2, 3.4, 5.6])
+        # Tokens missing in the embedding file are not cached
+        self.assertFalse(np.array_equal(emb_1.word_vecs[2],
+                                        emb_2.word_vecs[2]))
+        # NaN values in the embedding file are cached
+        self.assertTrue(np.isnan(emb_2.word_vecs[3, 0]))
+        np.testing.assert_array_equal(emb_2.word_vecs[3, 1:], [0., 0.])
+
+        # All vectors are cached if `read_fn` does not return the found
+        # tokens
+        def _read_fn(filename, vocab, word_vecs):
+            # pylint: disable=unused-argument
+            np.copyto(word_vecs[:1], [[1., 2., 3.]])
+            return word_vecs
+        hparams["read_fn"] = _read_fn
+        emb_1 = embedding.Embedding(vocab, hparams)
+        emb_2 = embedding.Embedding(vocab, hparams)
+        np.testing.assert_array_equal(emb_2.word_vecs[0], [1., 2., 3.])
+        np.testing.assert_array_equal(emb_1.word_vecs, emb_2.word_vecs)
+
     def test_embedding(self):
         """Tests :class:`texar.data.embedding.Embedding`.
         """
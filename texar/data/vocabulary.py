@@ -22,6 +22,7 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import warnings
+import weakref
 from collections import defaultdict
 
 import tensorflow as tf
@@ -35,7 +36,8 @@ from texar.utils.utils import dict_lookup
 
 __all__ = [
     "SpecialTokens",
-    "Vocab"
+    "Vocab",
+    "get_shared_vocab"
 ]
 
 class SpecialTokens(object):
@@ -318,3 +320,47 @@ class Vocab(object):
         """
         return [self._pad_token, self._bos_token, self._eos_token,
                 self._unk_token]
+
+
+# Maps a graph to the vocabs created in it. TF lookup tables belong to a
+# graph, so vocabs are shared only within the same graph, and are released
+# together with the graph.
+_shared_vocabs = weakref.WeakKeyDictionary()
+
+def get_shared_vocab(filename,
+                     pad_token=SpecialTokens.PAD,
+                     bos_token=SpecialTokens.BOS,
+                     eos_token=SpecialTokens.EOS,
+                     unk_token=SpecialTokens.UNK):
+    """Returns a :class:`Vocab` instance that is shared by all callers
+    requesting the same vocab file and special tokens in the current
+    default graph.
+
+    The vocab file is parsed, and the mapping tables are created, only when
+    the vocab is requested for the first time. This avoids building
+    duplicate tables when, e.g., the train, validation and test data all
+    use the same vocab file. A vocab is re-created if the vocab file has
+    been modified since the vocab was cached.
+
+    Args:
+        filename (str): Path to the vocabulary file where each line contains
+            one token.
+        pad_token (str): The padding token.
+        bos_token (str): The begin-of-sequence token.
+        eos_token (str): The end-of-sequence token.
+        unk_token (str): The unknown token.
+
+    Returns:
+        An instance of :class:`Vocab`.
+    """
+    graph = tf.get_default_graph()
+    vocabs = _shared_vocabs.setdefault(graph, {})
+    key = (filename, gfile.Stat(filename).mtime_nsec,
+           pad_token, bos_token, eos_token, unk_token)
+    if key not in vocabs:
+        vocabs[key] = Vocab(filename,
+                            pad_token=pad_token,
+                            bos_token=bos_token,
+                            eos_token=eos_token,
+                            unk_token=unk_token)
+    return vocabs[key]
@@ -54,6 +54,26 @@ class VocabularyTest(tf.test.TestCase):
         unk_token_text = vocab.id_to_token_map_py[unk_token_id]
         self.assertEqual(unk_token_text, vocab.unk_token)
 
+    def test_get_shared_vocab(self):
+        """Tests :func:`texar.data.vocabulary.get_shared_vocab`.
+        """
+        vocab_file = tempfile.NamedTemporaryFile()
+        vocab_file.write('\n'.join(['word', '词']).encode("utf-8"))
+        vocab_file.flush()
+
+        vocab_1 = vocabulary.get_shared_vocab(vocab_file.name)
+        vocab_2 = vocabulary.get_shared_vocab(vocab_file.name)
+        self.assertIs(vocab_1, vocab_2)
+
+        vocab_3 = vocabulary.get_shared_vocab(vocab_file.name,
+                                              bos_token='<S>')
+        self.assertIsNot(vocab_1, vocab_3)
+        self.assertEqual(vocab_3.bos_token, '<S>')
+
+        with tf.Graph().as_default():
+            vocab_4 = vocabulary.get_shared_vocab(vocab_file.name)
+            self.assertIsNot(vocab_1, vocab_4)
+
 
 if __name__ == "__main__":
     tf.test.main()
@@ -33,6 +33,9 @@ from __future__ import unicode_literals
 
 import collections
 import math
+import multiprocessing
+
+import numpy as np
 
 from texar.utils.dtypes import compat_as_text, is_str
 
@@ -41,7 +44,9 @@ from texar.utils.dtypes import compat_as_text, is_str
 
 __all__ = [
     "sentence_bleu",
-    "corpus_bleu"
+    "corpus_bleu",
+    "batch_sentence_bleu",
+    "BleuStats"
 ]
 
 def _get_ngrams(segment, max_order):
@@ -63,6 +68,94 @@ def _get_ngrams(segment, max_order):
             ngram_counts[ngram] += 1
     return ngram_counts
 
+def _get_id_ngram_matches(list_of_references, hypotheses, max_order):
+    """Counts the clipped n-gram matches and possible matches of each order
+    of each hypothesis in a batch of id sequences.
+
+    Each n-gram is encoded into an int64 key with a rolling code, i.e., the
+    code of an n-gram is the rank of the code of its (n-1)-gram prefix
+    times the vocabulary size plus its last id, which is exact and stays
+    small. The keys of all segments are counted at once with `np.unique`,
+    and matched against the reference counts with sorted-array lookup.
+
+    Returns:
+        A tuple `(matches_by_order, possible_matches_by_order)` of int64
+        arrays of shape `[num_hypotheses, max_order]`.
+    """
+    num_hyps = len(hypotheses)
+    matches_by_order = np.zeros([num_hyps, max_order], dtype=np.int64)
+    possible_matches_by_order = np.zeros([num_hyps, max_order],
+                                         dtype=np.int64)
+
+    segments = [np.asarray(hyp, dtype=np.int64).reshape(-1)
+                for hyp in hypotheses]
+    owners = list(range(num_hyps))
+    for i, references in enumerate(list_of_references):
+        for reference in references:
+            segments.append(np.asarray(reference, dtype=np.int64).reshape(-1))
+            owners.append(i)
+    owners = np.asarray(owners, dtype=np.int64)
+    lengths = [len(segment) for segment in segments]
+    if sum(lengths) == 0:
+        return matches_by_order, possible_matches_by_order
+
+    tokens = np.concatenate(segments)
+    tokens -= tokens.min()
+    base = tokens.max() + 1
+    segment_ids = np.repeat(np.arange(len(segments), dtype=np.int64), lengths)
+
+    codes = tokens
+    for order in range(1, max_order+1):
+        if order > 1:
+            if len(codes) < 2:
+                break
+            _, ranks = np.unique(codes[:-1], return_inverse=True)
+            codes = ranks.reshape(-1).astype(np.int64) * base + \
+                tokens[order-1:]
+        # Keeps the n-grams that do not cross segments
+        window_segment_ids = segment_ids[:len(codes)]
+        valid = window_segment_ids == segment_ids[order-1:]
+        segment_ids_ = window_segment_ids[valid]
+        unique_codes, codes_ = np.unique(codes[valid], return_inverse=True)
+        codes_ = codes_.reshape(-1).astype(np.int64)
+        num_codes = len(unique_codes)
+        is_hyp = segment_ids_ < num_hyps
+
+        # Counts of each n-gram of each hypothesis
+        hyp_keys, hyp_counts = np.unique(
+            segment_ids_[is_hyp] * num_codes + codes_[is_hyp],
+            return_counts=True)
+        possible_matches_by_order[:, order-1] = np.bincount(
+            segment_ids_[is_hyp], minlength=num_hyps)
+
+        # Max counts of each n-gram over the references of each hypothesis
+        is_ref = np.logical_not(is_hyp)
+        ref_keys, ref_counts = np.unique(
+            segment_ids_[is_ref] * num_codes + codes_[is_ref],
+            return_counts=True)
+        if len(ref_keys) == 0 or len(hyp_keys) == 0:
+            continue
+        ref_keys = owners[ref_keys // num_codes] * num_codes + \
+            ref_keys % num_codes
+        sorted_indexes = np.argsort(ref_keys, kind="mergesort")
+        ref_keys = ref_keys[sorted_indexes]
+        ref_counts = ref_counts[sorted_indexes]
+        starts = np.flatnonzero(
+            np.concatenate([[True], ref_keys[1:] != ref_keys[:-1]]))
+        ref_counts = np.maximum.reduceat(ref_counts, starts)
+        ref_keys = ref_keys[starts]
+
+        # Clipped matches
+        indexes = np.minimum(np.searchsorted(ref_keys, hyp_keys),
+                             len(ref_keys) - 1)
+        found = ref_keys[indexes] == hyp_keys
+        matches = np.minimum(hyp_counts[found], ref_counts[indexes[found]])
+        matches_by_order[:, order-1] = np.bincount(
+            hyp_keys[found] // num_codes, weights=matches,
+            minlength=num_hyps).astype(np.int64)
+
+    return matches_by_order, possible_matches_by_order
+
 def _maybe_str_to_list(list_or_str):
     if is_str(list_or_str):
         return list_or_str.split()
@@ -102,7 +195,8 @@ def sentence_bleu(references, hypothesis, max_order=4, lowercase=False,
         smooth=smooth, return_all=return_all)
 
 def corpus_bleu(list_of_references, hypotheses, max_order=4, lowercase=False,
-                smooth=False, return_all=True):
+                smooth=False, return_all=True, num_parallel_calls=1,
+                chunk_size=1000):
     """Computes corpus-level BLEU score.
 
     Args:
@@ -118,6 +212,13 @@ def corpus_bleu(list_of_references, hypotheses, max_order=4, lowercase=False,
         max_order (int): Maximum n-gram order to use when computing BLEU score.
         smooth (bool): Whether or not to apply (Lin et al. 2004) smoothing.
         return_all (bool): If `True`, returns BLEU and all n-gram precisions.
+        num_parallel_calls (int): Number of processes to compute the
+            statistics of the corpus in parallel. The corpus is split into
+            chunks of :attr:`chunk_size` hypotheses, and the
+            :class:`~texar.evals.BleuStats` of the chunks are merged, which
+            gives the same result as serial computation.
+        chunk_size (int): Number of hypotheses per chunk. Used only when
+            :attr:`num_parallel_calls` > 1.
 
     Returns:
         If :attr:`return_all` is `False` (default), returns a float32
@@ -126,16 +227,187 @@ def corpus_bleu(list_of_references, hypotheses, max_order=4, lowercase=False,
         If :attr:`return_all` is `True`, returns a list of float32 scores:
         `[BLEU] + n-gram precisions`, which is of length :attr:`max_order`+1.
     """
-    list_of_references = compat_as_text(list_of_references)
-    hypotheses = compat_as_text(hypotheses)
+    if num_parallel_calls > 1 and len(hypotheses) > chunk_size:
+        chunks = [(list_of_references[i:i+chunk_size],
+                   hypotheses[i:i+chunk_size], max_order, lowercase)
+                  for i in range(0, len(hypotheses), chunk_size)]
+        pool = multiprocessing.Pool(num_parallel_calls)
+        try:
+            stats = BleuStats(max_order)
+            for chunk_stats in pool.imap_unordered(_get_chunk_stats, chunks):
+                stats += chunk_stats
+        finally:
+            pool.terminate()
+    else:
+        stats = _get_chunk_stats(
+            (list_of_references, hypotheses, max_order, lowercase))
+
+    return stats.bleu(smooth=smooth, return_all=return_all)
+
+def _get_chunk_stats(args):
+    """Returns the :class:`BleuStats` of a chunk of the corpus. The argument
+    is a tuple `(list_of_references, hypotheses, max_order, lowercase)`.
+    """
+    list_of_references, hypotheses, max_order, lowercase = args
+    stats = BleuStats(max_order)
+    for (references, hypothesis) in zip(list_of_references, hypotheses):
+        stats.add(references, hypothesis, lowercase=lowercase)
+    return stats
+
+
+def _truncate(ids, length):
+    ids = np.asarray(ids).reshape(-1)
+    if length is not None:
+        ids = ids[:length]
+    return ids
+
+def batch_sentence_bleu(list_of_references, hypotheses, max_order=4,
+                        smooth=False, return_all=False,
+                        reference_lengths=None, hypothesis_lengths=None):
+    """Calculates the BLEU score of each hypothesis sentence in a batch of
+    token ids, e.g., as the rewards of sampled sequences in reinforcement
+    learning.
+
+    The n-grams of the whole batch are counted and matched at once with
+    numpy (see :meth:`BleuStats.add_ids`), and the scores are computed as
+    :func:`sentence_bleu` does on each hypothesis.
+
+    Args:
+        list_of_references: References of each hypothesis. Either an int
+            array of shape `[batch_size, max_time]` (one reference per
+            hypothesis) or `[batch_size, num_references, max_time]`, or a
+            list of lists of 1D int sequences.
+        hypotheses: Hypotheses, either an int array of shape
+            `[batch_size, max_time]` or a list of 1D int sequences.
+        max_order (int): Maximum n-gram order to use when computing BLEU score.
+        smooth (bool): Whether or not to apply (Lin et al. 2004) smoothing.
+        return_all (bool): If `True`, returns BLEU and all n-gram precisions.
+        reference_lengths (optional): Lengths of the references, of shape
+            `[batch_size]` or `[batch_size, num_references]`. If given, the
+            references are truncated to these lengths (e.g., to remove
+            padding).
+        hypothesis_lengths (optional): Lengths of the hypotheses, of shape
+            `[batch_size]`.
+
+    Returns:
+        If :attr:`return_all` is `False` (default), returns a float numpy
+        array of shape `[batch_size]` of BLEU scores.
+
+        If :attr:`return_all` is `True`, returns a float numpy array of
+        shape `[batch_size, max_order+1]`, where each row is
+        `[BLEU] + n-gram precisions`.
+
+    Example:
+
+        .. code-block:: python
+
+            samples_, refs_, lengths_ = sess.run(...)
+            rewards = batch_sentence_bleu(
+                refs_, samples_, smooth=True, hypothesis_lengths=lengths_)
+            agent.observe(reward=rewards)
+    """
+    if hypothesis_lengths is None:
+        hypothesis_lengths = [None] * len(hypotheses)
+    hypotheses = [_truncate(hyp, length)
+                  for hyp, length in zip(hypotheses, hypothesis_lengths)]
+
+    if isinstance(list_of_references, np.ndarray) and \
+            list_of_references.ndim == 2:
+        list_of_references = list_of_references[:, np.newaxis]
+        if reference_lengths is not None:
+            reference_lengths = np.asarray(reference_lengths)[:, np.newaxis]
+    if reference_lengths is None:
+        reference_lengths = [[None] * len(refs)
+                             for refs in list_of_references]
+    list_of_references = [
+        [_truncate(ref, length) for ref, length in zip(refs, lengths)]
+        for refs, lengths in zip(list_of_references, reference_lengths)]
+
+    matches_by_order, possible_matches_by_order = _get_id_ngram_matches(
+        list_of_references, hypotheses, max_order)
+    matches_by_order = matches_by_order.astype(np.float64)
+    possible_matches_by_order = possible_matches_by_order.astype(np.float64)
+    reference_length = np.array(
+        [min(len(r) for r in refs) for refs in list_of_references],
+        dtype=np.float64)
+    hypothesis_length = np.array([len(h) for h in hypotheses],
+                                 dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if smooth:
+            precisions = (matches_by_order + 1.) / \
+                (possible_matches_by_order + 1.)
+        else:
+            precisions = np.where(
+                possible_matches_by_order > 0,
+                matches_by_order / possible_matches_by_order, 0.)
+
+        geo_mean = np.where(
+            np.min(precisions, axis=1) > 0,
+            np.exp(np.sum((1. / max_order) * np.log(precisions), axis=1)),
+            0.)
+
+        ratio = hypothesis_length / reference_length
+        bp = np.where(ratio > 1.0, 1., np.exp(1 - 1. / ratio))
+        # Empty references
+        bp = np.where(reference_length > 0, bp, 1.)
+
+    bleu = geo_mean * bp
+
+    if return_all:
+        return np.concatenate([bleu[:, np.newaxis], precisions], axis=1) * 100
+    return bleu * 100
+
+
+class BleuStats(object):
+    """Sufficient statistics of corpus-level BLEU, i.e., the n-gram matches
+    and possible matches of each order, and the reference and hypothesis
+    lengths.
+
+    Statistics of different parts of a corpus can be merged with `+` or
+    `+=`, which gives the same BLEU as computing over the whole corpus.
+
+    Args:
+        max_order (int): Maximum n-gram order to use when computing BLEU
+            score.
+
+    Example:
+
+        .. code-block:: python
+
+            stats = BleuStats()
+            for references, hypothesis in ...:
+                stats.add(references, hypothesis)
+            bleu = stats.bleu(return_all=False)
+    """
+
+    def __init__(self, max_order=4):
+        self.max_order = max_order
+        self.matches_by_order = [0] * max_order
+        self.possible_matches_by_order = [0] * max_order
+        self.reference_length = 0
+        self.hypothesis_length = 0
+
+    def add(self, references, hypothesis, lowercase=False):
+        """Adds the statistics of a hypothesis sentence.
 
-    matches_by_order = [0] * max_order
-    possible_matches_by_order = [0] * max_order
-    reference_length = 0
-    hyperthsis_length = 0
-    for (references, hyperthsis) in zip(list_of_references, hypotheses):
-        reference_length += min(len(r) for r in references)
-        hyperthsis_length += len(hyperthsis)
+        Args:
+            references: A list of reference for the hypothesis.
+                Each reference can be either a list of string tokens, or a
+                string containing tokenized tokens separated with
+                whitespaces. List can also be numpy array.
+            hypothesis: A hypothesis sentence, either a list of string
+                tokens, or a string containing tokenized tokens separated
+                with whitespaces. List can also be numpy array.
+            lowercase (bool): If `True`, lowercase reference and hypothesis
+                tokens.
+        """
+        max_order = self.max_order
+        references = compat_as_text(references)
+        hypothesis = compat_as_text(hypothesis)
+
+        self.reference_length += min(len(r) for r in references)
+        self.hypothesis_length += len(hypothesis)
 
         merged_ref_ngram_counts = collections.Counter()
         for reference in references:
@@ -144,50 +416,114 @@ def corpus_bleu(list_of_references, hypotheses, max_order=4, lowercase=False,
                 reference = _lowercase(reference)
             merged_ref_ngram_counts |= _get_ngrams(reference, max_order)
 
-        hyperthsis = _maybe_str_to_list(hyperthsis)
+        hypothesis = _maybe_str_to_list(hypothesis)
         if lowercase:
-            hyperthsis = _lowercase(hyperthsis)
-        hyperthsis_ngram_counts = _get_ngrams(hyperthsis, max_order)
+            hypothesis = _lowercase(hypothesis)
+        hypothesis_ngram_counts = _get_ngrams(hypothesis, max_order)
 
-        overlap = hyperthsis_ngram_counts & merged_ref_ngram_counts
+        overlap = hypothesis_ngram_counts & merged_ref_ngram_counts
         for ngram in overlap:
-            matches_by_order[len(ngram)-1] += overlap[ngram]
+            self.matches_by_order[len(ngram)-1] += overlap[ngram]
         for order in range(1, max_order+1):
-            possible_matches = len(hyperthsis) - order + 1
+            possible_matches = len(hypothesis) - order + 1
             if possible_matches > 0:
-                possible_matches_by_order[order-1] += possible_matches
+                self.possible_matches_by_order[order-1] += possible_matches
 
-    precisions = [0] * max_order
-    for i in range(0, max_order):
-        if smooth:
-            precisions[i] = ((matches_by_order[i] + 1.) /
-                             (possible_matches_by_order[i] + 1.))
-        else:
-            if possible_matches_by_order[i] > 0:
-                precisions[i] = (float(matches_by_order[i]) /
-                                 possible_matches_by_order[i])
+    def add_ids(self, list_of_references, hypotheses):
+        """Adds the statistics of a batch of hypotheses of token ids, e.g.,
+        the (unpadded) id sequences produced by a decoder.
+
+        This is much faster than :meth:`add` on tokens as the n-grams are
+        counted as int64 keys with numpy, and gives the same statistics as
+        :meth:`add` on the corresponding tokens.
+
+        Args:
+            list_of_references: A list of lists of references for each
+                hypothesis. Each reference is a list or 1D numpy array of
+                int ids.
+            hypotheses: A list of hypotheses, each of which is a list or 1D
+                numpy array of int ids.
+        """
+        self.reference_length += sum(
+            min(len(r) for r in references)
+            for references in list_of_references)
+        self.hypothesis_length += sum(len(h) for h in hypotheses)
+
+        matches_by_order, possible_matches_by_order = _get_id_ngram_matches(
+            list_of_references, hypotheses, self.max_order)
+        matches_by_order = matches_by_order.sum(axis=0)
+        possible_matches_by_order = possible_matches_by_order.sum(axis=0)
+        for i in range(self.max_order):
+            self.matches_by_order[i] += int(matches_by_order[i])
+            self.possible_matches_by_order[i] += \
+                int(possible_matches_by_order[i])
+
+    def __iadd__(self, other):
+        if other.max_order != self.max_order:
+            raise ValueError("Cannot merge BLEU statistics of different "
+                             "max_order: %d vs %d" %
+                             (self.max_order, other.max_order))
+        for i in range(self.max_order):
+            self.matches_by_order[i] += other.matches_by_order[i]
+            self.possible_matches_by_order[i] += \
+                other.possible_matches_by_order[i]
+        self.reference_length += other.reference_length
+        self.hypothesis_length += other.hypothesis_length
+        return self
+
+    def __add__(self, other):
+        stats = BleuStats(self.max_order)
+        stats += self
+        stats += other
+        return stats
+
+    def bleu(self, smooth=False, return_all=True):
+        """Computes BLEU score from the statistics.
+
+        Args:
+            smooth (bool): Whether or not to apply (Lin et al. 2004)
+                smoothing.
+            return_all (bool): If `True`, returns BLEU and all n-gram
+                precisions.
+
+        Returns:
+            Same as :func:`~texar.evals.corpus_bleu`.
+        """
+        max_order = self.max_order
+        matches_by_order = self.matches_by_order
+        possible_matches_by_order = self.possible_matches_by_order
+
+        precisions = [0] * max_order
+        for i in range(0, max_order):
+            if smooth:
+                precisions[i] = ((matches_by_order[i] + 1.) /
+                                 (possible_matches_by_order[i] + 1.))
             else:
-                precisions[i] = 0.0
+                if possible_matches_by_order[i] > 0:
+                    precisions[i] = (float(matches_by_order[i]) /
+                                     possible_matches_by_order[i])
+                else:
+                    precisions[i] = 0.0
 
-    if min(precisions) > 0:
-        p_log_sum = sum((1. / max_order) * math.log(p) for p in precisions)
-        geo_mean = math.exp(p_log_sum)
-    else:
-        geo_mean = 0
+        if min(precisions) > 0:
+            p_log_sum = sum((1. / max_order) * math.log(p) for p in precisions)
+            geo_mean = math.exp(p_log_sum)
+        else:
+            geo_mean = 0
 
-    ratio = float(hyperthsis_length) / reference_length
+        ratio = float(self.hypothesis_length) / self.reference_length
 
-    if ratio > 1.0:
-        bp = 1.
-    else:
-        try:
-            bp = math.exp(1 - 1. / ratio)
-        except ZeroDivisionError:
-            bp = math.exp(1 - 1. / (ratio + 1e-8))
+        if ratio > 1.0:
+            bp = 1.
+        else:
+            try:
+                bp = math.exp(1 - 1. / ratio)
+            except ZeroDivisionError:
+                bp = math.exp(1 - 1. / (ratio + 1e-8))
 
-    bleu = geo_mean * bp
+        bleu = geo_mean * bp
 
-    if return_all:
-        return [bleu * 100] + [p * 100 for p in precisions]
-    else:
-        return bleu * 100
+        if return_all:
+            return [bleu * 100] + [p * 100 for p in precisions]
+        else:
+            return bleu * 100
@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
 """
 The BLEU metric.
+
+The scores are computed natively, exactly as the MOSES `multi-bleu.perl`
+script (`bin/utils/multi-bleu.perl`) computes them, including its
+tokenization, its choice of the closest reference length, and the
+rounding of its output.
 """
 
 from __future__ import absolute_import
@@ -10,6 +15,8 @@ from __future__ import unicode_literals
 
 import os
 from io import open # pylint: disable=redefined-builtin
+import collections
+import math
 import shutil
 import re
 import subprocess
@@ -24,9 +31,17 @@ from texar.utils.dtypes import compat_as_text
 
 __all__ = [
     "sentence_bleu_moses",
-    "corpus_bleu_moses"
+    "corpus_bleu_moses",
+    "batch_sentence_bleu_moses"
 ]
 
+_MAX_ORDER = 4
+
+# Perl splits on the ASCII whitespaces, and lowercases ASCII letters only,
+# as multi-bleu.perl reads the text as bytes.
+_WORD_RE = re.compile(r"[^ \t\n\r\f\v]+")
+_ASCII_LOWERCASE = {c: c + 32 for c in range(ord("A"), ord("Z") + 1)}
+
 def _maybe_list_to_str(list_or_str):
     if isinstance(list_or_str, (tuple, list, np.ndarray)):
         return ' '.join(list_or_str)
@@ -44,10 +59,76 @@ def _parse_multi_bleu_ret(bleu_str, return_all=False):
 
     return bleu_score
 
+def _split(text, lowercase):
+    if lowercase:
+        text = text.translate(_ASCII_LOWERCASE)
+    return _WORD_RE.findall(text)
+
+def _get_ngrams(words, n):
+    return collections.Counter(
+        tuple(words[i:i+n]) for i in range(len(words) - n + 1))
+
+def _get_sentence_stats(references, hypothesis, lowercase):
+    """Returns the n-gram matches and totals of each order, and the
+    hypothesis and closest reference lengths of a hypothesis sentence, as
+    counted by multi-bleu.perl.
+    """
+    words = _split(_maybe_list_to_str(hypothesis), lowercase)
+    hyp_length = len(words)
+
+    closest_diff, closest_length = 9999, 9999
+    ref_ngrams = [collections.Counter() for _ in range(_MAX_ORDER)]
+    for reference in references:
+        ref_words = _split(_maybe_list_to_str(reference), lowercase)
+        length = len(ref_words)
+        diff = abs(hyp_length - length)
+        if diff < closest_diff:
+            closest_diff = diff
+            closest_length = length
+        elif diff == closest_diff:
+            closest_length = min(closest_length, length)
+        for n in range(1, _MAX_ORDER + 1):
+            ref_ngrams[n-1] |= _get_ngrams(ref_words, n)
+
+    correct = [0] * _MAX_ORDER
+    total = [0] * _MAX_ORDER
+    for n in range(1, _MAX_ORDER + 1):
+        hyp_ngrams = _get_ngrams(words, n)
+        total[n-1] = max(hyp_length - n + 1, 0)
+        correct[n-1] = sum((hyp_ngrams & ref_ngrams[n-1]).values())
+
+    return correct, total, hyp_length, closest_length
+
+def _compute_bleu(correct, total, hyp_length, ref_length, return_all):
+    """Computes BLEU from the statistics and rounds it as multi-bleu.perl
+    prints it.
+    """
+    if ref_length == 0 or hyp_length == 0:
+        # multi-bleu.perl exits with an error, for which 0 is returned
+        if return_all:
+            return [np.float32(0.0)] * 5
+        return np.float32(0.0)
+
+    precisions = [correct[n] / total[n] if total[n] else 0
+                  for n in range(_MAX_ORDER)]
+    brevity_penalty = 1
+    if hyp_length < ref_length:
+        brevity_penalty = math.exp(1 - ref_length / hyp_length)
+    log_sum = 0
+    for p in precisions:
+        log_sum += math.log(p) if p else -9999999999
+    bleu = brevity_penalty * math.exp(log_sum / 4)
+
+    bleu_score = np.float32("%.2f" % (100 * bleu))
+    if return_all:
+        bleu_score = [bleu_score] + \
+            [np.float32("%.1f" % (100 * p)) for p in precisions]
+    return bleu_score
+
 def sentence_bleu_moses(references, hypothesis, lowercase=False,
                         return_all=False):
-    """Calculates BLEU score of a hypothesis sentence using the MOSES
-    multi-bleu.perl script.
+    """Calculates BLEU score of a hypothesis sentence as the MOSES
+    multi-bleu.perl script does.
 
     Args:
         references: A list of reference for the hypothesis.
@@ -56,8 +137,8 @@ def sentence_bleu_moses(references, hypothesis, lowercase=False,
         hypotheses: A hypothesis sentence.
             The hypothesis can be either a string, or a list of string tokens.
             List can also be numpy array.
-        lowercase (bool): If `True`, pass the "-lc" flag to the multi-bleu
-            script.
+        lowercase (bool): If `True`, lowercases the reference and
+            hypothesis, as with the "-lc" flag of the multi-bleu script.
         return_all (bool): If `True`, returns BLEU and all n-gram precisions.
 
     Returns:
@@ -72,8 +153,8 @@ def sentence_bleu_moses(references, hypothesis, lowercase=False,
 
 def corpus_bleu_moses(list_of_references, hypotheses, lowercase=False,
                       return_all=False):
-    """Calculates corpus-level BLEU score using the MOSES
-    multi-bleu.perl script.
+    """Calculates corpus-level BLEU score as the MOSES
+    multi-bleu.perl script does.
 
     Args:
         list_of_references: A list of lists of references for each hypothesis.
@@ -82,8 +163,8 @@ def corpus_bleu_moses(list_of_references, hypotheses, lowercase=False,
         hypotheses: A list of hypothesis sentences.
             Each hyperthsis can be either a string, or a list of string tokens.
             List can also be numpy array.
-        lowercase (bool): If `True`, pass the "-lc" flag to the multi-bleu
-            script.
+        lowercase (bool): If `True`, lowercases the references and
+            hypotheses, as with the "-lc" flag of the multi-bleu script.
         return_all (bool): If `True`, returns BLEU and all n-gram precisions.
 
     Returns:
@@ -96,6 +177,79 @@ def corpus_bleu_moses(list_of_references, hypotheses, lowercase=False,
     list_of_references = compat_as_text(list_of_references)
     hypotheses = compat_as_text(hypotheses)
 
+    if np.size(hypotheses) == 0:
+        return np.float32(0.)   # pylint: disable=no-member
+
+    # Hypotheses with fewer references are given empty references, as each
+    # reference file of multi-bleu.perl has a line for every hypothesis.
+    max_nrefs = max([len(refs) for refs in list_of_references])
+    correct = [0] * _MAX_ORDER
+    total = [0] * _MAX_ORDER
+    hyp_length, ref_length = 0, 0
+    for references, hypothesis in zip(list_of_references, hypotheses):
+        references = list(references) + [""] * (max_nrefs - len(references))
+        correct_, total_, hyp_length_, ref_length_ = _get_sentence_stats(
+            references, hypothesis, lowercase)
+        for n in range(_MAX_ORDER):
+            correct[n] += correct_[n]
+            total[n] += total_[n]
+        hyp_length += hyp_length_
+        ref_length += ref_length_
+
+    bleu_score = _compute_bleu(correct, total, hyp_length, ref_length,
+                               return_all)
+    return np.float32(bleu_score)
+
+def batch_sentence_bleu_moses(list_of_references, hypotheses,
+                              lowercase=False, return_all=False):
+    """Calculates the sentence-level BLEU score of each hypothesis in a batch,
+    e.g., as rewards or for reranking, which equals to calling
+    :func:`sentence_bleu_moses` on each hypothesis.
+
+    Args:
+        list_of_references: A list of lists of references for each hypothesis.
+            Each reference can be either a string, or a list of string tokens.
+            List can also be numpy array.
+        hypotheses: A list of hypothesis sentences.
+            Each hyperthsis can be either a string, or a list of string tokens.
+            List can also be numpy array.
+        lowercase (bool): If `True`, lowercases the references and
+            hypotheses, as with the "-lc" flag of the multi-bleu script.
+        return_all (bool): If `True`, returns BLEU and all n-gram precisions.
+
+    Returns:
+        If :attr:`return_all` is `False` (default), returns a float32 numpy
+        array of shape `[batch_size]` of BLEU scores.
+
+        If :attr:`return_all` is `True`, returns a float32 numpy array of
+        shape `[batch_size, 5]`, where each row is
+        `[BLEU, 1-gram precision, ..., 4-gram precision]`.
+    """
+    list_of_references = compat_as_text(list_of_references)
+    hypotheses = compat_as_text(hypotheses)
+
+    bleu_scores = []
+    for references, hypothesis in zip(list_of_references, hypotheses):
+        correct, total, hyp_length, ref_length = _get_sentence_stats(
+            references, hypothesis, lowercase)
+        bleu_scores.append(_compute_bleu(
+            correct, total, hyp_length, ref_length, return_all))
+
+    bleu_scores = np.array(bleu_scores, dtype=np.float32)
+    if return_all:
+        bleu_scores = bleu_scores.reshape([-1, 5])
+    return bleu_scores
+
+def _multi_bleu_perl(list_of_references, hypotheses, lowercase=False,
+                     return_all=False):
+    """Calculates corpus-level BLEU score by running the MOSES
+    multi-bleu.perl script in a subprocess. Arguments and returns are the
+    same as :func:`corpus_bleu_moses`, which computes the same scores
+    natively.
+    """
+    list_of_references = compat_as_text(list_of_references)
+    hypotheses = compat_as_text(hypotheses)
+
     if np.size(hypotheses) == 0:
         return np.float32(0.)   # pylint: disable=no-member
 
@@ -13,8 +13,10 @@ import numpy as np
 
 import tensorflow as tf
 
+from texar.evals import bleu_moses
 from texar.evals.bleu_moses import sentence_bleu_moses, corpus_bleu_moses
-from texar.evals.bleu import sentence_bleu, corpus_bleu
+from texar.evals.bleu import sentence_bleu, corpus_bleu, batch_sentence_bleu, \
+    BleuStats
 
 # pylint: disable=too-many-locals, too-many-arguments
 
@@ -119,5 +121,121 @@ class BLEUTest(tf.test.TestCase):
         self._test_corpus_bleu(list_of_references, hypotheses,
                                False, True, [63.02, 87.5, 77.3, 60.0, 38.9])
 
+    def test_moses_native(self):
+        """Tests the native Moses BLEU against the multi-bleu.perl script.
+        """
+        hypotheses = [
+            "This is a test sentence to evaluate the good bleu score . 词",
+            "i believe that that the script is 词 perfectly correct .",
+            "",
+            "the script"
+        ]
+        list_of_references = [
+            ["this is a test sentence to evaluate the bleu score .",
+             "this is a test sentence to evaluate the good score ."],
+            ["I believe that the script is perfectly correct ."],
+            ["an empty hypothesis"],
+            ["the script is", "script"]
+        ]
+        for lowercase in [False, True]:
+            bleu = corpus_bleu_moses(list_of_references, hypotheses,
+                                     lowercase=lowercase, return_all=True)
+            bleu_perl = bleu_moses._multi_bleu_perl(
+                list_of_references, hypotheses, lowercase=lowercase,
+                return_all=True)
+            np.testing.assert_array_equal(bleu, bleu_perl)
+
+        bleus = bleu_moses.batch_sentence_bleu_moses(
+            list_of_references, hypotheses, return_all=True)
+        self.assertEqual(bleus.shape, (4, 5))
+        for i, (references, hypothesis) in enumerate(
+                zip(list_of_references, hypotheses)):
+            bleu_perl = bleu_moses._multi_bleu_perl(
+                [references], [hypothesis], return_all=True)
+            np.testing.assert_array_equal(bleus[i], bleu_perl)
+
+    def test_corpus_parallel(self):
+        """Tests merging BLEU statistics and parallel corpus BLEU.
+        """
+        hypotheses = [
+            "this is a test sentence to evaluate the good bleu score . 词",
+            "i believe that that the script is 词 perfectly correct ."
+        ] * 5
+        list_of_references = [
+            ["this is a test sentence to evaluate the bleu score .",
+             "this is a test sentence to evaluate the good score ."],
+            ["i believe that the script is perfectly correct .".split()]
+        ] * 5
+        bleu = corpus_bleu(list_of_references, hypotheses)
+
+        stats_1, stats_2 = BleuStats(), BleuStats()
+        for references, hypothesis in zip(list_of_references[:3],
+                                          hypotheses[:3]):
+            stats_1.add(references, hypothesis)
+        for references, hypothesis in zip(list_of_references[3:],
+                                          hypotheses[3:]):
+            stats_2.add(references, hypothesis)
+        self.assertEqual((stats_1 + stats_2).bleu(), bleu)
+
+        bleu_parallel = corpus_bleu(list_of_references, hypotheses,
+                                    num_parallel_calls=2, chunk_size=3)
+        self.assertEqual(bleu_parallel, bleu)
+
+    def test_corpus_ids(self):
+        """Tests BLEU statistics of id sequences.
+        """
+        hypotheses = [
+            "this is a test sentence to evaluate the good bleu score . 词",
+            "i believe that that the script is 词 perfectly correct ."
+        ]
+        list_of_references = [
+            ["this is a test sentence to evaluate the bleu score .",
+             "this is a test sentence to evaluate the good score ."],
+            ["i believe that the script is perfectly correct ."]
+        ]
+        stats = BleuStats()
+        for references, hypothesis in zip(list_of_references, hypotheses):
+            stats.add(references, hypothesis)
+
+        vocab = {}
+        def _to_ids(sent):
+            return np.array([vocab.setdefault(w, len(vocab))
+                             for w in sent.split()])
+        id_stats = BleuStats()
+        id_stats.add_ids([[_to_ids(r) for r in refs]
+                          for refs in list_of_references],
+                         [_to_ids(h) for h in hypotheses])
+
+        self.assertEqual(id_stats.matches_by_order, stats.matches_by_order)
+        self.assertEqual(id_stats.possible_matches_by_order,
+                         stats.possible_matches_by_order)
+        self.assertEqual(id_stats.hypothesis_length, 24)
+
+    def test_batch_sentence_bleu(self):
+        """Tests :func:`texar.evals.batch_sentence_bleu`.
+        """
+        hypotheses = np.array([[1, 2, 3, 4, 5, 0],
+                               [1, 2, 2, 6, 7, 8],
+                               [9, 9, 0, 0, 0, 0]])
+        references = np.array([[[1, 2, 3, 4, 6, 0], [1, 3, 4, 5, 0, 0]],
+                               [[1, 2, 6, 7, 8, 0], [2, 6, 7, 0, 0, 0]],
+                               [[9, 8, 7, 0, 0, 0], [9, 9, 9, 9, 0, 0]]])
+        hypothesis_lengths = [5, 6, 2]
+        reference_lengths = [[5, 4], [5, 3], [3, 4]]
+
+        for smooth in [False, True]:
+            scores = batch_sentence_bleu(
+                references, hypotheses, smooth=smooth, return_all=True,
+                reference_lengths=reference_lengths,
+                hypothesis_lengths=hypothesis_lengths)
+            self.assertEqual(scores.shape, (3, 5))
+            for i in range(3):
+                refs = [[str(w) for w in ref[:length]] for ref, length
+                        in zip(references[i], reference_lengths[i])]
+                hyp = [str(w) for w in hypotheses[i][:hypothesis_lengths[i]]]
+                expected = sentence_bleu(refs, hyp, smooth=smooth,
+                                         return_all=True)
+                np.testing.assert_allclose(scores[i], expected)
+
 if __name__ == "__main__":
     tf.test.main()
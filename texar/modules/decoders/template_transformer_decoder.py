@@ -121,7 +121,8 @@ class TemplateTransformerDecoder(ModuleBase):
                 cache=cache,
                 decoder_self_attention_bias=decoder_self_attention_bias,
             )
-            logits = self.output_layer(outputs)
+            with tf.name_scope('output_layer'):
+                logits = self.output_layer(outputs)
             logits = tf.squeeze(logits, axis=[1])
 
             return logits, cache
@@ -168,7 +169,8 @@ class TemplateTransformerDecoder(ModuleBase):
             decoder_self_attention_bias=decoder_self_attention_bias,
         )
 
-        logits = self.output_layer(self.decoder_output)
+        with tf.name_scope('output_layer'):
+            logits = self.output_layer(self.decoder_output)
         preds = tf.to_int32(tf.argmax(logits, axis=-1))
 
         if not self._built:
@@ -10,3 +10,7 @@ from __future__ import print_function
 # pylint: disable=wildcard-import
 
 from texar.run.executor import *
+from texar.run.profiler import *
+from texar.run.hooks import *
+from texar.run.distributed import *
+from texar.run.checkpoint import *
@@ -0,0 +1,165 @@
+#
+"""
+Checkpoint saving without blocking the training loop.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+from multiprocessing.pool import ThreadPool
+from timeit import default_timer
+
+import tensorflow as tf
+from tensorflow.python.ops import io_ops
+
+from texar.utils.metrics import LatencyRecorder
+
+__all__ = [
+    "AsyncCheckpointSaver"
+]
+
+def _remove_checkpoint(path):
+    """Removes the files of the checkpoint with prefix :attr:`path`.
+    """
+    for filename in tf.gfile.Glob(path + '.*'):
+        tf.gfile.Remove(filename)
+
+class AsyncCheckpointSaver(object):
+    """Saves checkpoints of variables in a background thread, so that the
+    training loop only stalls for copying the variable values to host
+    memory.
+
+    On :meth:`save`, the values of the variables are fetched in a single
+    session run (a consistent snapshot), and are written in a background
+    thread by a save op in a separate CPU-only graph, which is fed with the
+    fetched values and holds no copy of the variables. The checkpoints are
+    in the format of :tf_main:`tf.train.Saver <train/Saver>`, with the same
+    `max_to_keep` semantics and update of the checkpoint state file, and are
+    restored with :tf_main:`tf.train.Saver <train/Saver>` as usual.
+
+    If a checkpoint is still being written when :meth:`save` is called, the
+    call waits for it first. The time that :meth:`save` blocks is recorded
+    in :attr:`stall`.
+
+    Args:
+        var_list (optional): A list of variables to save. If `None`, all
+            global variables are saved.
+        max_to_keep (int): The maximum number of recent checkpoints to keep.
+            If `None` or `0`, all checkpoints are kept.
+        name (str, optional): Name of the recorder of the stall time.
+
+    Example:
+
+        .. code-block:: python
+
+            saver = AsyncCheckpointSaver(max_to_keep=5)
+            for epoch in range(num_epochs):
+                train_epoch(sess)
+                saver.save(sess, 'model.ckpt', global_step=epoch)
+                print(saver.stall.to_str())
+            saver.close()
+    """
+
+    def __init__(self, var_list=None, max_to_keep=5,
+                 name='checkpoint_stall'):
+        if var_list is None:
+            var_list = tf.global_variables()
+        self._var_list = list(var_list)
+        self._max_to_keep = max_to_keep
+        self._last_checkpoints = []
+        self._graph = tf.Graph()
+        with self._graph.as_default(), tf.device('/cpu:0'):
+            self._path = tf.placeholder(tf.string, [])
+            self._placeholders = [
+                tf.placeholder(var.dtype.base_dtype, var.get_shape())
+                for var in self._var_list]
+            # Saved with the names of the original variables
+            self._save_op = io_ops.save_v2(
+                self._path, [var.op.name for var in self._var_list],
+                [''] * len(self._var_list), self._placeholders)
+        self._graph.finalize()
+        self._sess = tf.Session(
+            graph=self._graph,
+            config=tf.ConfigProto(device_count={'GPU': 0}))
+
+        self._worker = ThreadPool(1)
+        self._pending = None
+        self.stall = LatencyRecorder(name=name)
+        self.last_stall = 0.
+
+    def _write(self, values, path):
+        feed_dict = dict(zip(self._placeholders, values))
+        feed_dict[self._path] = path
+        self._sess.run(self._save_op, feed_dict=feed_dict)
+
+        if path in self._last_checkpoints:
+            self._last_checkpoints.remove(path)
+        self._last_checkpoints.append(path)
+        if self._max_to_keep:
+            while len(self._last_checkpoints) > self._max_to_keep:
+                _remove_checkpoint(self._last_checkpoints.pop(0))
+        tf.train.update_checkpoint_state(
+            os.path.dirname(path), path,
+            all_model_checkpoint_paths=self._last_checkpoints)
+        return path
+
+    def save(self, sess, save_path, global_step=None):
+        """Snapshots the variables, and writes the checkpoint in the
+        background.
+
+        Args:
+            sess: The session of the variables.
+            save_path (str): The prefix of the checkpoint files.
+            global_step (optional): An int, or a tensor or variable of the
+                global step. If given, its value is appended to
+                :attr:`save_path` to name the checkpoint.
+
+        Returns:
+            The path prefix of the checkpoint being written.
+        """
+        start = default_timer()
+        self.wait()
+        values = sess.run(self._var_list)
+        if global_step is not None:
+            global_step = tf.train.global_step(sess, global_step)
+            path = '%s-%d' % (save_path, global_step)
+        else:
+            path = save_path
+        self._pending = self._worker.apply_async(self._write, (values, path))
+        self.last_stall = default_timer() - start
+        self.stall.add(self.last_stall)
+        return path
+
+    def wait(self):
+        """Waits for the checkpoint being written, if any.
+
+        Returns:
+            The path prefix of the last checkpoint written, or `None` if no
+            checkpoint is being written.
+
+        Raises:
+            The exception raised when writing the checkpoint, if any.
+        """
+        if self._pending is None:
+            return None
+        pending, self._pending = self._pending, None
+        return pending.get()
+
+    @property
+    def last_checkpoints(self):
+        """The list of the checkpoints kept, from the oldest to the latest.
+        Only includes checkpoints that have been written.
+        """
+        return list(self._last_checkpoints)
+
+    def close(self):
+        """Waits for the checkpoint being written, and releases the
+        resources.
+        """
+        try:
+            self.wait()
+        finally:
+            self._worker.close()
+            self._worker.join()
+            self._sess.close()
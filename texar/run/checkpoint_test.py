@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Unit tests for asynchronous checkpoint saving.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import tempfile
+import shutil
+
+import tensorflow as tf
+
+from texar.run.checkpoint import AsyncCheckpointSaver
+
+class AsyncCheckpointSaverTest(tf.test.TestCase):
+    """Tests :class:`texar.run.checkpoint.AsyncCheckpointSaver`.
+    """
+
+    def test_save(self):
+        """Tests saving and restoring checkpoints.
+        """
+        var = tf.Variable(1., name='var')
+        global_step = tf.Variable(0, trainable=False, name='global_step')
+        update_op = tf.group(tf.assign_add(var, 1.),
+                             tf.assign_add(global_step, 1))
+        saver = AsyncCheckpointSaver(max_to_keep=2)
+        ckpt_dir = tempfile.mkdtemp()
+        save_path = os.path.join(ckpt_dir, 'model.ckpt')
+
+        with self.test_session() as sess:
+            sess.run(tf.global_variables_initializer())
+            paths = []
+            for _ in range(3):
+                sess.run(update_op)
+                paths.append(saver.save(sess, save_path, global_step))
+                # Does not change the snapshot being written
+                sess.run(tf.assign(var, -1.))
+            self.assertEqual(saver.wait(), paths[-1])
+            self.assertEqual(saver.stall.count, 3)
+            self.assertEqual(saver.last_checkpoints, paths[1:])
+            # Checkpoints beyond `max_to_keep` are removed
+            self.assertEqual(tf.gfile.Glob(paths[0] + '.*'), [])
+            self.assertTrue(tf.gfile.Exists(paths[1] + '.index'))
+            self.assertEqual(tf.train.latest_checkpoint(ckpt_dir), paths[-1])
+
+            tf.train.Saver().restore(sess, paths[-1])
+            self.assertEqual(sess.run(var), 0.)
+            self.assertEqual(sess.run(global_step), 3)
+        saver.close()
+        shutil.rmtree(ckpt_dir)
+
+if __name__ == "__main__":
+    tf.test.main()
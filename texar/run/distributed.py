@@ -0,0 +1,249 @@
+#
+"""
+Utilities of data-parallel training with multiple processes on one host,
+through between-graph replication with local parameter servers.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+import socket
+import subprocess
+
+import tensorflow as tf
+
+__all__ = [
+    "get_local_cluster_spec",
+    "get_task_from_env",
+    "get_num_replicas",
+    "get_replica_index",
+    "LocalCluster",
+    "create_replica_session"
+]
+
+def _get_free_ports(num_ports, host):
+    sockets = []
+    try:
+        for _ in range(num_ports):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind((host, 0))
+            sockets.append(sock)
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+def get_local_cluster_spec(num_replicas, num_ps=1, host='localhost'):
+    """Returns the cluster spec of training replicas and parameter servers
+    on free ports of a single host.
+
+    The cluster has the layout used in the `TF_CONFIG` environment variable
+    of :tf_main:`Estimator <estimator/Estimator>`, i.e., one `"chief"` task
+    and `num_replicas - 1` `"worker"` tasks that train, and :attr:`num_ps`
+    `"ps"` tasks that hold the variables.
+
+    Args:
+        num_replicas (int): The number of training replicas.
+        num_ps (int): The number of parameter servers.
+        host (str): The host name.
+
+    Returns:
+        A dict mapping job names to lists of `"host:port"` addresses.
+    """
+    if num_replicas < 1 or num_ps < 1:
+        raise ValueError("`num_replicas` and `num_ps` must be >= 1.")
+    addresses = ['%s:%d' % (host, port)
+                 for port in _get_free_ports(num_replicas + num_ps, host)]
+    return {
+        "chief": addresses[:1],
+        "worker": addresses[1:num_replicas],
+        "ps": addresses[num_replicas:]
+    }
+
+def get_task_from_env():
+    """Returns the cluster spec and the task of the current process from the
+    `TF_CONFIG` environment variable, e.g., as set by :class:`LocalCluster`.
+
+    Returns:
+        A tuple `(cluster_spec, task_type, task_index)`, where
+        `cluster_spec` is a dict mapping job names to lists of addresses.
+        If `TF_CONFIG` is not set, returns `(None, None, None)`.
+    """
+    tf_config = os.environ.get('TF_CONFIG')
+    if not tf_config:
+        return None, None, None
+    tf_config = json.loads(tf_config)
+    task = tf_config.get('task', {})
+    return tf_config.get('cluster'), task.get('type'), task.get('index', 0)
+
+def get_num_replicas(cluster_spec):
+    """Returns the number of training replicas, i.e., the number of
+    `"chief"` and `"worker"` tasks in :attr:`cluster_spec`.
+    """
+    return len(cluster_spec.get('chief', [])) + \
+        len(cluster_spec.get('worker', []))
+
+def get_replica_index(task_type, task_index):
+    """Returns the 0-based index of a training replica among all replicas,
+    where the `"chief"` task is `0` and the `i`-th `"worker"` task is
+    `i + 1`. Useful as the :attr:`"shard_index"` of the training data.
+    """
+    if task_type == 'chief':
+        return 0
+    if task_type == 'worker':
+        return task_index + 1
+    raise ValueError("Task of type '%s' is not a training replica."
+                     % task_type)
+
+class LocalCluster(object):
+    """Launches the tasks of a data-parallel training cluster as processes
+    on the local host, each running the same command with its task given in
+    the `TF_CONFIG` environment variable.
+
+    The command is run for every task, including the parameter servers.
+    It can get its task with :func:`get_task_from_env`, and e.g., start a
+    :tf_main:`tf.train.Server <train/Server>` and join it if it is a
+    `"ps"` task. :tf_main:`tf.estimator.train_and_evaluate
+    <estimator/train_and_evaluate>` (and hence
+    :meth:`texar.run.Executor.train_and_evaluate`) reads `TF_CONFIG` and
+    does so by itself.
+
+    Args:
+        num_replicas (int): The number of training replicas.
+        num_ps (int): The number of parameter servers.
+        host (str): The host name.
+
+    Example:
+
+        .. code-block:: python
+
+            cluster = LocalCluster(num_replicas=4)
+            cluster.start([sys.executable, 'train.py'])
+            returncodes = cluster.join()
+    """
+
+    def __init__(self, num_replicas, num_ps=1, host='localhost'):
+        self._cluster_spec = get_local_cluster_spec(
+            num_replicas, num_ps=num_ps, host=host)
+        self._processes = {}
+
+    @property
+    def cluster_spec(self):
+        """The dict mapping job names to lists of addresses.
+        """
+        return self._cluster_spec
+
+    def tf_config(self, task_type, task_index):
+        """Returns the `TF_CONFIG` dict of a task.
+        """
+        return {
+            "cluster": self._cluster_spec,
+            "task": {"type": task_type, "index": task_index}
+        }
+
+    def start(self, cmd, env=None):
+        """Starts a process running :attr:`cmd` for each task.
+
+        Args:
+            cmd (list): The command and its arguments.
+            env (dict, optional): The environment variables of the
+                processes. If `None`, those of the current process are used.
+        """
+        if self._processes:
+            raise ValueError("The cluster has been started.")
+        if env is None:
+            env = os.environ
+        for task_type in ['ps', 'chief', 'worker']:
+            for task_index in range(len(self._cluster_spec[task_type])):
+                task_env = dict(env)
+                task_env['TF_CONFIG'] = json.dumps(
+                    self.tf_config(task_type, task_index))
+                self._processes[(task_type, task_index)] = \
+                    subprocess.Popen(cmd, env=task_env)
+
+    def join(self):
+        """Waits for the training replicas to exit, and then terminates the
+        parameter servers.
+
+        Returns:
+            A list of the exit codes of the replicas, in the order of
+            :func:`get_replica_index`.
+        """
+        returncodes = []
+        try:
+            for task_type in ['chief', 'worker']:
+                for task_index in range(len(self._cluster_spec[task_type])):
+                    process = self._processes[(task_type, task_index)]
+                    returncodes.append(process.wait())
+        finally:
+            self.terminate()
+        return returncodes
+
+    def terminate(self):
+        """Terminates all running processes of the cluster.
+        """
+        for process in self._processes.values():
+            if process.poll() is None:
+                process.terminate()
+        for process in self._processes.values():
+            process.wait()
+
+def create_replica_session(master, is_chief, hooks=None, config=None):
+    """Creates a session of a training replica with between-graph
+    replication.
+
+    The chief initializes the global and local variables and the tables,
+    while the other replicas wait for the global variables to be initialized
+    and then initialize their local variables and tables. Unlike
+    :tf_main:`tf.train.MonitoredTrainingSession
+    <train/MonitoredTrainingSession>`, the returned session is a plain
+    :tf_main:`tf.Session <Session>` and the graph is not finalized.
+
+    Args:
+        master (str): The target of the session, e.g., the `target` of the
+            :tf_main:`tf.train.Server <train/Server>` of the replica.
+        is_chief (bool): Whether the replica is the chief.
+        hooks (optional): A list of :tf_main:`tf.train.SessionRunHook
+            <train/SessionRunHook>`, of which `begin` and
+            `after_create_session` are called, e.g., the hook made by
+            :tf_main:`tf.train.SyncReplicasOptimizer.make_session_run_hook
+            <train/SyncReplicasOptimizer#make_session_run_hook>`.
+        config (optional): An instance of :tf_main:`tf.ConfigProto
+            <ConfigProto>`.
+
+    Returns:
+        A tuple `(session, coord)`, where `coord` is the
+        :tf_main:`tf.train.Coordinator <train/Coordinator>` of the threads
+        started by the hooks. Call `coord.request_stop()` before closing the
+        session.
+    """
+    hooks = hooks or []
+    for hook in hooks:
+        hook.begin()
+
+    ready_for_local_init_ops = tf.get_collection(
+        tf.GraphKeys.READY_FOR_LOCAL_INIT_OP)
+    if ready_for_local_init_ops:
+        ready_for_local_init_op = ready_for_local_init_ops[0]
+    else:
+        ready_for_local_init_op = tf.report_uninitialized_variables(
+            tf.global_variables())
+    local_init_op = tf.group(
+        tf.local_variables_initializer(), tf.tables_initializer(),
+        *tf.get_collection(tf.GraphKeys.LOCAL_INIT_OP))
+    session_manager = tf.train.SessionManager(
+        local_init_op=local_init_op,
+        ready_op=tf.report_uninitialized_variables(),
+        ready_for_local_init_op=ready_for_local_init_op)
+    if is_chief:
+        session = session_manager.prepare_session(
+            master, init_op=tf.global_variables_initializer(), config=config)
+    else:
+        session = session_manager.wait_for_session(master, config=config)
+
+    coord = tf.train.Coordinator()
+    for hook in hooks:
+        hook.after_create_session(session, coord)
+    return session, coord
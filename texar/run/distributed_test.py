@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Unit tests for data-parallel training utilities.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import os
+import sys
+
+import tensorflow as tf
+
+from texar.run.distributed import get_local_cluster_spec, \
+    get_task_from_env, get_num_replicas, get_replica_index, LocalCluster, \
+    create_replica_session
+
+class DistributedTest(tf.test.TestCase):
+    """Tests data-parallel training utilities.
+    """
+
+    def test_cluster_spec(self):
+        """Tests :func:`get_local_cluster_spec` and the replica indexes.
+        """
+        cluster_spec = get_local_cluster_spec(3, num_ps=2)
+        self.assertEqual(len(cluster_spec['chief']), 1)
+        self.assertEqual(len(cluster_spec['worker']), 2)
+        self.assertEqual(len(cluster_spec['ps']), 2)
+        addresses = sum(cluster_spec.values(), [])
+        self.assertEqual(len(set(addresses)), 5)
+        self.assertEqual(get_num_replicas(cluster_spec), 3)
+
+        self.assertEqual(get_replica_index('chief', 0), 0)
+        self.assertEqual(get_replica_index('worker', 1), 2)
+        with self.assertRaises(ValueError):
+            get_replica_index('ps', 0)
+
+    def test_local_cluster(self):
+        """Tests launching the tasks of :class:`LocalCluster`.
+        """
+        cluster = LocalCluster(num_replicas=2)
+        # Replicas exit with their replica index; the ps task never exits
+        script = (
+            "import json, os, sys, time\n"
+            "task = json.loads(os.environ['TF_CONFIG'])['task']\n"
+            "if task['type'] == 'ps':\n"
+            "    time.sleep(600)\n"
+            "sys.exit(0 if task['type'] == 'chief' else task['index'] + 1)\n")
+        cluster.start([sys.executable, '-c', script])
+        self.assertEqual(cluster.join(), [0, 1])
+
+        tf_config = cluster.tf_config('worker', 0)
+        os.environ['TF_CONFIG'] = json.dumps(tf_config)
+        try:
+            cluster_spec, task_type, task_index = get_task_from_env()
+        finally:
+            del os.environ['TF_CONFIG']
+        self.assertEqual(cluster_spec, cluster.cluster_spec)
+        self.assertEqual(task_type, 'worker')
+        self.assertEqual(task_index, 0)
+        self.assertEqual(get_task_from_env(), (None, None, None))
+
+    def test_create_replica_session(self):
+        """Tests :func:`create_replica_session` of the chief.
+        """
+        server = tf.train.Server.create_local_server()
+        var = tf.Variable(3.)
+        local_var = tf.Variable(
+            1., collections=[tf.GraphKeys.LOCAL_VARIABLES])
+        sess, coord = create_replica_session(server.target, is_chief=True)
+        self.assertEqual(sess.run(var + local_var), 4.)
+        coord.request_stop()
+        sess.close()
+
+if __name__ == "__main__":
+    tf.test.main()
@@ -9,6 +9,8 @@ from __future__ import print_function
 import tensorflow as tf
 
 from texar.utils.dtypes import maybe_hparams_to_dict
+from texar.run.profiler import StepProfilerHook
+from texar.run.distributed import get_replica_index
 
 __all__ = [
     "Executor"
@@ -28,19 +30,31 @@ class Executor(object):
         config: An instance of
             :tf_main:`tf.estimator.RunConfig <estimator/RunConfig>`, used as
             the :attr:`config` argument of
-            :tf_main:`Estimator <estimator/Estimator#__init__>`.
+            :tf_main:`Estimator <estimator/Estimator#__init__>`. If it has
+            multiple worker replicas (as per the `TF_CONFIG` environment
+            variable, e.g., set by :class:`~texar.run.LocalCluster`),
+            :meth:`train_and_evaluate` trains data-parallel with
+            between-graph replication, and each replica trains on its own
+            shard of the training data, unless :attr:`"num_shards"` is
+            specified in the `train` field of :attr:`data_hparams`.
         model_hparams (optional): A `dict` or an instance of
             :class:`~texar.hparams.HParams` containing the hyperparameters of
             the model. If `None`, uses :attr:`model.hparams`. Used as
             the :attr:`params` argument of
             :tf_main:`Estimator <estimator/Estimator#__init__>`.
         train_hooks (optional): Iterable of :tf_main:`tf.train.SessionRunHook
-            <train/SessionRunHook>` objects to run during training.
+            <train/SessionRunHook>` objects to run during training, e.g.,
+            :class:`~texar.run.StepMetricsHook` to log the step latency and
+            throughput.
         eval_hooks (optional): Iterable of :tf_main:`tf.train.SessionRunHook
             <train/SessionRunHook>` objects to run during evaluation.
         session_config (optional): An instance of
             :tf_main:`tf.ConfigProto <ConfigProto>`, used as the :attr:`config`
             argument of :tf_main:`tf session <Session>`.
+        profiler (optional): An instance of
+            :class:`~texar.run.StepProfiler`. If given, the training steps
+            are profiled with it, and the op time by category is logged at
+            the end of each training.
     """
 
     def __init__(self,
@@ -50,13 +64,15 @@ class Executor(object):
                  model_hparams=None,
                  train_hooks=None,
                  eval_hooks=None,
-                 session_config=None):
+                 session_config=None,
+                 profiler=None):
         self._model = model
         self._data_hparams = maybe_hparams_to_dict(data_hparams)
         self._config = config
         self._train_hooks = train_hooks
         self._eval_hooks = eval_hooks
         self._session_config = session_config
+        self._profiler = profiler
 
         if model_hparams is None:
             model_hparams = model.hparams
@@ -69,13 +85,25 @@ class Executor(object):
         if 'train' not in self._data_hparams:
             raise ValueError('`data_hparams` must contain field `train` for '
                              'training data config.')
+        hparams = self._data_hparams['train']
+        # The config of the estimator is a default one if `config` is `None`
+        config = self._estimator.config
+        num_replicas = config.num_worker_replicas
+        if num_replicas > 1 and 'num_shards' not in hparams and \
+                config.task_type in ('chief', 'worker'):
+            hparams = dict(hparams)
+            hparams['num_shards'] = num_replicas
+            hparams['shard_index'] = get_replica_index(
+                config.task_type, config.task_id)
         input_fn = self._model.get_input_fn(
-            mode=tf.estimator.ModeKeys.TRAIN,
-            hparams=self._data_hparams['train'])
+            mode=tf.estimator.ModeKeys.TRAIN, hparams=hparams)
+        hooks = self._train_hooks
+        if self._profiler is not None:
+            hooks = list(hooks or []) + [StepProfilerHook(self._profiler)]
         return tf.estimator.TrainSpec(
             input_fn=input_fn,
             max_steps=max_steps,
-            hooks=self._train_hooks)
+            hooks=hooks)
 
     def _get_eval_spec(self, steps):
         if 'eval' not in self._data_hparams:
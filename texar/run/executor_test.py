@@ -9,12 +9,15 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import os
+import json
 import tempfile
 import shutil
 
 import tensorflow as tf
 
 from texar.run.executor import Executor
+from texar.run.hooks import StepMetricsHook
 from texar.models.seq2seq.basic_seq2seq import BasicSeq2seq
 
 class ExecutorTest(tf.test.TestCase):
@@ -70,14 +73,65 @@ class ExecutorTest(tf.test.TestCase):
             save_checkpoints_steps=10,
             save_checkpoints_secs=None)
 
-        exor = Executor(model=seq2seq, data_hparams=data_hparams, config=config)
+        # The counts are resolved in the graph built by the estimator
+        hook = StepMetricsHook(
+            count_tensors={'examples': lambda: tf.constant(2)},
+            every_n_steps=None)
+        exor = Executor(model=seq2seq, data_hparams=data_hparams, config=config,
+                        train_hooks=[hook])
 
         exor.train_and_evaluate(max_train_steps=20, eval_steps=5)
+        self.assertGreater(hook.latency.count, 0)
+        self.assertGreater(hook.rates['examples'].total, 0)
 
         exor.train(max_steps=20)
         exor.evaluate(steps=5)
 
         shutil.rmtree(model_dir)
 
+    def test_train_data_sharding(self):
+        """Tests sharding the training data across worker replicas.
+        """
+        seq2seq = BasicSeq2seq(self._data_hparams)
+        input_hparams = []
+        def _get_input_fn(mode, hparams):
+            input_hparams.append(hparams)
+            return lambda: None
+        seq2seq.get_input_fn = _get_input_fn
+
+        # The default config of the estimator is used with `config=None`
+        exor = Executor(model=seq2seq,
+                        data_hparams={'train': self._data_hparams},
+                        config=None)
+        exor._get_train_spec()
+        self.assertNotIn('num_shards', input_hparams[-1])
+
+        tf_config = {
+            'cluster': {'chief': ['localhost:2222'],
+                        'worker': ['localhost:2223'],
+                        'ps': ['localhost:2224']},
+            'task': {'type': 'worker', 'index': 0}
+        }
+        os.environ['TF_CONFIG'] = json.dumps(tf_config)
+        try:
+            config = tf.estimator.RunConfig(model_dir=tempfile.mkdtemp())
+        finally:
+            del os.environ['TF_CONFIG']
+        exor = Executor(model=seq2seq,
+                        data_hparams={'train': self._data_hparams},
+                        config=config)
+        exor._get_train_spec()
+        self.assertEqual(input_hparams[-1]['num_shards'], 2)
+        self.assertEqual(input_hparams[-1]['shard_index'], 1)
+
+        # An explicit `num_shards` is kept
+        data_hparams = dict(self._data_hparams, num_shards=1)
+        exor = Executor(model=seq2seq, data_hparams={'train': data_hparams},
+                        config=config)
+        exor._get_train_spec()
+        self.assertEqual(input_hparams[-1]['num_shards'], 1)
+        self.assertNotIn('shard_index', input_hparams[-1])
+        shutil.rmtree(config.model_dir)
+
 if __name__ == "__main__":
     tf.test.main()
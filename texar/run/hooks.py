@@ -0,0 +1,113 @@
+#
+"""
+Session run hooks.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from timeit import default_timer
+
+import tensorflow as tf
+
+from texar.utils.dtypes import is_str, is_callable
+from texar.utils.metrics import LatencyRecorder, RateMeter
+
+__all__ = [
+    "StepMetricsHook"
+]
+
+class StepMetricsHook(tf.train.SessionRunHook):
+    """A :tf_main:`SessionRunHook <train/SessionRunHook>` that records the
+    latency percentiles of the runs of a monitored session, and the rates per
+    second of counts fetched at every run (e.g., the number of tokens in the
+    batch), and logs them every :attr:`every_n_steps` runs.
+
+    Can be used as the :attr:`train_hooks` or :attr:`eval_hooks` of
+    :class:`~texar.run.Executor`. As the hooks are created before the
+    :tf_main:`Estimator <estimator/Estimator>` builds its graph, the counts
+    are then given as graph collection keys (or callables), which are
+    resolved to tensors in the graph of the session in :meth:`begin`.
+
+    Args:
+        count_tensors (dict, optional): A dict of the counts to measure the
+            rates of. Each value is one of:
+
+            - A scalar tensor, e.g., `tf.reduce_sum(batch['length'])`.
+            - A graph collection key (str). The count is the sum of the \
+            scalar tensors in the collection, e.g., those added with \
+            `tf.add_to_collection('num_tokens', \
+            tf.reduce_sum(batch['length']))` in the `model_fn`.
+            - A callable that takes no argument and returns a scalar \
+            tensor in the default graph.
+
+        every_n_steps (int, optional): The number of runs between logging.
+            If `None`, the metrics are only logged at the end of the session.
+        size (int): The number of latest runs to compute the rates over.
+            Latency percentiles are over all runs.
+
+    Example:
+
+        .. code-block:: python
+
+            # In the model_fn
+            tf.add_to_collection('num_tokens', tf.reduce_sum(batch['length']))
+
+            hook = StepMetricsHook(count_tensors={'tokens': 'num_tokens'})
+            executor = Executor(model, data_hparams, config,
+                                train_hooks=[hook])
+    """
+
+    def __init__(self, count_tensors=None, every_n_steps=100, size=100):
+        self._counts = count_tensors or {}
+        self._count_tensors = {}
+        self._every_n_steps = every_n_steps
+        self.latency = LatencyRecorder(name='step_latency')
+        self.rates = {name: RateMeter(size=size)
+                      for name in self._counts}
+        self._num_steps = 0
+        self._start = None
+
+    def begin(self):
+        self._count_tensors = {}
+        for name, count in self._counts.items():
+            if is_str(count):
+                tensors = tf.get_collection(count)
+                if not tensors:
+                    raise ValueError(
+                        "Graph collection '%s' of the count '%s' is empty."
+                        % (count, name))
+                count = tf.add_n(tensors) if len(tensors) > 1 else tensors[0]
+            elif is_callable(count):
+                count = count()
+            self._count_tensors[name] = count
+
+    def after_create_session(self, session, coord):
+        for meter in self.rates.values():
+            meter.reset()
+
+    def before_run(self, run_context):
+        self._start = default_timer()
+        if not self._count_tensors:
+            return None
+        return tf.train.SessionRunArgs(self._count_tensors)
+
+    def after_run(self, run_context, run_values):
+        self.latency.add(default_timer() - self._start)
+        for name, count in (run_values.results or {}).items():
+            self.rates[name].add(count)
+        self._num_steps += 1
+        if self._every_n_steps and self._num_steps % self._every_n_steps == 0:
+            tf.logging.info('step %d: %s', self._num_steps, self.to_str())
+
+    def end(self, session):
+        if self._num_steps > 0:
+            tf.logging.info('%d steps: %s', self._num_steps, self.to_str())
+
+    def to_str(self):
+        """Returns a string of the latency percentiles and the rates.
+        """
+        strs = [self.latency.to_str()]
+        for name in sorted(self.rates):
+            strs.append('{}/sec: {:.1f}'.format(name, self.rates[name].rate()))
+        return ' '.join(strs)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Unit tests for session run hooks.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import tensorflow as tf
+
+from texar.run.hooks import StepMetricsHook
+
+class StepMetricsHookTest(tf.test.TestCase):
+    """Tests :class:`texar.run.hooks.StepMetricsHook`.
+    """
+
+    def test_hook(self):
+        """Tests recording the metrics of a monitored session.
+        """
+        lengths = tf.constant([3, 5])
+        outputs = tf.reduce_sum(tf.random_uniform([2, 8]))
+        hook = StepMetricsHook(
+            count_tensors={'tokens': tf.reduce_sum(lengths),
+                           'examples': tf.size(lengths)},
+            every_n_steps=2)
+        with tf.train.MonitoredSession(hooks=[hook]) as sess:
+            for _ in range(5):
+                sess.run(outputs)
+
+        self.assertEqual(hook.latency.count, 5)
+        self.assertEqual(hook.rates['tokens'].total, 40)
+        self.assertEqual(hook.rates['examples'].total, 10)
+        self.assertIn('tokens/sec', hook.to_str())
+
+    def test_hook_collection(self):
+        """Tests resolving the counts from a graph collection and a callable
+        in the graph of the session.
+        """
+        hook = StepMetricsHook(
+            count_tensors={'tokens': 'num_tokens',
+                           'examples': lambda: tf.constant(2)})
+        with tf.Graph().as_default():
+            tf.add_to_collection('num_tokens', tf.constant(3))
+            tf.add_to_collection('num_tokens', tf.constant(5))
+            outputs = tf.reduce_sum(tf.random_uniform([2, 8]))
+            with tf.train.MonitoredSession(hooks=[hook]) as sess:
+                for _ in range(5):
+                    sess.run(outputs)
+
+        self.assertEqual(hook.rates['tokens'].total, 40)
+        self.assertEqual(hook.rates['examples'].total, 10)
+
+if __name__ == "__main__":
+    tf.test.main()
@@ -0,0 +1,227 @@
+#
+"""
+Step-level profiling of session runs with full traces.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import os
+import re
+
+import tensorflow as tf
+from tensorflow.python.client import timeline
+
+__all__ = [
+    "DEFAULT_OP_CATEGORIES",
+    "StepProfiler",
+    "StepProfilerHook"
+]
+
+DEFAULT_OP_CATEGORIES = [
+    ("py_func", r"\((Eager)?PyFunc(Stateless)?\)$"),
+    ("data", r"\((Iterator\w*|\w*Dataset\w*)\)$"),
+    ("attention", r"attention"),
+    ("output_layer", r"output_layer"),
+]
+
+def _get_op_type(node_stats):
+    # The timeline label is of the form "node_name = OpType(inputs)"
+    label = node_stats.timeline_label
+    if ' = ' not in label:
+        return ''
+    return label.split(' = ', 1)[1].split('(', 1)[0]
+
+def _is_duplicate_device(device):
+    # The per-stream GPU device stats repeat the ones of "stream:all"
+    return '/memcpy' in device or \
+        ('/stream:' in device and not device.endswith('/stream:all'))
+
+
+class StepProfiler(object):
+    """Profiles one in every :attr:`every_n_steps` session runs with
+    :tf_main:`RunMetadata <RunMetadata>` of full traces, and aggregates the
+    op time by category, e.g., to tell the time spent in `tf.py_func` from
+    the time of the attention layers.
+
+    The op time is the sum of the running time of ops on all devices, which
+    can be larger than the wall time of a step if ops run in parallel.
+
+    Use :meth:`run` in place of `session.run` in a training loop, or add
+    a :class:`StepProfilerHook` to a monitored session or
+    :class:`~texar.run.Executor`.
+
+    Args:
+        every_n_steps (int): Traces one in every this number of runs,
+            starting from the first one.
+        log_dir (str, optional): If given, the Chrome trace timeline of each
+            traced run is written to `log_dir/timeline-<step>.json`, which
+            can be viewed in `chrome://tracing`.
+        categories (list, optional): A list of `(category, pattern)` pairs.
+            An op belongs to the first category whose regex pattern is found
+            in the string `"<node name> (<op type>)"`, or to category "other"
+            if none is found. If `None`, :attr:`DEFAULT_OP_CATEGORIES` is
+            used, which attributes ops to "py_func", "data", "attention" and
+            "output_layer".
+
+    Example:
+
+        .. code-block:: python
+
+            profiler = StepProfiler(every_n_steps=100, log_dir='./profile')
+            for epoch in range(num_epochs):
+                while ...:
+                    profiler.run(sess, train_op, feed_dict=feed)
+                print(profiler.summary())
+                profiler.reset()
+    """
+
+    def __init__(self, every_n_steps=100, log_dir=None, categories=None):
+        if every_n_steps <= 0:
+            raise ValueError("`every_n_steps` must be > 0.")
+        self._every_n_steps = every_n_steps
+        self._log_dir = log_dir
+        if log_dir is not None and not tf.gfile.Exists(log_dir):
+            tf.gfile.MakeDirs(log_dir)
+        if categories is None:
+            categories = DEFAULT_OP_CATEGORIES
+        self._categories = [(name, re.compile(pattern))
+                            for name, pattern in categories]
+        self._op_categories = {}
+        self._num_steps = 0
+        self.reset()
+
+    def reset(self):
+        """Clears the aggregated op time, e.g., at the start of an epoch.
+        """
+        self._num_traces = 0
+        self._category_micros = collections.Counter()
+        self._op_micros = collections.Counter()
+
+    @property
+    def num_traces(self):
+        """The number of traced runs since the last :meth:`reset`.
+        """
+        return self._num_traces
+
+    def begin_step(self):
+        """Starts a step, and returns whether it is to be traced.
+        """
+        trace = self._num_steps % self._every_n_steps == 0
+        self._num_steps += 1
+        return trace
+
+    @staticmethod
+    def run_options():
+        """Returns the :tf_main:`RunOptions <RunOptions>` of traced runs.
+        """
+        return tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE)
+
+    def run(self, session, fetches, feed_dict=None):
+        """Runs a step with `session.run`, which is traced every
+        :attr:`every_n_steps` steps.
+
+        Returns:
+            The fetched values.
+        """
+        if not self.begin_step():
+            return session.run(fetches, feed_dict=feed_dict)
+        run_metadata = tf.RunMetadata()
+        rtns = session.run(fetches, feed_dict=feed_dict,
+                           options=self.run_options(),
+                           run_metadata=run_metadata)
+        self.add_run_metadata(run_metadata)
+        return rtns
+
+    def _categorize(self, op_key):
+        category = self._op_categories.get(op_key)
+        if category is None:
+            category = 'other'
+            for name, pattern in self._categories:
+                if pattern.search(op_key):
+                    category = name
+                    break
+            self._op_categories[op_key] = category
+        return category
+
+    def add_run_metadata(self, run_metadata, step=None):
+        """Aggregates the op time in the step stats of a traced run, and
+        writes its Chrome trace if :attr:`log_dir` is given.
+
+        Args:
+            run_metadata: A :tf_main:`RunMetadata <RunMetadata>` of a run with
+                full trace.
+            step (int, optional): The step used to name the trace file.
+                Defaults to the number of steps begun so far minus one.
+        """
+        if step is None:
+            step = self._num_steps - 1
+        step_stats = run_metadata.step_stats
+        for dev_stats in step_stats.dev_stats:
+            if _is_duplicate_device(dev_stats.device):
+                continue
+            for node_stats in dev_stats.node_stats:
+                op_key = '%s (%s)' % (node_stats.node_name,
+                                      _get_op_type(node_stats))
+                micros = node_stats.all_end_rel_micros
+                self._op_micros[op_key] += micros
+                self._category_micros[self._categorize(op_key)] += micros
+        self._num_traces += 1
+
+        if self._log_dir is not None:
+            trace = timeline.Timeline(step_stats).generate_chrome_trace_format()
+            filename = os.path.join(self._log_dir, 'timeline-%d.json' % step)
+            with tf.gfile.GFile(filename, 'w') as trace_file:
+                trace_file.write(trace)
+
+    def summary(self, top_k=5):
+        """Returns a table of the average op time per traced step of each
+        category, followed by the :attr:`top_k` ops that take most time.
+        Returns an empty string if no run has been traced since the last
+        :meth:`reset`.
+        """
+        if self._num_traces == 0:
+            return ''
+        total_micros = max(sum(self._category_micros.values()), 1)
+        lines = ['%-14s %10s %7s' % ('category', 'ms/step', '%')]
+        for category, micros in self._category_micros.most_common():
+            lines.append('%-14s %10.3f %6.1f%%' % (
+                category, micros / 1000. / self._num_traces,
+                100. * micros / total_micros))
+        lines.append('top ops (ms/step):')
+        for op_key, micros in self._op_micros.most_common(top_k):
+            lines.append('%10.3f  %s' % (
+                micros / 1000. / self._num_traces, op_key))
+        return '\n'.join(lines)
+
+
+class StepProfilerHook(tf.train.SessionRunHook):
+    """A :tf_main:`SessionRunHook <train/SessionRunHook>` that profiles the
+    runs of a monitored session with a :class:`StepProfiler`, and logs the
+    summary table at the end of the session.
+
+    Args:
+        profiler: An instance of :class:`StepProfiler`.
+    """
+
+    def __init__(self, profiler):
+        self._profiler = profiler
+        self._trace = False
+
+    def before_run(self, run_context):
+        self._trace = self._profiler.begin_step()
+        if not self._trace:
+            return None
+        return tf.train.SessionRunArgs(
+            fetches=None, options=self._profiler.run_options())
+
+    def after_run(self, run_context, run_values):
+        if self._trace:
+            self._profiler.add_run_metadata(run_values.run_metadata)
+
+    def end(self, session):
+        summary = self._profiler.summary()
+        if summary:
+            tf.logging.info('Op time of traced steps:\n%s', summary)
+        self._profiler.reset()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Unit tests for the step profiler.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import tempfile
+import shutil
+
+import numpy as np
+
+import tensorflow as tf
+
+from texar.run.profiler import StepProfiler, StepProfilerHook
+
+class StepProfilerTest(tf.test.TestCase):
+    """Tests :class:`texar.run.profiler.StepProfiler`.
+    """
+
+    def setUp(self):
+        tf.test.TestCase.setUp(self)
+        inputs = tf.random_uniform([4, 8])
+        with tf.variable_scope('attention'):
+            outputs = tf.matmul(inputs, inputs, transpose_b=True)
+        outputs = tf.py_func(lambda x: x * 2, [outputs], tf.float32)
+        self._outputs = outputs
+
+    def test_run(self):
+        """Tests tracing and aggregating steps in a session.
+        """
+        log_dir = tempfile.mkdtemp()
+        profiler = StepProfiler(every_n_steps=2, log_dir=log_dir)
+        with self.test_session() as sess:
+            for _ in range(5):
+                outputs_ = profiler.run(sess, self._outputs)
+                self.assertEqual(outputs_.shape, (4, 4))
+
+        self.assertEqual(profiler.num_traces, 3)
+        self.assertEqual(sorted(tf.gfile.ListDirectory(log_dir)),
+                         ['timeline-0.json', 'timeline-2.json',
+                          'timeline-4.json'])
+        summary = profiler.summary()
+        self.assertIn('py_func', summary)
+        self.assertIn('attention', summary)
+
+        profiler.reset()
+        self.assertEqual(profiler.num_traces, 0)
+        self.assertEqual(profiler.summary(), '')
+        shutil.rmtree(log_dir)
+
+    def test_hook(self):
+        """Tests profiling a monitored session with the hook.
+        """
+        profiler = StepProfiler(every_n_steps=3)
+        hook = StepProfilerHook(profiler)
+        with tf.train.MonitoredSession(hooks=[hook]) as sess:
+            for _ in range(4):
+                outputs_ = sess.run(self._outputs)
+                self.assertTrue(np.all(outputs_ >= 0))
+            self.assertEqual(profiler.num_traces, 2)
+        # The profiler is reset at the end of the session
+        self.assertEqual(profiler.num_traces, 0)
+
+if __name__ == "__main__":
+    tf.test.main()
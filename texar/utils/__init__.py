@@ -16,5 +16,6 @@ from texar.utils.dtypes import *
 from texar.utils.variables import *
 from texar.utils.mode import *
 from texar.utils.average_recorder import *
+from texar.utils.metrics import *
 from texar.utils.utils_io import *
 from texar.utils.transformer_utils import *
@@ -0,0 +1,322 @@
+#
+"""
+Streaming recorders of latency and throughput with bounded memory.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+
+import math
+from timeit import default_timer
+
+import numpy as np
+
+__all__ = [
+    "RingBuffer",
+    "QuantileSketch",
+    "RateMeter",
+    "LatencyRecorder"
+]
+
+class RingBuffer(object):
+    """A buffer of the latest N scalars, backed by a fixed-size numpy array.
+
+    Args:
+        size (int): The max number of scalars to keep.
+        dtype: The numpy dtype of the scalars.
+    """
+
+    def __init__(self, size, dtype=np.float64):
+        if size <= 0:
+            raise ValueError("`size` must be > 0.")
+        self._data = np.zeros(size, dtype=dtype)
+        self._next = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def add(self, value):
+        """Appends a scalar, which overwrites the oldest one if the buffer is
+        full.
+        """
+        self._data[self._next] = value
+        self._next = (self._next + 1) % len(self._data)
+        self._len = min(self._len + 1, len(self._data))
+
+    def values(self):
+        """Returns a numpy array of the scalars, from the oldest to the
+        latest.
+        """
+        if self._len < len(self._data):
+            return self._data[:self._len].copy()
+        return np.roll(self._data, -self._next)
+
+    def reset(self):
+        """Cleans all scalars.
+        """
+        self._next = 0
+        self._len = 0
+
+class QuantileSketch(object):
+    """Maintains the quantiles of a stream of positive scalars (e.g.,
+    latencies) with bounded memory, by counting the scalars in
+    logarithmically spaced buckets (as in DDSketch).
+
+    The estimated quantiles are within a relative error of
+    :attr:`relative_accuracy` of the exact ones, for scalars in
+    `[min_value, max_value]`. Scalars out of the range are counted as the
+    nearest bound. The count, sum, min and max of the scalars are exact.
+
+    Args:
+        relative_accuracy (float): The relative accuracy, in `(0, 1)`.
+        min_value (float): The smallest scalar to distinguish.
+        max_value (float): The largest scalar to distinguish.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-6, max_value=1e6):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("`relative_accuracy` must be in (0, 1).")
+        if not 0 < min_value < max_value:
+            raise ValueError("`min_value` and `max_value` must satisfy "
+                             "0 < min_value < max_value.")
+        self._gamma = (1. + relative_accuracy) / (1. - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._min_value = min_value
+        num_buckets = int(math.ceil(
+            math.log(max_value / min_value) / self._log_gamma)) + 1
+        self._counts = np.zeros(num_buckets, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        """Cleans all scalars.
+        """
+        self._counts[:] = 0
+        self.count = 0
+        self.sum = 0.
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def add(self, values):
+        """Adds a scalar or an array of scalars.
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1)
+        if values.size == 0:
+            return
+        # Bucket `i` holds the scalars in (min_value * gamma^(i-1),
+        # min_value * gamma^i]
+        buckets = np.ceil(
+            np.log(np.maximum(values, self._min_value) / self._min_value)
+            / self._log_gamma).astype(np.int64)
+        buckets = np.minimum(buckets, len(self._counts) - 1)
+        self._counts += np.bincount(buckets, minlength=len(self._counts))
+        self.count += values.size
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other):
+        """Adds the scalars of another :class:`QuantileSketch` with the same
+        configuration.
+        """
+        if len(other._counts) != len(self._counts) or \
+                other._gamma != self._gamma or \
+                other._min_value != self._min_value:
+            raise ValueError("Cannot merge sketches of different "
+                             "configurations.")
+        self._counts += other._counts
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """Returns the estimated `q`-quantile, where `q` is in `[0, 1]`.
+        Returns `0.` if there is no scalar.
+        """
+        if self.count == 0:
+            return 0.
+        # The nearest-rank (0-based) of the quantile
+        rank = max(int(math.ceil(q * self.count)) - 1, 0)
+        bucket = int(np.searchsorted(np.cumsum(self._counts), rank,
+                                     side='right'))
+        value = self._min_value * 2. * self._gamma ** bucket / \
+            (self._gamma + 1.)
+        return min(max(value, self.min), self.max)
+
+    def avg(self):
+        """Returns the exact average of the scalars.
+        """
+        if self.count == 0:
+            return 0.
+        return self.sum / self.count
+
+class RateMeter(object):
+    """Measures the rate per second of counts, e.g., the number of tokens or
+    examples processed.
+
+    Args:
+        size (int, optional): If given, the rate is measured over the latest
+            :attr:`size` calls of :meth:`add`. If `None`, the rate is
+            measured since the meter is created or reset.
+        timer (optional): A callable that returns the current time in
+            seconds. Defaults to :func:`timeit.default_timer`.
+    """
+
+    def __init__(self, size=None, timer=default_timer):
+        if size is not None and size <= 0:
+            raise ValueError("`size` must be > 0 or `None`.")
+        self._size = size
+        self._timer = timer
+        if size is not None:
+            self._times = RingBuffer(size + 1)
+            self._counts = RingBuffer(size + 1)
+        self.reset()
+
+    def reset(self):
+        """Restarts the measurement from now.
+        """
+        self._start = self._timer()
+        self.total = 0
+        if self._size is not None:
+            self._times.reset()
+            self._counts.reset()
+            self._times.add(self._start)
+            self._counts.add(0)
+
+    def add(self, count):
+        """Adds a count at the current time.
+
+        Returns:
+            The rate after adding the count.
+        """
+        self.total += count
+        if self._size is not None:
+            self._times.add(self._timer())
+            self._counts.add(count)
+        return self.rate()
+
+    def rate(self):
+        """Returns the rate per second. If :attr:`size` is given, it is the
+        sum of the latest counts divided by the time from the call of
+        :meth:`add` (or :meth:`reset`) before them to the latest call.
+        Otherwise, it is the total count divided by the time since
+        :meth:`reset`.
+        """
+        if self._size is None:
+            count = self.total
+            elapsed = self._timer() - self._start
+        else:
+            times = self._times.values()
+            count = self._counts.values()[1:].sum()
+            elapsed = times[-1] - times[0]
+        if elapsed <= 0:
+            return 0.
+        return count / elapsed
+
+class _Timer(object):
+    """Context manager that adds the elapsed time to a
+    :class:`LatencyRecorder`.
+    """
+
+    def __init__(self, recorder):
+        self._recorder = recorder
+        self._start = None
+
+    def __enter__(self):
+        self._start = default_timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._recorder.add(default_timer() - self._start)
+
+class LatencyRecorder(object):
+    """Records latencies in seconds, and maintains their percentiles over
+    all records with a :class:`QuantileSketch`, and over the latest records
+    with a :class:`RingBuffer`.
+
+    Args:
+        size (int): The number of latest records to keep.
+        name (str, optional): Name of the recorder. Used when printing.
+        relative_accuracy (float): The relative accuracy of the percentiles
+            over all records.
+
+    Example:
+
+        .. code-block:: python
+
+            recorder = LatencyRecorder(name='step')
+            for _ in range(num_steps):
+                with recorder.time():
+                    sess.run(train_op)
+            print(recorder.to_str())
+            # step: p50=41.2ms p95=48.0ms p99=63.5ms
+    """
+
+    def __init__(self, size=1000, name=None, relative_accuracy=0.01):
+        self._recent = RingBuffer(size)
+        self._sketch = QuantileSketch(relative_accuracy=relative_accuracy)
+        self._name = name
+
+    def add(self, latency):
+        """Appends a latency in seconds.
+        """
+        self._recent.add(latency)
+        self._sketch.add(latency)
+
+    def time(self):
+        """Returns a context manager that records the time spent in it.
+        """
+        return _Timer(self)
+
+    @property
+    def count(self):
+        """The number of records.
+        """
+        return self._sketch.count
+
+    def avg(self):
+        """Returns the average latency over all records.
+        """
+        return self._sketch.avg()
+
+    def percentiles(self, percentiles=(50, 95, 99), recent=False):
+        """Returns a list of percentiles of the latencies.
+
+        Args:
+            percentiles: A list of percentiles in `[0, 100]`.
+            recent (bool): If `True`, the exact percentiles of the latest
+                records are returned. Otherwise, the estimated ones of all
+                records.
+        """
+        if recent:
+            values = self._recent.values()
+            if len(values) == 0:
+                return [0.] * len(percentiles)
+            return [float(p) for p in np.percentile(values, percentiles)]
+        return [self._sketch.quantile(p / 100.) for p in percentiles]
+
+    def reset(self):
+        """Cleans all records.
+        """
+        self._recent.reset()
+        self._sketch.reset()
+
+    def to_str(self, precision=1, percentiles=(50, 95, 99), recent=False):
+        """Returns a string of the percentiles in milliseconds, of the format
+        like `'name: p50=41.2ms p95=48.0ms p99=63.5ms'`.
+        """
+        values = self.percentiles(percentiles, recent=recent)
+        lat_str = ' '.join(
+            'p{}={:.{}f}ms'.format(p, v * 1000., precision)
+            for p, v in zip(percentiles, values))
+        if self._name is not None:
+            lat_str = '{}: {}'.format(self._name, lat_str)
+        return lat_str
+
+    @property
+    def name(self):
+        """The name of the recorder.
+        """
+        return self._name
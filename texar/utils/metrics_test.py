@@ -0,0 +1,89 @@
+"""
+Unit tests for streaming metric recorders.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+
+import tensorflow as tf
+
+from texar.utils.metrics import RingBuffer, QuantileSketch, RateMeter, \
+    LatencyRecorder
+
+
+class MetricsTest(tf.test.TestCase):
+    """Tests streaming metric recorders.
+    """
+
+    def test_ring_buffer(self):
+        """Tests :class:`~texar.utils.RingBuffer`.
+        """
+        buf = RingBuffer(3)
+        self.assertEqual(len(buf), 0)
+        for i in range(2):
+            buf.add(i)
+        np.testing.assert_array_equal(buf.values(), [0, 1])
+        for i in range(2, 5):
+            buf.add(i)
+        self.assertEqual(len(buf), 3)
+        np.testing.assert_array_equal(buf.values(), [2, 3, 4])
+        buf.reset()
+        self.assertEqual(len(buf.values()), 0)
+
+    def test_quantile_sketch(self):
+        """Tests :class:`~texar.utils.QuantileSketch`.
+        """
+        values = np.random.lognormal(-3, 1, size=10000)
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for chunk in np.array_split(values, 10):
+            sketch.add(chunk)
+
+        sorted_values = np.sort(values)
+        for q in [0., 0.5, 0.95, 0.99, 1.]:
+            rank = max(int(np.ceil(q * len(values))) - 1, 0)
+            self.assertAllClose(sketch.quantile(q), sorted_values[rank],
+                                rtol=0.01)
+        self.assertEqual(sketch.count, len(values))
+        self.assertAlmostEqual(sketch.avg(), np.mean(values))
+
+        other = QuantileSketch(relative_accuracy=0.01)
+        other.add(values)
+        sketch.merge(other)
+        self.assertEqual(sketch.count, 2 * len(values))
+        self.assertAllClose(sketch.quantile(0.5), np.median(values),
+                            rtol=0.01)
+
+    def test_rate_meter(self):
+        """Tests :class:`~texar.utils.RateMeter`.
+        """
+        now = [0.]
+        meter = RateMeter(timer=lambda: now[0])
+        window_meter = RateMeter(size=2, timer=lambda: now[0])
+        for count in [10, 20, 30]:
+            now[0] += 1.
+            meter.add(count)
+            window_meter.add(count)
+        self.assertEqual(meter.rate(), 20.)
+        self.assertEqual(window_meter.rate(), 25.)
+
+    def test_latency_recorder(self):
+        """Tests :class:`~texar.utils.LatencyRecorder`.
+        """
+        recorder = LatencyRecorder(size=3, name='step')
+        for latency in [0.01, 0.02, 0.03, 0.04, 1.]:
+            recorder.add(latency)
+        self.assertEqual(recorder.count, 5)
+        self.assertAllClose(recorder.percentiles([50, 100]), [0.03, 1.],
+                            rtol=0.01)
+        self.assertAllClose(recorder.percentiles([50], recent=True), [0.04])
+        self.assertTrue(recorder.to_str().startswith('step: p50='))
+
+        with recorder.time():
+            pass
+        self.assertEqual(recorder.count, 6)
+
+if __name__ == "__main__":
+    tf.test.main()
@@ -33,6 +33,7 @@ from __future__ import print_function
 from argparse import ArgumentParser
 import collections
 import math
+import multiprocessing
 import re
 import sys
 import unicodedata
@@ -45,6 +46,7 @@ import six
 from six.moves import xrange
 from six.moves import zip
 
+from texar.evals.bleu import BleuStats
 
 # pylint: enable=redefined-builtin
 
@@ -69,47 +71,14 @@ def _get_ngrams(segment, max_order):
     return ngram_counts
 
 
-def compute_bleu(reference_corpus,
-                 translation_corpus,
-                 max_order=4,
-                 use_bp=True):
-    """Computes BLEU score of translated segments against references.
-
-    Args:
-        reference_corpus: list of references for each translation. Each
-            reference should be tokenized into a list of tokens.
-        translation_corpus: list of translations to score. Each translation
-            should be tokenized into a list of tokens.
-        max_order: Maximum n-gram order to use when computing BLEU score.
-        use_bp: boolean, whether to apply brevity penalty.
-    Returns:
-        BLEU score.
+def _get_bleu_from_stats(matches_by_order, possible_matches_by_order,
+                         reference_length, translation_length, max_order,
+                         use_bp):
+    """Computes BLEU score from the n-gram matches and the corpus lengths.
     """
-
-    reference_length = 0
-    translation_length = 0
     bp = 1.0
     geo_mean = 0
 
-    matches_by_order = [0] * max_order
-    possible_matches_by_order = [0] * max_order
-    precisions = []
-
-    for (references, translations) in zip(reference_corpus, translation_corpus):
-        reference_length += len(references)
-        translation_length += len(translations)
-        ref_ngram_counts = _get_ngrams(references, max_order)
-        translation_ngram_counts = _get_ngrams(translations, max_order)
-
-        overlap = dict((ngram,
-                        min(count, translation_ngram_counts[ngram]))
-                       for ngram, count in ref_ngram_counts.items())
-
-        for ngram in overlap:
-            matches_by_order[len(ngram) - 1] += overlap[ngram]
-        for ngram in translation_ngram_counts:
-            possible_matches_by_order[len(ngram) - 1] += \
-                translation_ngram_counts[ngram]
     precisions = [0] * max_order
     smooth = 1.0
     for i in xrange(0, max_order):
@@ -135,6 +104,257 @@ def compute_bleu(reference_corpus,
     return np.float32(bleu)
 
 
+def compute_bleu(reference_corpus,
+                 translation_corpus,
+                 max_order=4,
+                 use_bp=True,
+                 num_parallel_calls=1,
+                 chunk_size=1000):
+    """Computes BLEU score of translated segments against references.
+
+    Args:
+        reference_corpus: list of references for each translation. Each
+            reference should be tokenized into a list of tokens.
+        translation_corpus: list of translations to score. Each translation
+            should be tokenized into a list of tokens.
+        max_order: Maximum n-gram order to use when computing BLEU score.
+        use_bp: boolean, whether to apply brevity penalty.
+        num_parallel_calls: number of processes to accumulate the statistics
+            of chunks of the corpus in parallel. The merged statistics are
+            the same as the serial ones.
+        chunk_size: number of segments per chunk when
+            num_parallel_calls > 1.
+    Returns:
+        BLEU score.
+    """
+    if num_parallel_calls > 1 and len(translation_corpus) > chunk_size:
+        chunks = [(reference_corpus[i:i + chunk_size],
+                   translation_corpus[i:i + chunk_size], max_order, use_bp)
+                  for i in xrange(0, len(translation_corpus), chunk_size)]
+        pool = multiprocessing.Pool(num_parallel_calls)
+        try:
+            accumulator = BleuAccumulator(max_order=max_order, use_bp=use_bp)
+            for chunk_accumulator in pool.imap_unordered(_accumulate_chunk,
+                                                         chunks):
+                accumulator += chunk_accumulator
+        finally:
+            pool.terminate()
+    else:
+        accumulator = _accumulate_chunk(
+            (reference_corpus, translation_corpus, max_order, use_bp))
+    return accumulator.result()
+
+
+def _accumulate_chunk(args):
+    """Returns a :class:`BleuAccumulator` of a chunk of the corpus given a
+    tuple (reference_corpus, translation_corpus, max_order, use_bp).
+    """
+    reference_corpus, translation_corpus, max_order, use_bp = args
+    accumulator = BleuAccumulator(max_order=max_order, use_bp=use_bp)
+    accumulator.add(reference_corpus, translation_corpus)
+    return accumulator
+
+
+def _truncate_ids(ids, end_ids):
+    """Truncates the id sequence at the first occurrence of any of end_ids.
+    """
+    ids = np.asarray(ids).reshape(-1)
+    if end_ids:
+        ends = np.flatnonzero(np.isin(ids, end_ids))
+        if len(ends) > 0:
+            ids = ids[:ends[0]]
+    return ids
+
+
+class BleuReferenceCache(object):
+    """Caches the n-gram counts and lengths of the references of an eval
+    split that is the same in every evaluation (e.g., unshuffled test
+    data), so that later evaluations only count the n-grams of the
+    translations. To be shared by :class:`BleuAccumulator` instances of the
+    same `max_order` and tokenization.
+    """
+
+    def __init__(self):
+        self.ngram_counts = []
+        self.lengths = []
+
+    def __len__(self):
+        return len(self.lengths)
+
+
+class BleuAccumulator(object):
+    """Accumulates the BLEU sufficient statistics, i.e., the n-gram matches
+    and the corpus lengths, batch by batch, e.g., as the batches are
+    returned by `session.run`. Only the statistics are kept, so the memory
+    does not grow with the number of segments. Accumulators of different
+    parts of a corpus can be merged with `+=`.
+
+    Args:
+        max_order: Maximum n-gram order to use when computing BLEU score.
+        use_bp: boolean, whether to apply brevity penalty.
+        tokenize: boolean, whether to re-tokenize the segments with
+            :func:`bleu_tokenize` as if they were joined by spaces, which is
+            what :func:`bleu_wrapper` does. Tokenization is computed once
+            per distinct token. Set to `False` for id segments.
+        case_sensitive: boolean. If `False`, tokens are lowercased. Only
+            used when :attr:`tokenize` is `True`.
+        reference_cache: optional :class:`BleuReferenceCache`. The
+            statistics of the i-th reference added are read from the cache
+            if present, or added to the cache otherwise.
+
+    Example:
+
+        .. code-block:: python
+
+            accumulator = BleuAccumulator()
+            for ... :
+                accumulator.add(references, translations)
+            bleu = accumulator.result()
+    """
+
+    def __init__(self, max_order=4, use_bp=True, tokenize=False,
+                 case_sensitive=True, reference_cache=None):
+        self._max_order = max_order
+        self._use_bp = use_bp
+        self._tokenize = tokenize
+        self._case_sensitive = case_sensitive
+        self._reference_cache = reference_cache
+        self._token_cache = {}
+        self.reset()
+
+    def reset(self):
+        """Clears the accumulated statistics.
+        """
+        self.num_segments = 0
+        self.reference_length = 0
+        self.translation_length = 0
+        self.matches_by_order = [0] * self._max_order
+        self.possible_matches_by_order = [0] * self._max_order
+
+    def _tokenize_segment(self, segment):
+        """Tokenizes the segment as :func:`bleu_tokenize` does on the
+        segment joined by spaces. Each token is tokenized in the context of
+        its neighbouring spaces, which is the only context the regexes
+        look at, so the result is cached per token and position.
+        """
+        tokens = []
+        last = len(segment) - 1
+        for i, token in enumerate(segment):
+            key = (token, i == 0, i == last)
+            sub_tokens = self._token_cache.get(key)
+            if sub_tokens is None:
+                string = token if self._case_sensitive else token.lower()
+                if i > 0:
+                    string = ' ' + string
+                if i < last:
+                    string = string + ' '
+                sub_tokens = bleu_tokenize(string)
+                self._token_cache[key] = sub_tokens
+            tokens.extend(sub_tokens)
+        return tokens
+
+    def _prepare_segment(self, segment):
+        if isinstance(segment, np.ndarray):
+            segment = segment.tolist()
+        if self._tokenize:
+            return self._tokenize_segment(segment)
+        return segment
+
+    def _get_reference_stats(self, reference, index):
+        """Returns the n-gram counts and length of the index-th reference.
+        """
+        cache = self._reference_cache
+        if cache is not None and index < len(cache):
+            return cache.ngram_counts[index], cache.lengths[index]
+        if reference is None:
+            raise ValueError('Reference %d is neither given nor cached.'
+                             % index)
+        reference = self._prepare_segment(reference)
+        ngram_counts = _get_ngrams(reference, self._max_order)
+        if cache is not None:
+            if index != len(cache):
+                raise ValueError('References must be cached in order.')
+            cache.ngram_counts.append(ngram_counts)
+            cache.lengths.append(len(reference))
+        return ngram_counts, len(reference)
+
+    def add(self, references, translations):
+        """Adds a batch of segments.
+
+        Args:
+            references: list of references for each translation. Each
+                reference is a list (or 1D array) of tokens or ids. Can be
+                `None` if the references are in the reference cache.
+            translations: list of translations. Each translation is a list
+                (or 1D array) of tokens or ids.
+        """
+        max_order = self._max_order
+        if references is None:
+            references = [None] * len(translations)
+        for (reference, translation) in zip(references, translations):
+            ref_ngram_counts, ref_length = self._get_reference_stats(
+                reference, self.num_segments)
+            translation = self._prepare_segment(translation)
+            self.num_segments += 1
+            self.reference_length += ref_length
+            self.translation_length += len(translation)
+            translation_ngram_counts = _get_ngrams(translation, max_order)
+
+            for ngram, count in ref_ngram_counts.items():
+                self.matches_by_order[len(ngram) - 1] += \
+                    min(count, translation_ngram_counts[ngram])
+            for ngram, count in translation_ngram_counts.items():
+                self.possible_matches_by_order[len(ngram) - 1] += count
+
+    def add_ids(self, references, translations, end_ids=None):
+        """Adds a batch of id segments, e.g., as returned by the decoder.
+        The n-grams are counted as int64 keys with numpy, which is much
+        faster than :meth:`add`. Note that the ids are not re-tokenized.
+
+        Args:
+            references: list of reference id sequences (lists or 1D
+                arrays), or a 2D array.
+            translations: list of translation id sequences, or a 2D array.
+            end_ids: optional list of ids, e.g., of EOS and PAD. Each
+                sequence is truncated at the first occurrence of any of
+                them.
+        """
+        references = [_truncate_ids(ref, end_ids) for ref in references]
+        translations = [_truncate_ids(trans, end_ids)
+                        for trans in translations]
+        stats = BleuStats(self._max_order)
+        stats.add_ids([[ref] for ref in references], translations)
+        self.num_segments += len(translations)
+        for i in xrange(self._max_order):
+            self.matches_by_order[i] += stats.matches_by_order[i]
+            self.possible_matches_by_order[i] += \
+                stats.possible_matches_by_order[i]
+        self.reference_length += stats.reference_length
+        self.translation_length += stats.hypothesis_length
+
+    def __iadd__(self, other):
+        if other._max_order != self._max_order:
+            raise ValueError('Cannot merge BLEU statistics of different '
+                             'max_order: %d vs %d' %
+                             (self._max_order, other._max_order))
+        for i in xrange(self._max_order):
+            self.matches_by_order[i] += other.matches_by_order[i]
+            self.possible_matches_by_order[i] += \
+                other.possible_matches_by_order[i]
+        self.num_segments += other.num_segments
+        self.reference_length += other.reference_length
+        self.translation_length += other.translation_length
+        return self
+
+    def result(self):
+        """Returns the BLEU score of the segments added so far.
+        """
+        return _get_bleu_from_stats(
+            self.matches_by_order, self.possible_matches_by_order,
+            self.reference_length, self.translation_length,
+            self._max_order, self._use_bp)
+
+
 class UnicodeRegex(object):
     """Ad-hoc hack to recognize all punctuation and symbols."""
     # pylint:disable=too-few-public-methods
@@ -22,8 +22,8 @@ import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'  # ERROR
 import sys
 import codecs
-from matplotlib import pyplot as plt
-plt.switch_backend('agg')
+import collections
+from multiprocessing.pool import ThreadPool
 import tensorflow as tf
 import texar as tx
 import numpy as np
@@ -33,6 +33,8 @@ from texar.utils.shapes import shape_list
 
 import gan_hyperparams
 import bleu_tool
+import step_runner
+import metrics_writer
 
 
 def _main(_):
@@ -48,6 +50,9 @@ def _main(_):
     train_data = tx.data.MonoTextData(train_dataset_hparams)
     valid_data = tx.data.MonoTextData(valid_dataset_hparams)
     test_data = tx.data.MonoTextData(test_dataset_hparams)
+    data_stats = None
+    if train_data.stats_aggregator is not None:
+        data_stats = train_data.stats_aggregator.get_summary()
     iterator = tx.data.FeedableDataIterator(
         {'train_g': train_data, 'train_d': train_data,
          'val': valid_data, 'test': test_data})
@@ -169,7 +174,19 @@ def _main(_):
         beta2=opt_hparams['Adam_beta2'],
         epsilon=opt_hparams['Adam_epsilon'],
     )
+    if args.accumulation_steps > 1:
+        optimizer = tx.core.GradientAccumulationOptimizer(
+            optimizer, args.accumulation_steps)
     train_op = optimizer.minimize(g_loss, global_step, var_list=g_vars)
+    averages = None
+    if args.ema_decay > 0:
+        # Evaluation swaps the generator weights with their moving averages
+        # in place
+        averages = tx.core.MovingAverageWeights(args.ema_decay, var_list=g_vars)
+        # Only the runs that apply the (accumulated) gradients update the
+        # averages
+        train_op = averages.apply(train_op, global_step)
+        ema_swap_op = averages.swap_op
 
     d_loss = d_class_loss
     d_vars = tx.utils.collect_trainable_variables([clas_embedder, classifier])
@@ -206,7 +223,27 @@ def _main(_):
                                                       outputs_infer.sample_id,
                                                       mask_id, eoa_id, pad_id)
 
-    eval_saver = tf.train.Saver(max_to_keep=5)
+    # Checkpoints are written in a background thread
+    eval_saver = tx.run.AsyncCheckpointSaver(max_to_keep=5)
+
+    profiler = None
+    if args.profile_steps > 0:
+        profiler = tx.run.StepProfiler(
+            every_n_steps=args.profile_steps,
+            log_dir=os.path.join(args.log_dir, 'profile'))
+
+    # The batch shape and learning rate are only fetched on logging steps
+    train_g_runner = step_runner.StepRunner(
+        {'train_op': train_op,
+         'step': global_step,
+         'loss': cetp_loss,
+         'g_loss': g_loss,
+         'num_tokens': tf.reduce_sum(data_batch['length']),
+         'num_examples': tf.size(data_batch['length'])},
+        periodic_fetches={'source_shape': tf.shape(template_pack['text_ids']),
+                          'lr': learning_rate},
+        profiler=profiler,
+        rate_keys=['num_tokens', 'num_examples'])
 
     def _train_epochs(session, cur_epoch, gamma_, lambda_g_):
         loss_lists, ppl_lists = [], []
@@ -224,41 +261,99 @@ def _main(_):
                 }
                 rtns_d = session.run(fetches_d, feed_dict=feed_d)
                 d_loss_ = rtns_d['d_loss']
-                fetches_g = {
-                    'template': template_pack,
-                    'holes': answer_packs,
-                    'train_op': train_op,
-                    'step': global_step,
-                    'lr': learning_rate,
-                    'loss': cetp_loss,
-                    'g_loss': g_loss
-                }
                 feed_g = {
                     iterator.handle: iterator.get_handle(sess, 'train_g'),
                     gamma: gamma_,
                     lambda_g: lambda_g_,
                     tx.context.global_mode(): tf.estimator.ModeKeys.TRAIN
                 }
-                rtns = session.run(fetches_g, feed_dict=feed_g)
-                step, template_, holes_, cetp_loss_, g_loss_ = \
-                    rtns['step'], rtns['template'], rtns['holes'], rtns['loss'], rtns['g_loss']
+                rtns = train_g_runner.run(session, feed_dict=feed_g)
+                step, cetp_loss_, g_loss_ = rtns['step'], rtns['loss'], rtns['g_loss']
                 ppl = np.exp(cetp_loss_)
-                if step % 200 == 1:
-                    rst = 'step:%s source:%s g_loss:%f d_loss:%f ppl:%f lr:%f' % \
-                          (step, template_['text_ids'].shape, g_loss_, d_loss_, ppl, rtns['lr'])
+                if 'source_shape' in rtns:
+                    rst = 'step:%s source:%s g_loss:%f d_loss:%f ppl:%f lr:%f ' \
+                          'host_bytes/step:%d' % \
+                          (step, tuple(rtns['source_shape']), g_loss_, d_loss_, ppl,
+                           rtns['lr'], train_g_runner.bytes_per_step)
                     print(rst)
+                    print(train_g_runner.metrics_to_str())
                 loss_lists.append(g_loss_)
                 ppl_lists.append(ppl)
             except tf.errors.OutOfRangeError:
                 break
         return loss_lists[::50], ppl_lists[::50]
 
+    # Except for the shuffled training data, the references and templates
+    # are the same in every evaluation, so their BLEU statistics are cached.
+    bleu_reference_caches, template_bleus = {}, {}
+
+    # Post-processes the fetched eval batches in order in a background
+    # thread, which overlaps with the session runs of the next batches.
+    eval_worker = None
+    if args.async_eval_batches > 0:
+        eval_worker = ThreadPool(1)
+
     def _test_epoch(cur_sess, cur_epoch, gamma_, lambda_g_, mode='test'):
         def _id2word_map(id_arrays):
             return [' '.join([train_data.vocab._id_to_token_map_py[i]
                               for i in sent]) for sent in id_arrays]
 
-        templates_list, targets_list, hypothesis_list = [], [], []
+        reference_cache = None
+        if mode != 'train_g':
+            reference_cache = bleu_reference_caches.setdefault(
+                mode, bleu_tool.BleuReferenceCache())
+        eval_bleu_acc = bleu_tool.BleuAccumulator(
+            tokenize=True, reference_cache=reference_cache)
+        template_bleu_acc = None
+        if mode not in template_bleus:
+            template_bleu_acc = bleu_tool.BleuAccumulator(
+                tokenize=True, reference_cache=reference_cache)
+        resultfile = None
+        if args.save_eval_output:
+            result_tmp_filename = args.log_dir + 'epoch{}.beam{}.{}.results.tmp' \
+                .format(cur_epoch, args.beam_width, mode)
+            resultfile = codecs.open(result_tmp_filename, 'w+', 'utf-8')
+
+        def _post_process(rtns):
+            real_templates_, targets_ = \
+                rtns['template']['templates'], rtns['data_batch']['text_ids']
+            filled_templates = \
+                tx.utils.fill_template(template_pack=rtns['template'],
+                                       predictions=rtns['predictions'],
+                                       eoa_id=eoa_id, pad_id=pad_id, eos_id=eos_id)
+
+            if args.bleu_on_ids:
+                eval_bleu_acc.add_ids(targets_, filled_templates,
+                                      end_ids=[eos_id, pad_id])
+                if template_bleu_acc is not None:
+                    template_bleu_acc.add_ids(targets_, real_templates_,
+                                              end_ids=[eos_id, pad_id])
+            if resultfile is not None or not args.bleu_on_ids:
+                templates, targets, generateds = _id2word_map(real_templates_.tolist()), \
+                                                 _id2word_map(targets_), \
+                                                 _id2word_map(filled_templates)
+
+                templates_list, targets_list, hypothesis_list = [], [], []
+                for template, target, generated in zip(templates, targets, generateds):
+                    template = template.split('<EOS>')[0].split('<PAD>')[0].strip().split()
+                    target = target.split('<EOS>')[0].split('<PAD>')[0].strip().split()
+                    got = generated.split('<EOS>')[0].split('<PAD>')[0].strip().split()
+                    templates_list.append(template)
+                    targets_list.append(target)
+                    hypothesis_list.append(got)
+                if not args.bleu_on_ids:
+                    eval_bleu_acc.add(targets_list, hypothesis_list)
+                    if template_bleu_acc is not None:
+                        template_bleu_acc.add(targets_list, templates_list)
+                if resultfile is not None:
+                    for tmplt, tgt, hyp in zip(templates_list, targets_list, hypothesis_list):
+                        resultfile.write("- template: " + ' '.join(tmplt) + '\n')
+                        resultfile.write("- expected: " + ' '.join(tgt) + '\n')
+                        resultfile.write('- got:      ' + ' '.join(hyp) + '\n\n')
+
+        decode_latency = tx.utils.LatencyRecorder(name='decode_latency')
+        examples_meter = tx.utils.RateMeter()
+        pending = collections.deque()
         cnt = 0
         loss_lists, ppl_lists = [], []
         while True:
@@ -276,103 +371,66 @@ def _main(_):
                     lambda_g: lambda_g_,
                     tx.context.global_mode(): tf.estimator.ModeKeys.EVAL
                 }
-                rtns = cur_sess.run(fetches, feed_dict=feed)
-                real_templates_, templates_, targets_, predictions_ = \
-                    rtns['template']['templates'], rtns['template']['text_ids'], \
-                    rtns['data_batch']['text_ids'], rtns['predictions']
+                with decode_latency.time():
+                    rtns = cur_sess.run(fetches, feed_dict=feed)
+                examples_meter.add(len(rtns['data_batch']['length']))
                 loss = rtns['loss']
                 ppl = np.exp(loss)
                 loss_lists.append(loss)
                 ppl_lists.append(ppl)
 
-                filled_templates = \
-                    tx.utils.fill_template(template_pack=rtns['template'],
-                                           predictions=rtns['predictions'],
-                                           eoa_id=eoa_id, pad_id=pad_id, eos_id=eos_id)
-
-                templates, targets, generateds = _id2word_map(real_templates_.tolist()), \
-                                                 _id2word_map(targets_), \
-                                                 _id2word_map(filled_templates)
-
-                for template, target, generated in zip(templates, targets, generateds):
-                    template = template.split('<EOS>')[0].split('<PAD>')[0].strip().split()
-                    target = target.split('<EOS>')[0].split('<PAD>')[0].strip().split()
-                    got = generated.split('<EOS>')[0].split('<PAD>')[0].strip().split()
-                    templates_list.append(template)
-                    targets_list.append(target)
-                    hypothesis_list.append(got)
+                if eval_worker is None:
+                    _post_process(rtns)
+                else:
+                    pending.append(eval_worker.apply_async(_post_process, (rtns,)))
+                    if len(pending) > args.async_eval_batches:
+                        pending.popleft().get()
 
                 cnt += 1
                 if mode is not 'test' and cnt >= 60:
                     break
             except tf.errors.OutOfRangeError:
                 break
+        while pending:
+            pending.popleft().get()
 
         avg_loss, avg_ppl = np.mean(loss_lists), np.mean(ppl_lists)
-        outputs_tmp_filename = args.log_dir + 'epoch{}.beam{}.outputs.tmp'. \
-            format(cur_epoch, args.beam_width)
-        template_tmp_filename = args.log_dir + 'epoch{}.beam{}.templates.tmp'. \
-            format(cur_epoch, args.beam_width)
-        refer_tmp_filename = os.path.join(args.log_dir, 'eval_reference.tmp')
-        with codecs.open(outputs_tmp_filename, 'w+', 'utf-8') as tmpfile, \
-                codecs.open(template_tmp_filename, 'w+', 'utf-8') as tmptpltfile, \
-                codecs.open(refer_tmp_filename, 'w+', 'utf-8') as tmpreffile:
-            for hyp, tplt, tgt in zip(hypothesis_list, templates_list, targets_list):
-                tmpfile.write(' '.join(hyp) + '\n')
-                tmptpltfile.write(' '.join(tplt) + '\n')
-                tmpreffile.write(' '.join(tgt) + '\n')
-        eval_bleu = float(100 * bleu_tool.bleu_wrapper(
-            refer_tmp_filename, outputs_tmp_filename, case_sensitive=True))
-        template_bleu = float(100 * bleu_tool.bleu_wrapper(
-            refer_tmp_filename, template_tmp_filename, case_sensitive=True))
+        eval_bleu = float(100 * eval_bleu_acc.result())
+        if template_bleu_acc is not None:
+            template_bleu = float(100 * template_bleu_acc.result())
+            if reference_cache is not None:
+                template_bleus[mode] = template_bleu
+        else:
+            template_bleu = template_bleus[mode]
         print('epoch:{} {}_bleu:{} template_bleu:{} {}_loss:{} {}_ppl:{} '.
               format(cur_epoch, mode, eval_bleu, template_bleu, mode, avg_loss, mode, avg_ppl))
-        os.remove(outputs_tmp_filename)
-        os.remove(template_tmp_filename)
-        os.remove(refer_tmp_filename)
-        if args.save_eval_output:
+        print('epoch:{} {} {} examples/sec:{:.1f}'.format(
+            cur_epoch, mode, decode_latency.to_str(), examples_meter.rate()))
+        if resultfile is not None:
+            resultfile.close()
             result_filename = \
                 args.log_dir + 'epoch{}.beam{}.{}.results.bleu{:.3f}' \
                     .format(cur_epoch, args.beam_width, mode, eval_bleu)
-            with codecs.open(result_filename, 'w+', 'utf-8') as resultfile:
-                for tmplt, tgt, hyp in zip(templates_list, targets_list, hypothesis_list):
-                    resultfile.write("- template: " + ' '.join(tmplt) + '\n')
-                    resultfile.write("- expected: " + ' '.join(tgt) + '\n')
-                    resultfile.write('- got:      ' + ' '.join(hyp) + '\n\n')
+            os.rename(result_tmp_filename, result_filename)
         return {
             'eval': eval_bleu,
             'template': template_bleu
         }, avg_ppl
 
-    def _draw_train_loss(epoch, loss_list, mode):
-        plt.figure(figsize=(14, 10))
-        plt.plot(loss_list, '--', linewidth=1, label='loss trend')
-        plt.ylabel('%s till epoch %s' % (mode, epoch))
-        plt.xlabel('every 50 steps, present_rate=%f' % args.present_rate)
-        plt.savefig(args.log_dir + '/img/%s_curve.png' % mode)
-        plt.close('all')
-
-    def _draw_bleu(epoch, test_bleu, tplt_bleu, train_bleu, train_tplt_bleu):
-        plt.figure(figsize=(14, 10))
-        legends = []
-        plt.plot(test_bleu, '--', linewidth=1, label='test bleu')
-        plt.plot(tplt_bleu, '--', linewidth=1, label='template bleu')
-        legends.extend(['test bleu', 'template bleu'])
-        plt.ylabel('bleu till epoch {}'.format(epoch))
-        plt.xlabel('every epoch')
-        plt.legend(legends, loc='upper left')
-        plt.savefig(args.log_dir + '/img/bleu.png')
-
-        plt.figure(figsize=(14, 10))
-        legends = []
-        plt.plot(train_bleu, '--', linewidth=1, label='train bleu')
-        plt.plot(train_tplt_bleu, '--', linewidth=1, label='train template bleu')
-        legends.extend(['train bleu', 'train template bleu'])
-        plt.ylabel('bleu till epoch {}'.format(epoch))
-        plt.xlabel('every epoch')
-        plt.legend(legends, loc='upper left')
-        plt.savefig(args.log_dir + '/img/train_bleu.png')
-        plt.close('all')
+    def _draw_train_loss(epoch, mode):
+        metrics.plot('%s_curve.png' % mode, [mode],
+                     xlabel='every 50 steps, present_rate=%f' % args.present_rate,
+                     ylabel='%s till epoch %s' % (mode, epoch))
+
+    def _draw_bleu(epoch):
+        metrics.plot('bleu.png', ['test_bleu', 'template_bleu'],
+                     labels=['test bleu', 'template bleu'],
+                     xlabel='every epoch',
+                     ylabel='bleu till epoch {}'.format(epoch))
+        metrics.plot('train_bleu.png', ['train_bleu', 'train_template_bleu'],
+                     labels=['train bleu', 'train template bleu'],
+                     xlabel='every epoch',
+                     ylabel='bleu till epoch {}'.format(epoch))
 
     config_ = tf.ConfigProto(allow_soft_placement=True)
     config_.gpu_options.allow_growth = True
@@ -381,11 +439,13 @@ def _main(_):
         sess.run(tf.global_variables_initializer())
         sess.run(tf.local_variables_initializer())
         sess.run(tf.tables_initializer())
+        if data_stats is not None:
+            data_stats_writer = tf.summary.FileWriter(
+                os.path.join(args.log_dir, 'data_stats'))
 
         iterator.initialize_dataset(sess)
 
-        loss_list, ppl_list, test_ppl_list = [], [], []
-        test_bleu, tplt_bleu, train_bleu, train_tplt_bleu = [], [], [], []
+        metrics = metrics_writer.MetricsWriter(args.log_dir)
         gamma_, lambda_g_ = 1., 0.
         if args.running_mode == 'train_and_evaluate':
             for epoch in range(70, args.max_train_epoch):
@@ -396,31 +456,49 @@ def _main(_):
 
                 # bleu on test set and train set
                 if epoch % args.bleu_interval == 0 or epoch == args.max_train_epoch - 1:
+                    if averages is not None:
+                        sess.run(ema_swap_op)
                     iterator.restart_dataset(sess, 'test')
                     bleu_scores, test_ppl = _test_epoch(sess, epoch, gamma_, lambda_g_)
-                    test_bleu.append(bleu_scores['eval'])
-                    tplt_bleu.append(bleu_scores['template'])
-                    test_ppl_list.append(test_ppl)
-                    _draw_train_loss(epoch, test_ppl_list, mode='test_perplexity')
+                    metrics.add('test_bleu', [bleu_scores['eval']], epoch)
+                    metrics.add('template_bleu', [bleu_scores['template']], epoch)
+                    metrics.add('test_perplexity', [test_ppl], epoch)
+                    _draw_train_loss(epoch, mode='test_perplexity')
 
                     iterator.restart_dataset(sess, 'train_g')
                     train_bleu_scores, _ = _test_epoch(sess, epoch, gamma_, lambda_g_, mode='train_g')
-                    train_bleu.append(train_bleu_scores['eval'])
-                    train_tplt_bleu.append(train_bleu_scores['template'])
-                    _draw_bleu(epoch, test_bleu, tplt_bleu, train_bleu, train_tplt_bleu)
+                    metrics.add('train_bleu', [train_bleu_scores['eval']], epoch)
+                    metrics.add('train_template_bleu', [train_bleu_scores['template']],
+                                epoch)
+                    if averages is not None:
+                        # Swaps the trained weights back
+                        sess.run(ema_swap_op)
+                    _draw_bleu(epoch)
                     eval_saver.save(sess, args.log_dir + 'my-model-latest.ckpt')
+                    print('epoch:{} {}'.format(epoch, eval_saver.stall.to_str()))
 
                 # train
                 iterator.restart_dataset(sess, ['train_g', 'train_d'])
                 losses, ppls = _train_epochs(sess, epoch, gamma_, lambda_g_)
-                loss_list.extend(losses)
-                ppl_list.extend(ppls)
-                _draw_train_loss(epoch, loss_list, mode='train_loss')
-                _draw_train_loss(epoch, ppl_list, mode='perplexity')
+                if data_stats is not None:
+                    data_stats_writer.add_summary(sess.run(data_stats), epoch)
+                if profiler is not None and profiler.num_traces > 0:
+                    print('epoch:{} op time of traced steps:\n{}'.format(
+                        epoch, profiler.summary()))
+                    profiler.reset()
+                metrics.add('train_loss', losses, epoch)
+                metrics.add('perplexity', ppls, epoch)
+                _draw_train_loss(epoch, mode='train_loss')
+                _draw_train_loss(epoch, mode='perplexity')
                 sys.stdout.flush()
 
                 if epoch == args.pretrain_epoch:
                     eval_saver.save(sess, args.log_dir + 'pretrained-model.ckpt')
+        metrics.close()
+        eval_saver.close()
+        if eval_worker is not None:
+            eval_worker.close()
+            eval_worker.join()
 
 
 if __name__ == '__main__':
@@ -5,7 +5,7 @@ configurate the hyperparameters, based on command line arguments.
 import argparse
 import os
 
-from texar.data import SpecialTokens
+from texar.data import SpecialTokens, get_cache_filename
 
 
 class Hyperparams:
@@ -43,6 +43,37 @@ def load_hyperparams():
                            default='./yahoo_data/')
     argparser.add_argument('--save_eval_output', default=1,
                            help='save the eval output to file')
+    argparser.add_argument('--bleu_on_ids', type=int, default=0,
+                           help='compute eval BLEU on the token ids, which is '
+                                'faster but does not re-tokenize the words '
+                                'as the default BLEU does')
+    argparser.add_argument('--async_eval_batches', type=int, default=4,
+                           help='max number of fetched eval batches waiting '
+                                'to be filled, scored and written in a '
+                                'background thread; 0 to do it synchronously')
+    argparser.add_argument('--cache_eval_data', type=int, default=0,
+                           help='cache the decoded valid/test data in log_dir '
+                                'to skip reading and decoding in repeated '
+                                'evaluations; the cache is rebuilt when the '
+                                'data files or hyperparameters change')
+    argparser.add_argument('--data_latency_stats', type=int, default=0,
+                           help='record the latency of each stage of the '
+                                'training data pipeline in log_dir/data_stats')
+    argparser.add_argument('--profile_steps', type=int, default=0,
+                           help='trace one in every this number of training '
+                                'steps, write the timelines to log_dir/profile '
+                                'and print the op time by category every '
+                                'epoch; 0 to disable')
+    argparser.add_argument('--accumulation_steps', type=int, default=1,
+                           help='accumulate the gradients of this number of '
+                                'batches before applying them, for an '
+                                'effective batch size of batch_size times '
+                                'this; the global step (and the learning '
+                                'rate schedule) proceeds once per update')
+    argparser.add_argument('--ema_decay', type=float, default=0.,
+                           help='decay of the exponential moving averages of '
+                                'the weights, updated every training step and '
+                                'swapped in for evaluation; 0 to disable')
     argparser.add_argument('--lr_constant', type=float, default=1)
     argparser.add_argument('--learning_rate_strategy', type=str, default='dynamic')  # 'static'
     argparser.add_argument('--zero_pad', type=int, default=0)
@@ -86,6 +117,8 @@ def load_hyperparams():
         },
         'batch_size': args.batch_size,
         'allow_smaller_final_batch': True,
+        'num_parallel_calls': 'auto',
+        'prefetch_buffer_size': 'auto',
     }
     eval_dataset_hparams = {
         "num_epochs": 1,
@@ -101,6 +134,8 @@ def load_hyperparams():
         },
         'batch_size': args.test_batch_size,
         'allow_smaller_final_batch': True,
+        'num_parallel_calls': 'auto',
+        'prefetch_buffer_size': 'auto',
     }
     test_dataset_hparams = {
         "num_epochs": 1,
@@ -116,7 +151,16 @@ def load_hyperparams():
         },
         'batch_size': args.test_batch_size,
         'allow_smaller_final_batch': True,
+        'num_parallel_calls': 'auto',
+        'prefetch_buffer_size': 'auto',
     }
+    train_dataset_hparams['latency_stats'] = bool(args.data_latency_stats)
+    if args.cache_eval_data:
+        # The cache files are keyed by the data files and hyperparameters
+        eval_dataset_hparams['cache'] = get_cache_filename(
+            os.path.join(args.log_dir, 'valid'), eval_dataset_hparams)
+        test_dataset_hparams['cache'] = get_cache_filename(
+            os.path.join(args.log_dir, 'test'), test_dataset_hparams)
     args.word_embedding_hparams = {
         'name': 'lookup_table',
         'dim': args.hidden_dim,
@@ -190,6 +234,9 @@ def load_hyperparams():
                 'learning_rate': 5e-4,
             },
         },
+        # Accumulates the gradients of the discriminator as those of the
+        # generator, so that both update once per effective batch
+        'gradient_accumulation_steps': args.accumulation_steps,
     }
     print('logdir:{}'.format(args.log_dir))
     if not os.path.exists(args.log_dir):
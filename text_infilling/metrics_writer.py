@@ -0,0 +1,173 @@
+# Copyright 2018 The Texar Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Appends scalar metrics to a JSON-lines log, and renders their plots in a
+separate process.
+
+Run as a script to render a plot from the log, e.g.,
+
+    python metrics_writer.py --metrics_file log_dir/metrics.jsonl \\
+        --image bleu.png --names test_bleu template_bleu
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from argparse import ArgumentParser
+import json
+import math
+import os
+import subprocess
+import sys
+
+
+class MetricsWriter(object):
+    """Appends scalar metrics to `log_dir/metrics.jsonl` from the training
+    thread, and renders the plots of the metrics to `log_dir/img/` in
+    separate processes, so that neither matplotlib nor the length of the
+    history slow down training.
+
+    Args:
+        log_dir (str): The directory of the metrics log. The plots are saved
+            in its `img/` subdirectory.
+        max_points (int): The maximum number of points of a series in the
+            plots. Longer series are downsampled.
+    """
+
+    def __init__(self, log_dir, max_points=1000):
+        self._log_dir = log_dir
+        self._max_points = max_points
+        self._filename = os.path.join(log_dir, 'metrics.jsonl')
+        self._file = open(self._filename, 'w')
+        self._figures = {}
+        self._renderers = {}
+        self._stale_images = set()
+
+    def add(self, name, values, epoch):
+        """Appends values to a series.
+
+        Args:
+            name (str): The name of the series.
+            values: A list of scalars.
+            epoch (int): The epoch of the values.
+        """
+        for value in values:
+            self._file.write(json.dumps(
+                {'name': name, 'epoch': epoch, 'value': float(value)}) + '\n')
+        self._file.flush()
+
+    def plot(self, image, names, labels=None, xlabel='', ylabel=''):
+        """Renders series to an image in a separate process. If the image is
+        still being rendered, it is rendered again when :meth:`close` is
+        called, unless it is requested again after the current rendering
+        finishes.
+
+        Args:
+            image (str): The file name of the image in `log_dir/img/`.
+            names (list): The names of the series to plot.
+            labels (list, optional): The legends of the series. If `None`,
+                :attr:`names` are used.
+            xlabel (str): The label of the x axis.
+            ylabel (str): The label of the y axis.
+        """
+        self._figures[image] = {
+            'names': list(names),
+            'labels': list(labels or names),
+            'xlabel': xlabel,
+            'ylabel': ylabel
+        }
+        renderer = self._renderers.get(image)
+        if renderer is not None and renderer.poll() is None:
+            self._stale_images.add(image)
+            return
+        self._stale_images.discard(image)
+        self._renderers[image] = self._render(image)
+
+    def _render(self, image):
+        figure = self._figures[image]
+        cmd = [sys.executable, os.path.abspath(__file__),
+               '--metrics_file', self._filename,
+               '--image', os.path.join(self._log_dir, 'img', image),
+               '--max_points', str(self._max_points),
+               '--xlabel', figure['xlabel'],
+               '--ylabel', figure['ylabel'],
+               '--names'] + figure['names'] + ['--labels'] + figure['labels']
+        return subprocess.Popen(cmd)
+
+    def close(self):
+        """Closes the log, and waits for the plots to be rendered.
+        """
+        self._file.close()
+        for renderer in self._renderers.values():
+            renderer.wait()
+        for image in self._stale_images:
+            self._render(image).wait()
+        self._stale_images.clear()
+
+
+def _read_series(filename, names):
+    series = dict((name, []) for name in names)
+    with open(filename) as metrics_file:
+        for line in metrics_file:
+            record = json.loads(line)
+            if record['name'] in series:
+                series[record['name']].append(record['value'])
+    return series
+
+def _downsample(values, max_points):
+    """Returns the indexes and values of every `k`-th point, and the last
+    point, so that there are at most about `max_points` points.
+    """
+    stride = max(1, int(math.ceil(len(values) / float(max_points))))
+    indexes = list(range(0, len(values), stride))
+    if indexes and indexes[-1] != len(values) - 1:
+        indexes.append(len(values) - 1)
+    return indexes, [values[i] for i in indexes]
+
+def _main():
+    argparser = ArgumentParser()
+    argparser.add_argument('--metrics_file', type=str, required=True)
+    argparser.add_argument('--image', type=str, required=True)
+    argparser.add_argument('--names', type=str, nargs='+', required=True)
+    argparser.add_argument('--labels', type=str, nargs='*', default=None)
+    argparser.add_argument('--max_points', type=int, default=1000)
+    argparser.add_argument('--xlabel', type=str, default='')
+    argparser.add_argument('--ylabel', type=str, default='')
+    args = argparser.parse_args()
+
+    import matplotlib
+    matplotlib.use('agg')
+    from matplotlib import pyplot as plt
+
+    series = _read_series(args.metrics_file, args.names)
+    labels = args.labels or args.names
+    plt.figure(figsize=(14, 10))
+    for name, label in zip(args.names, labels):
+        indexes, values = _downsample(series[name], args.max_points)
+        plt.plot(indexes, values, '--', linewidth=1, label=label)
+    plt.ylabel(args.ylabel)
+    plt.xlabel(args.xlabel)
+    if len(args.names) > 1:
+        plt.legend(labels, loc='upper left')
+    # Writes to a temp file first so that the image is never half-written
+    root, ext = os.path.splitext(args.image)
+    tmp_image = root + '.tmp' + ext
+    plt.savefig(tmp_image)
+    plt.close('all')
+    os.rename(tmp_image, args.image)
+
+
+if __name__ == '__main__':
+    _main()
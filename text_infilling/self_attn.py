@@ -23,19 +23,21 @@ import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'  # ERROR
 import sys
 import codecs
+import collections
+from multiprocessing.pool import ThreadPool
+from timeit import default_timer
 import numpy as np
 import tensorflow as tf
 import texar as tx
-from matplotlib import pyplot as plt
-
-plt.switch_backend('agg')
 
 import self_attn_hyperparams
 import bleu_tool
+import step_runner
+import metrics_writer
 
 
-def _main(_):
-    hparams = self_attn_hyperparams.load_hyperparams()
+def _train(hparams, server=None, num_replicas=1, is_chief=True,
+           steps_per_epoch=None):
     train_dataset_hparams, valid_dataset_hparams, test_dataset_hparams, \
     decoder_hparams, opt_hparams, opt_vars, loss_hparams, args = \
         hparams['train_dataset_hparams'], hparams['eval_dataset_hparams'], \
@@ -47,6 +49,9 @@ def _main(_):
     train_data = tx.data.MonoTextData(train_dataset_hparams)
     valid_data = tx.data.MonoTextData(valid_dataset_hparams)
     test_data = tx.data.MonoTextData(test_dataset_hparams)
+    data_stats = None
+    if train_data.stats_aggregator is not None:
+        data_stats = train_data.stats_aggregator.get_summary()
     iterator = tx.data.TrainTestDataIterator(train=train_data,
                                              val=valid_data,
                                              test=test_data)
@@ -56,8 +61,6 @@ def _main(_):
     eoa_id = train_data.vocab.token_to_id_map_py['<EOA>']
     eos_id = train_data.vocab.token_to_id_map_py['<EOS>']
     pad_id = train_data.vocab.token_to_id_map_py['<PAD>']
-    template_pack, answer_packs = \
-        tx.utils.prepare_template(data_batch, args, mask_id, boa_id, eoa_id, pad_id)
 
     # Model architecture
     embedder = tx.modules.WordEmbedder(vocab_size=train_data.vocab.size,
@@ -66,24 +69,29 @@ def _main(_):
         tx.modules.TemplateTransformerDecoder(embedding=embedder._embedding,
                                               hparams=decoder_hparams)
 
-    cetp_loss = None
-    cur_template_pack = template_pack
-    for hole in answer_packs:
-        logits, preds = decoder(decoder_input_pack=hole,
-                                template_input_pack=cur_template_pack,
-                                encoder_decoder_attention_bias=None,
-                                args=args)
-        cur_loss = tx.utils.smoothing_cross_entropy(
-            logits,
-            hole['text_ids'][:, 1:],
-            train_data.vocab.size,
-            loss_hparams['label_confidence'])
-        cetp_loss = cur_loss if cetp_loss is None \
-            else tf.concat([cetp_loss, cur_loss], -1)
-        cur_template_pack = tx.utils.update_template_pack(cur_template_pack,
-                                                          hole['text_ids'][:, 1:],
-                                                          mask_id, eoa_id, pad_id)
-    cetp_loss = tf.reduce_mean(cetp_loss)
+    def _compute_loss(batch):
+        template_pack, answer_packs = \
+            tx.utils.prepare_template(batch, args, mask_id, boa_id, eoa_id, pad_id)
+        cetp_loss = None
+        cur_template_pack = template_pack
+        for hole in answer_packs:
+            logits, preds = decoder(decoder_input_pack=hole,
+                                    template_input_pack=cur_template_pack,
+                                    encoder_decoder_attention_bias=None,
+                                    args=args)
+            cur_loss = tx.utils.smoothing_cross_entropy(
+                logits,
+                hole['text_ids'][:, 1:],
+                train_data.vocab.size,
+                loss_hparams['label_confidence'])
+            cetp_loss = cur_loss if cetp_loss is None \
+                else tf.concat([cetp_loss, cur_loss], -1)
+            cur_template_pack = tx.utils.update_template_pack(cur_template_pack,
+                                                              hole['text_ids'][:, 1:],
+                                                              mask_id, eoa_id, pad_id)
+        return tf.reduce_mean(cetp_loss), template_pack, answer_packs
+
+    cetp_loss, template_pack, answer_packs = _compute_loss(data_batch)
 
     global_step = tf.Variable(0, trainable=False)
     if args.learning_rate_strategy == 'static':
@@ -101,7 +109,49 @@ def _main(_):
                                        beta1=opt_hparams['Adam_beta1'],
                                        beta2=opt_hparams['Adam_beta2'],
                                        epsilon=opt_hparams['Adam_epsilon'])
-    train_op = optimizer.minimize(cetp_loss, global_step)
+    if args.accumulation_steps > 1:
+        if server is not None:
+            raise ValueError('--accumulation_steps is not supported with '
+                             '--num_replicas > 1')
+        optimizer = tx.core.GradientAccumulationOptimizer(
+            optimizer, args.accumulation_steps)
+    sync_hook = None
+    if server is not None:
+        # Averages the gradients of all replicas in every step
+        optimizer = tf.train.SyncReplicasOptimizer(
+            optimizer, replicas_to_aggregate=num_replicas,
+            total_num_replicas=num_replicas)
+        sync_hook = optimizer.make_session_run_hook(is_chief)
+    train_loss = cetp_loss
+    if args.num_towers > 1:
+        # Each tower computes the gradients of a slice of the batch on its
+        # own CPU device, with the variables shared
+        batch_slices, tower_weights = \
+            tx.core.split_batch(data_batch, args.num_towers)
+        tower_losses, tower_grads = [], []
+        for i, (device, batch_slice) in enumerate(zip(
+                tx.core.get_tower_devices(args.num_towers), batch_slices)):
+            with tf.device(device), tf.name_scope('tower_%d' % i):
+                tower_loss, _, _ = _compute_loss(batch_slice)
+                tower_losses.append(tower_loss)
+                tower_grads.append(optimizer.compute_gradients(tower_loss))
+        train_loss = tf.add_n(
+            [loss * w for loss, w in zip(tower_losses, tower_weights)])
+        train_op = optimizer.apply_gradients(
+            tx.core.average_gradients(tower_grads, tower_weights), global_step)
+    else:
+        train_op = optimizer.minimize(cetp_loss, global_step)
+    averages = None
+    if args.ema_decay > 0:
+        if server is not None:
+            raise ValueError('--ema_decay is not supported with '
+                             '--num_replicas > 1')
+        # Evaluation swaps the weights with their moving averages in place
+        averages = tx.core.MovingAverageWeights(args.ema_decay)
+        # Only the runs that apply the (accumulated) gradients update the
+        # averages
+        train_op = averages.apply(train_op, global_step)
+        ema_swap_op = averages.swap_op
 
     offsets = tx.utils.generate_prediction_offsets(data_batch['text_ids'],
                                                    args.max_decode_len + 1)
@@ -124,56 +174,91 @@ def _main(_):
                                                       preds['sampled_ids'][:, 0],
                                                       mask_id, eoa_id, pad_id)
 
+    profiler = None
+    if args.profile_steps > 0 and is_chief:
+        profiler = tx.run.StepProfiler(
+            every_n_steps=args.profile_steps,
+            log_dir=os.path.join(args.log_dir, 'profile'))
+
+    # The batch shape and learning rate are only fetched on logging steps
+    step_runners = {}
+
     def _train_epochs(session, cur_epoch, mode='train'):
         iterator.switch_to_train_data(session)
+        if mode not in step_runners:
+            fetches = {
+                'step': global_step,
+                'loss': train_loss if mode == 'train' else cetp_loss,
+                'num_tokens': tf.reduce_sum(data_batch['length']),
+                'num_examples': tf.size(data_batch['length'])
+            }
+            if mode == 'train':
+                fetches['train_op'] = train_op
+            step_runners[mode] = step_runner.StepRunner(
+                fetches,
+                periodic_fetches={
+                    'source_shape': tf.shape(template_pack['text_ids']),
+                    'lr': learning_rate
+                },
+                profiler=profiler,
+                rate_keys=['num_tokens', 'num_examples'])
+        runner = step_runners[mode]
         loss_lists, ppl_lists = [], []
         cnt = 0
         while True:
             try:
-                fetches = {
-                    'template': template_pack,
-                    'holes': answer_packs,
-                    'step': global_step,
-                    'lr': learning_rate,
-                    'loss': cetp_loss
-                }
-                if mode == 'train':
-                    fetches['train_op'] = train_op
                 feed = {
                     tx.context.global_mode(): tf.estimator.ModeKeys.TRAIN if mode == 'train'
                     else tf.estimator.ModeKeys.EVAL
                 }
                 if args.learning_rate_strategy == 'static':
                     feed[learning_rate] = opt_vars['learning_rate']
-                rtns = session.run(fetches, feed_dict=feed)
-                step, template_, holes_, loss = rtns['step'], \
-                                                rtns['template'], rtns['holes'], rtns['loss']
+                rtns = runner.run(session, feed_dict=feed)
+                step, loss = rtns['step'], rtns['loss']
                 ppl = np.exp(loss)
-                if step % 200 == 1 and mode == 'train':
-                    rst = 'step:%s source:%s loss:%f ppl:%f lr:%f' % \
-                          (step, template_['text_ids'].shape, loss, ppl, rtns['lr'])
+                if mode == 'train' and 'source_shape' in rtns:
+                    rst = 'step:%s source:%s loss:%f ppl:%f lr:%f host_bytes/step:%d' % \
+                          (step, tuple(rtns['source_shape']), loss, ppl, rtns['lr'],
+                           runner.bytes_per_step)
                     print(rst)
+                    print(runner.metrics_to_str())
                 loss_lists.append(loss)
                 ppl_lists.append(ppl)
                 cnt += 1
                 if mode is not 'train' and cnt >= 50:
                     break
+                if mode == 'train' and cnt == steps_per_epoch:
+                    _decay_static_lr(cur_epoch)
+                    break
             except tf.errors.OutOfRangeError:
-                if args.learning_rate_strategy == 'static':
-                    avg_loss = np.average(loss_list)
-                    if avg_loss < opt_vars['best_train_loss']:
-                        opt_vars['best_train_loss'] = avg_loss
-                        opt_vars['epochs_not_improved'] = 0
-                    else:
-                        opt_vars['epochs_not_improved'] += 1
-                    if opt_vars['epochs_not_improved'] >= 8 and opt_vars['decay_time'] <= 3:
-                        opt_vars['learning_rate'] *= opt_vars['lr_decay_rate']
-                        print("[LR DECAY]: lr decay to %f at epoch %d" %
-                              (opt_vars['learning_rate'], cur_epoch))
-                        opt_vars['decay_time'] += 1
+                _decay_static_lr(cur_epoch)
                 break
         return loss_lists, ppl_lists
 
+    def _decay_static_lr(cur_epoch):
+        if args.learning_rate_strategy == 'static':
+            avg_loss = np.average(loss_list)
+            if avg_loss < opt_vars['best_train_loss']:
+                opt_vars['best_train_loss'] = avg_loss
+                opt_vars['epochs_not_improved'] = 0
+            else:
+                opt_vars['epochs_not_improved'] += 1
+            if opt_vars['epochs_not_improved'] >= 8 and opt_vars['decay_time'] <= 3:
+                opt_vars['learning_rate'] *= opt_vars['lr_decay_rate']
+                print("[LR DECAY]: lr decay to %f at epoch %d" %
+                      (opt_vars['learning_rate'], cur_epoch))
+                opt_vars['decay_time'] += 1
+
+    # Except for the shuffled training data, the references and templates
+    # are the same in every evaluation, so their BLEU statistics are cached.
+    bleu_reference_caches, template_bleus = {}, {}
+
+    # Post-processes the fetched eval batches in order in a background
+    # thread, which overlaps with the session runs of the next batches.
+    eval_worker = None
+    if args.async_eval_batches > 0:
+        eval_worker = ThreadPool(1)
+
     def _test_epoch(cur_sess, cur_epoch, mode='test'):
         def _id2word_map(id_arrays):
             return [' '.join([train_data.vocab._id_to_token_map_py[i]
@@ -185,7 +270,62 @@ def _main(_):
             iterator.switch_to_train_data(cur_sess)
         else:
             iterator.switch_to_val_data(cur_sess)
-        templates_list, targets_list, hypothesis_list = [], [], []
+        reference_cache = None
+        if mode != 'train':
+            reference_cache = bleu_reference_caches.setdefault(
+                mode, bleu_tool.BleuReferenceCache())
+        eval_bleu_acc = bleu_tool.BleuAccumulator(
+            tokenize=True, reference_cache=reference_cache)
+        template_bleu_acc = None
+        if mode not in template_bleus:
+            template_bleu_acc = bleu_tool.BleuAccumulator(
+                tokenize=True, reference_cache=reference_cache)
+        resultfile = None
+        if args.save_eval_output:
+            result_tmp_filename = args.log_dir + 'epoch{}.beam{}.{}.results.tmp' \
+                .format(cur_epoch, args.beam_width, mode)
+            resultfile = codecs.open(result_tmp_filename, 'w+', 'utf-8')
+
+        def _post_process(rtns):
+            real_templates_, targets_ = \
+                rtns['template']['templates'], rtns['data_batch']['text_ids']
+            filled_templates = \
+                tx.utils.fill_template(template_pack=rtns['template'],
+                                       predictions=rtns['predictions'],
+                                       eoa_id=eoa_id, pad_id=pad_id, eos_id=eos_id)
+
+            if args.bleu_on_ids:
+                eval_bleu_acc.add_ids(targets_, filled_templates,
+                                      end_ids=[eos_id, pad_id])
+                if template_bleu_acc is not None:
+                    template_bleu_acc.add_ids(targets_, real_templates_,
+                                              end_ids=[eos_id, pad_id])
+            if resultfile is not None or not args.bleu_on_ids:
+                templates, targets, generateds = _id2word_map(real_templates_.tolist()), \
+                                                 _id2word_map(targets_), \
+                                                 _id2word_map(filled_templates)
+
+                templates_list, targets_list, hypothesis_list = [], [], []
+                for template, target, generated in zip(templates, targets, generateds):
+                    template = template.split('<EOS>')[0].split('<PAD>')[0].strip().split()
+                    target = target.split('<EOS>')[0].split('<PAD>')[0].strip().split()
+                    got = generated.split('<EOS>')[0].split('<PAD>')[0].strip().split()
+                    templates_list.append(template)
+                    targets_list.append(target)
+                    hypothesis_list.append(got)
+                if not args.bleu_on_ids:
+                    eval_bleu_acc.add(targets_list, hypothesis_list)
+                    if template_bleu_acc is not None:
+                        template_bleu_acc.add(targets_list, templates_list)
+                if resultfile is not None:
+                    for tmplt, tgt, hyp in zip(templates_list, targets_list, hypothesis_list):
+                        resultfile.write("- template: " + ' '.join(tmplt) + '\n')
+                        resultfile.write("- expected: " + ' '.join(tgt) + '\n')
+                        resultfile.write('- got:      ' + ' '.join(hyp) + '\n\n')
+
+        decode_latency = tx.utils.LatencyRecorder(name='decode_latency')
+        examples_meter = tx.utils.RateMeter()
+        pending = collections.deque()
         cnt = 0
         loss_lists, ppl_lists = [], []
         while True:
@@ -198,137 +338,316 @@ def _main(_):
                     'loss': cetp_loss
                 }
                 feed = {tx.context.global_mode(): tf.estimator.ModeKeys.EVAL}
-                rtns = cur_sess.run(fetches, feed_dict=feed)
-                real_templates_, templates_, targets_, predictions_ = \
-                    rtns['template']['templates'], rtns['template']['text_ids'], \
-                    rtns['data_batch']['text_ids'], rtns['predictions']
+                with decode_latency.time():
+                    rtns = cur_sess.run(fetches, feed_dict=feed)
+                examples_meter.add(len(rtns['data_batch']['length']))
                 loss = rtns['loss']
                 ppl = np.exp(loss)
                 loss_lists.append(loss)
                 ppl_lists.append(ppl)
 
-                filled_templates = \
-                    tx.utils.fill_template(template_pack=rtns['template'],
-                                           predictions=rtns['predictions'],
-                                           eoa_id=eoa_id, pad_id=pad_id, eos_id=eos_id)
-
-                templates, targets, generateds = _id2word_map(real_templates_.tolist()), \
-                                                 _id2word_map(targets_), \
-                                                 _id2word_map(filled_templates)
-
-                for template, target, generated in zip(templates, targets, generateds):
-                    template = template.split('<EOS>')[0].split('<PAD>')[0].strip().split()
-                    target = target.split('<EOS>')[0].split('<PAD>')[0].strip().split()
-                    got = generated.split('<EOS>')[0].split('<PAD>')[0].strip().split()
-                    templates_list.append(template)
-                    targets_list.append(target)
-                    hypothesis_list.append(got)
+                if eval_worker is None:
+                    _post_process(rtns)
+                else:
+                    pending.append(eval_worker.apply_async(_post_process, (rtns,)))
+                    if len(pending) > args.async_eval_batches:
+                        pending.popleft().get()
 
                 cnt += 1
                 if mode is not 'test' and cnt >= 60:
                     break
             except tf.errors.OutOfRangeError:
                 break
+        while pending:
+            pending.popleft().get()
 
         avg_loss, avg_ppl = np.mean(loss_lists), np.mean(ppl_lists)
-        outputs_tmp_filename = args.log_dir + 'epoch{}.beam{}.outputs.tmp'. \
-            format(cur_epoch, args.beam_width)
-        template_tmp_filename = args.log_dir + 'epoch{}.beam{}.templates.tmp'. \
-            format(cur_epoch, args.beam_width)
-        refer_tmp_filename = os.path.join(args.log_dir, 'eval_reference.tmp')
-        with codecs.open(outputs_tmp_filename, 'w+', 'utf-8') as tmpfile, \
-                codecs.open(template_tmp_filename, 'w+', 'utf-8') as tmptpltfile, \
-                codecs.open(refer_tmp_filename, 'w+', 'utf-8') as tmpreffile:
-            for hyp, tplt, tgt in zip(hypothesis_list, templates_list, targets_list):
-                tmpfile.write(' '.join(hyp) + '\n')
-                tmptpltfile.write(' '.join(tplt) + '\n')
-                tmpreffile.write(' '.join(tgt) + '\n')
-        eval_bleu = float(100 * bleu_tool.bleu_wrapper(
-            refer_tmp_filename, outputs_tmp_filename, case_sensitive=True))
-        template_bleu = float(100 * bleu_tool.bleu_wrapper(
-            refer_tmp_filename, template_tmp_filename, case_sensitive=True))
+        eval_bleu = float(100 * eval_bleu_acc.result())
+        if template_bleu_acc is not None:
+            template_bleu = float(100 * template_bleu_acc.result())
+            if reference_cache is not None:
+                template_bleus[mode] = template_bleu
+        else:
+            template_bleu = template_bleus[mode]
         print('epoch:{} {}_bleu:{} template_bleu:{} {}_loss:{} {}_ppl:{} '.
               format(cur_epoch, mode, eval_bleu, template_bleu, mode, avg_loss, mode, avg_ppl))
-        os.remove(outputs_tmp_filename)
-        os.remove(template_tmp_filename)
-        os.remove(refer_tmp_filename)
-        if args.save_eval_output:
+        print('epoch:{} {} {} examples/sec:{:.1f}'.format(
+            cur_epoch, mode, decode_latency.to_str(), examples_meter.rate()))
+        if resultfile is not None:
+            resultfile.close()
             result_filename = \
                 args.log_dir + 'epoch{}.beam{}.{}.results.bleu{:.3f}' \
                     .format(cur_epoch, args.beam_width, mode, eval_bleu)
-            with codecs.open(result_filename, 'w+', 'utf-8') as resultfile:
-                for tmplt, tgt, hyp in zip(templates_list, targets_list, hypothesis_list):
-                    resultfile.write("- template: " + ' '.join(tmplt) + '\n')
-                    resultfile.write("- expected: " + ' '.join(tgt) + '\n')
-                    resultfile.write('- got:      ' + ' '.join(hyp) + '\n\n')
+            os.rename(result_tmp_filename, result_filename)
         return {
             'eval': eval_bleu,
             'template': template_bleu
         }, avg_ppl
 
-    def _draw_train_loss(epoch, loss_list, mode):
-        plt.figure(figsize=(14, 10))
-        plt.plot(loss_list, '--', linewidth=1, label='loss trend')
-        plt.ylabel('%s till epoch %s' % (mode, epoch))
-        plt.xlabel('every 50 steps, present_rate=%f' % args.present_rate)
-        plt.savefig(args.log_dir + '/img/%s_curve.png' % mode)
-        plt.close('all')
-
-    def _draw_bleu(epoch, test_bleu, tplt_bleu, train_bleu, train_tplt_bleu):
-        plt.figure(figsize=(14, 10))
-        legends = []
-        plt.plot(test_bleu, '--', linewidth=1, label='test bleu')
-        plt.plot(tplt_bleu, '--', linewidth=1, label='template bleu')
-        legends.extend(['test bleu', 'template bleu'])
-        plt.ylabel('bleu till epoch {}'.format(epoch))
-        plt.xlabel('every epoch')
-        plt.legend(legends, loc='upper left')
-        plt.savefig(args.log_dir + '/img/bleu.png')
-
-        plt.figure(figsize=(14, 10))
-        legends = []
-        plt.plot(train_bleu, '--', linewidth=1, label='train bleu')
-        plt.plot(train_tplt_bleu, '--', linewidth=1, label='train template bleu')
-        legends.extend(['train bleu', 'train template bleu'])
-        plt.ylabel('bleu till epoch {}'.format(epoch))
-        plt.xlabel('every epoch')
-        plt.legend(legends, loc='upper left')
-        plt.savefig(args.log_dir + '/img/train_bleu.png')
-        plt.close('all')
-
-    eval_saver = tf.train.Saver(max_to_keep=5)
+    def _draw_train_loss(epoch, mode):
+        metrics.plot('%s_curve.png' % mode, [mode],
+                     xlabel='every 50 steps, present_rate=%f' % args.present_rate,
+                     ylabel='%s till epoch %s' % (mode, epoch))
+
+    def _draw_bleu(epoch):
+        metrics.plot('bleu.png', ['test_bleu', 'template_bleu'],
+                     labels=['test bleu', 'template bleu'],
+                     xlabel='every epoch',
+                     ylabel='bleu till epoch {}'.format(epoch))
+        metrics.plot('train_bleu.png', ['train_bleu', 'train_template_bleu'],
+                     labels=['train bleu', 'train template bleu'],
+                     xlabel='every epoch',
+                     ylabel='bleu till epoch {}'.format(epoch))
+
+    # Checkpoints are written in a background thread
+    eval_saver = tx.run.AsyncCheckpointSaver(max_to_keep=5) if is_chief else None
     config = tf.ConfigProto()
+    if args.num_towers > 1:
+        config = tx.core.get_tower_session_config(args.num_towers)
     config.gpu_options.allow_growth = True
-    with tf.Session(config=config) as sess:
+    coord = None
+    if server is None:
+        sess = tf.Session(config=config)
         sess.run(tf.global_variables_initializer())
         sess.run(tf.local_variables_initializer())
         sess.run(tf.tables_initializer())
+    else:
+        # Only the chief evaluates, saves and writes the metrics
+        sess, coord = tx.run.create_replica_session(
+            server.target, is_chief, hooks=[sync_hook], config=config)
+    with sess:
+        if data_stats is not None and is_chief:
+            data_stats_writer = tf.summary.FileWriter(
+                os.path.join(args.log_dir, 'data_stats'))
 
-        loss_list, ppl_list, test_ppl_list = [], [], []
-        test_bleu, tplt_bleu, train_bleu, train_tplt_bleu = [], [], [], []
+        metrics = metrics_writer.MetricsWriter(args.log_dir) if is_chief else None
+        loss_list = []
         if args.running_mode == 'train_and_evaluate':
             for epoch in range(args.max_train_epoch):
                 # bleu on test set and train set
-                if epoch % args.bleu_interval == 0 or epoch == args.max_train_epoch - 1:
+                if is_chief and (epoch % args.bleu_interval == 0 or
+                                 epoch == args.max_train_epoch - 1):
+                    if averages is not None:
+                        sess.run(ema_swap_op)
                     bleu_scores, test_ppl = _test_epoch(sess, epoch)
-                    test_bleu.append(bleu_scores['eval'])
-                    tplt_bleu.append(bleu_scores['template'])
-                    test_ppl_list.append(test_ppl)
-                    _draw_train_loss(epoch, test_ppl_list, mode='test_perplexity')
+                    metrics.add('test_bleu', [bleu_scores['eval']], epoch)
+                    metrics.add('template_bleu', [bleu_scores['template']], epoch)
+                    metrics.add('test_perplexity', [test_ppl], epoch)
+                    _draw_train_loss(epoch, mode='test_perplexity')
 
                     train_bleu_scores, _ = _test_epoch(sess, epoch, mode='train')
-                    train_bleu.append(train_bleu_scores['eval'])
-                    train_tplt_bleu.append(train_bleu_scores['template'])
-                    _draw_bleu(epoch, test_bleu, tplt_bleu, train_bleu, train_tplt_bleu)
+                    metrics.add('train_bleu', [train_bleu_scores['eval']], epoch)
+                    metrics.add('train_template_bleu', [train_bleu_scores['template']],
+                                epoch)
+                    if averages is not None:
+                        # Swaps the trained weights back
+                        sess.run(ema_swap_op)
+                    _draw_bleu(epoch)
                     eval_saver.save(sess, args.log_dir + 'my-model-latest.ckpt')
+                    print('epoch:{} {}'.format(epoch, eval_saver.stall.to_str()))
 
                 # train
                 losses, ppls = _train_epochs(sess, epoch)
+                if profiler is not None and profiler.num_traces > 0:
+                    print('epoch:{} op time of traced steps:\n{}'.format(
+                        epoch, profiler.summary()))
+                    profiler.reset()
                 loss_list.extend(losses)
-                ppl_list.extend(ppls)
-                _draw_train_loss(epoch, loss_list, mode='train_loss')
-                _draw_train_loss(epoch, ppl_list, mode='perplexity')
+                if is_chief:
+                    if data_stats is not None:
+                        data_stats_writer.add_summary(sess.run(data_stats), epoch)
+                    metrics.add('train_loss', losses, epoch)
+                    metrics.add('perplexity', ppls, epoch)
+                    _draw_train_loss(epoch, mode='train_loss')
+                    _draw_train_loss(epoch, mode='perplexity')
                 sys.stdout.flush()
+        if metrics is not None:
+            metrics.close()
+        if eval_saver is not None:
+            eval_saver.close()
+        if eval_worker is not None:
+            eval_worker.close()
+            eval_worker.join()
+        if coord is not None:
+            coord.request_stop()
+
+
+def _infer(hparams):
+    """Infills the test data with a trained model, building only the
+    embedder, the decoder and the decoding path, and restoring only their
+    variables from the checkpoint (their moving averages if `--ema_decay`
+    is set).
+
+    The decoder variables are created by an unfetched training forward
+    pass of one hole, as the decoding loop only reuses them.
+    """
+    test_dataset_hparams, decoder_hparams, args = \
+        hparams['test_dataset_hparams'], hparams['decoder_hparams'], \
+        hparams['args']
+    start_time = default_timer()
+
+    test_data = tx.data.MonoTextData(test_dataset_hparams)
+    iterator = tx.data.DataIterator(test_data)
+    data_batch = iterator.get_next()
+    vocab = test_data.vocab
+    mask_id = vocab.token_to_id_map_py['<m>']
+    boa_id = vocab.token_to_id_map_py['<BOA>']
+    eoa_id = vocab.token_to_id_map_py['<EOA>']
+    eos_id = vocab.token_to_id_map_py['<EOS>']
+    pad_id = vocab.token_to_id_map_py['<PAD>']
+
+    embedder = tx.modules.WordEmbedder(vocab_size=vocab.size,
+                                       hparams=args.word_embedding_hparams)
+    decoder = \
+        tx.modules.TemplateTransformerDecoder(embedding=embedder._embedding,
+                                              hparams=decoder_hparams)
+    template_pack, answer_packs = \
+        tx.utils.prepare_template(data_batch, args, mask_id, boa_id, eoa_id, pad_id)
+    # Decoding reuses the variables of the decoder, which are created inside
+    # the decoding loop with `reuse=True`. They are hence created by
+    # building the training forward pass of one hole, whose outputs are
+    # never fetched and thus never computed.
+    decoder(decoder_input_pack=answer_packs[0],
+            template_input_pack=template_pack,
+            encoder_decoder_attention_bias=None,
+            args=args)
+
+    offsets = tx.utils.generate_prediction_offsets(data_batch['text_ids'],
+                                                   args.max_decode_len + 1)
+    segment_ids = \
+        tx.utils.generate_prediction_segment_ids(data_batch['text_ids'],
+                                                 1,  # segment_id will always be 1
+                                                 args.max_decode_len + 1)
+    predictions = []
+    cur_test_pack = template_pack
+    for _ in answer_packs:
+        preds = decoder.dynamic_decode(
+            template_input_pack=cur_test_pack,
+            encoder_decoder_attention_bias=None,
+            segment_ids=segment_ids,
+            offsets=offsets,
+            bos_id=boa_id,
+            eos_id=eoa_id)
+        predictions.append(preds['sampled_ids'][:, 0])
+        cur_test_pack = tx.utils.update_template_pack(cur_test_pack,
+                                                      preds['sampled_ids'][:, 0],
+                                                      mask_id, eoa_id, pad_id)
+
+    checkpoint = args.checkpoint or tf.train.latest_checkpoint(args.log_dir)
+    if checkpoint is None:
+        raise ValueError('No checkpoint found in %s' % args.log_dir)
+    # The graph has no optimizer, so the optimizer slots and the global
+    # step in the checkpoint are not restored. With `--ema_decay`, the
+    # moving averages of the weights are restored in place of the weights.
+    var_map = {var.op.name: var for var in tf.global_variables()}
+    if args.ema_decay > 0:
+        ema = tf.train.ExponentialMovingAverage(
+            args.ema_decay, name='MovingAverageWeights')
+        checkpoint_names = set(
+            name for name, _ in tf.train.list_variables(checkpoint))
+        for var in tf.trainable_variables():
+            average_name = ema.average_name(var)
+            if average_name not in checkpoint_names:
+                raise ValueError('No moving average of %s in %s' % (
+                    var.op.name, checkpoint))
+            del var_map[var.op.name]
+            var_map[average_name] = var
+    saver = tf.train.Saver(var_map)
+    build_time = default_timer() - start_time
+
+    start_time = default_timer()
+    config = tf.ConfigProto()
+    config.gpu_options.allow_growth = True
+    sess = tf.Session(config=config)
+    saver.restore(sess, checkpoint)
+    sess.run(tf.tables_initializer())
+    restore_time = default_timer() - start_time
+    print('graph_build_time:{:.3f}s restore_time:{:.3f}s checkpoint:{}'.format(
+        build_time, restore_time, checkpoint))
+
+    def _id2word_map(id_arrays):
+        return [' '.join([vocab._id_to_token_map_py[i]
+                          for i in sent]) for sent in id_arrays]
+
+    with sess:
+        iterator.switch_to_dataset(sess)
+        decode_latency = tx.utils.LatencyRecorder(name='decode_latency')
+        examples_meter = tx.utils.RateMeter()
+        result_filename = args.log_dir + 'infer.beam{}.results'.format(
+            args.beam_width)
+        with codecs.open(result_filename, 'w', 'utf-8') as resultfile:
+            while True:
+                try:
+                    feed = {tx.context.global_mode(): tf.estimator.ModeKeys.PREDICT}
+                    with decode_latency.time():
+                        template_, predictions_ = sess.run(
+                            [template_pack, predictions], feed_dict=feed)
+                    filled_templates = \
+                        tx.utils.fill_template(template_pack=template_,
+                                               predictions=predictions_,
+                                               eoa_id=eoa_id, pad_id=pad_id,
+                                               eos_id=eos_id)
+                    examples_meter.add(len(filled_templates))
+                    templates = _id2word_map(template_['templates'].tolist())
+                    for template, generated in zip(templates,
+                                                   _id2word_map(filled_templates)):
+                        template = template.split('<EOS>')[0].split('<PAD>')[0].strip()
+                        got = generated.split('<EOS>')[0].split('<PAD>')[0].strip()
+                        resultfile.write('- template: ' + template + '\n')
+                        resultfile.write('- got:      ' + got + '\n\n')
+                except tf.errors.OutOfRangeError:
+                    break
+        print('infer {} examples/sec:{:.1f} results:{}'.format(
+            decode_latency.to_str(), examples_meter.rate(), result_filename))
+
+
+def _main(_):
+    hparams = self_attn_hyperparams.load_hyperparams()
+    args = hparams['args']
+    if args.running_mode == 'infer':
+        return _infer(hparams)
+
+    # Data-parallel training: the launched process starts a local cluster
+    # that runs this script for every task, and waits for it to finish
+    cluster_spec, task_type, task_index = tx.run.get_task_from_env()
+    if cluster_spec is None:
+        if args.num_replicas <= 1:
+            return _train(hparams)
+        cluster = tx.run.LocalCluster(args.num_replicas, num_ps=args.num_ps)
+        cluster.start([sys.executable, os.path.abspath(sys.argv[0])] +
+                      sys.argv[1:])
+        return 0 if all(code == 0 for code in cluster.join()) else 1
+
+    server_config = None
+    if args.num_towers > 1:
+        server_config = tx.core.get_tower_session_config(args.num_towers)
+    server = tf.train.Server(tf.train.ClusterSpec(cluster_spec),
+                             job_name=task_type, task_index=task_index,
+                             config=server_config)
+    if task_type == 'ps':
+        server.join()
+        return 0
+
+    num_replicas = tx.run.get_num_replicas(cluster_spec)
+    hparams['train_dataset_hparams']['num_shards'] = num_replicas
+    hparams['train_dataset_hparams']['shard_index'] = \
+        tx.run.get_replica_index(task_type, task_index)
+    # All replicas run the same number of steps per epoch, so that none
+    # waits for the gradients of a replica that has run out of data
+    steps_per_epoch = tx.data.count_file_lines(args.train_file) // \
+        (args.batch_size * num_replicas)
+    if steps_per_epoch < 1:
+        raise ValueError('Too few training examples for %d replicas.'
+                         % num_replicas)
+
+    # Variables are placed on the parameter servers
+    device_fn = tf.train.replica_device_setter(
+        worker_device='/job:%s/task:%d' % (task_type, task_index),
+        cluster=tf.train.ClusterSpec(cluster_spec))
+    with tf.device(device_fn):
+        return _train(hparams, server=server, num_replicas=num_replicas,
+                      is_chief=task_type == 'chief',
+                      steps_per_epoch=steps_per_epoch)
 
 
 if __name__ == '__main__':
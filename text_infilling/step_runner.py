@@ -0,0 +1,136 @@
+# Copyright 2018 The Texar Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Runs training steps with separate per-step and periodic fetches.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+
+from tensorflow.python.util import nest
+
+from texar.utils.metrics import LatencyRecorder, RateMeter
+
+# pylint: disable=too-many-arguments
+
+
+def _num_bytes(values):
+    """Returns the number of bytes of the fetched numpy values.
+    """
+    return sum(np.asarray(value).nbytes for value in nest.flatten(values)
+               if value is not None)
+
+
+class StepRunner(object):
+    """Runs training steps in a session, fetching the tensors that are only
+    used for logging (e.g., the data batch) on logging steps only, so that
+    they are not copied to the host at every step.
+
+    A step is a logging step if the global step after it is
+    `1 (mod log_period)`, predicted from the global step fetched at the
+    previous step. The first step run is always a logging step. If the
+    global step is not incremented at every step (e.g., with gradient
+    accumulation), only the first step at a global step value can be a
+    logging step.
+
+    Args:
+        fetches (dict): The tensors and ops to fetch at every step, e.g.,
+            the train op and the loss. Must contain the global step with key
+            :attr:`step_key`.
+        periodic_fetches (dict, optional): The tensors to fetch on logging
+            steps only. Must not share keys with :attr:`fetches`.
+        log_period (int): The number of steps between logging steps.
+        step_key (str): The key of the global step in :attr:`fetches`.
+        profiler (optional): An instance of :class:`texar.run.StepProfiler`
+            to profile the steps with.
+        rate_keys (list, optional): The keys of scalar counts in
+            :attr:`fetches` (e.g., the number of tokens in the batch), of
+            which the rates per second over the latest :attr:`log_period`
+            steps are measured.
+    """
+
+    def __init__(self, fetches, periodic_fetches=None, log_period=200,
+                 step_key='step', profiler=None, rate_keys=None):
+        if step_key not in fetches:
+            raise ValueError("`fetches` must contain the global step with "
+                             "key '%s'." % step_key)
+        self._fetches = dict(fetches)
+        self._all_fetches = dict(fetches)
+        if periodic_fetches:
+            self._all_fetches.update(periodic_fetches)
+        self._log_period = log_period
+        self._step_key = step_key
+        self._step = None
+        self._logged_step = None
+        self._profiler = profiler
+        self.latency = LatencyRecorder(name='step_latency')
+        self.rates = dict((key, RateMeter(size=log_period))
+                          for key in rate_keys or [])
+        self.num_steps = 0
+        self.num_bytes = 0
+        self.last_num_bytes = 0
+
+    def is_logging_step(self):
+        """Returns whether the next step is a logging step.
+        """
+        if self._step is None:
+            return True
+        return self._step % self._log_period == 0 and \
+            self._step != self._logged_step
+
+    def run(self, session, feed_dict=None):
+        """Runs a step.
+
+        Returns:
+            A dict of the fetched values, which contains the values of
+            :attr:`periodic_fetches` only if the step is a logging step.
+        """
+        is_logging_step = self.is_logging_step()
+        fetches = self._all_fetches if is_logging_step else self._fetches
+        if is_logging_step:
+            self._logged_step = self._step
+        with self.latency.time():
+            if self._profiler is not None:
+                rtns = self._profiler.run(session, fetches,
+                                          feed_dict=feed_dict)
+            else:
+                rtns = session.run(fetches, feed_dict=feed_dict)
+        for key, meter in self.rates.items():
+            meter.add(rtns[key])
+        self._step = int(rtns[self._step_key])
+
+        self.last_num_bytes = _num_bytes(rtns)
+        self.num_bytes += self.last_num_bytes
+        self.num_steps += 1
+        return rtns
+
+    @property
+    def bytes_per_step(self):
+        """The average number of bytes fetched to the host per step.
+        """
+        if self.num_steps == 0:
+            return 0.
+        return self.num_bytes / self.num_steps
+
+    def metrics_to_str(self):
+        """Returns a string of the step latency percentiles and the rates of
+        :attr:`rate_keys`.
+        """
+        strs = [self.latency.to_str()]
+        for key in sorted(self.rates):
+            strs.append('%s/sec: %.1f' % (key, self.rates[key].rate()))
+        return ' '.join(strs)